@@ -0,0 +1,92 @@
+"""
+Import-time cost of the CLI entry points, parsed from `python -X importtime`.
+
+    python -m bench.import_time --out bench/import_time.json
+    python -m bench.import_time --baseline bench/import_time.json --tolerance 0.25
+
+With --baseline the run exits non-zero when an entry point got slower than the
+baseline by more than the tolerance, so regressions show up in CI.
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ENTRY_POINTS = [
+    "services.factory",
+    "ingest.ingest_pdfs",
+    "index.build_index",
+    "query.run_query",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse `-X importtime` lines into {module, self_us, cumulative_us, depth} records."""
+    records = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            records.append({
+                "module": m.group(4),
+                "self_us": int(m.group(1)),
+                "cumulative_us": int(m.group(2)),
+                "depth": (len(m.group(3)) - 1) // 2,
+            })
+    return records
+
+
+def measure(module: str, top: int = 10) -> Dict:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1]}
+    records = parse_importtime(proc.stderr)
+    own = next((r for r in reversed(records) if r["module"] == module), None)
+    heaviest = sorted((r for r in records if r["depth"] == 0), key=lambda r: r["cumulative_us"], reverse=True)
+    return {
+        "module": module,
+        "total_ms": round(sum(r["self_us"] for r in records) / 1000, 2),
+        "cumulative_ms": round(own["cumulative_us"] / 1000, 2) if own else None,
+        "modules_loaded": len(records),
+        "heaviest": [{"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 2)}
+                     for r in heaviest[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--repeats", type=int, default=3, help="best-of-N to reduce noise")
+    args = parser.parse_args()
+
+    results = []
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(args.repeats)]
+        ok = [r for r in runs if "error" not in r]
+        results.append(min(ok, key=lambda r: r["total_ms"]) if ok else runs[0])
+        print(json.dumps({k: v for k, v in results[-1].items() if k != "heaviest"}))
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = {r["module"]: r for r in json.loads(args.baseline.read_text(encoding="utf-8"))}
+        regressions = []
+        for r in results:
+            base = baseline.get(r["module"])
+            if base and "total_ms" in base and "total_ms" in r and r["total_ms"] > base["total_ms"] * (1 + args.tolerance):
+                regressions.append(f"{r['module']}: {base['total_ms']}ms -> {r['total_ms']}ms")
+        if regressions:
+            print("import-time regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
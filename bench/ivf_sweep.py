@@ -0,0 +1,106 @@
+"""
+IVF recall-vs-latency sweep for picking nlist / nprobe operating points.
+
+Trains an IVFStore on clustered synthetic vectors (or opens a persisted store with
+--store), takes queries as perturbed corpus rows, and reports recall@k against exact
+search plus p50/p95 latency and the fraction of rows scanned for each nprobe.
+
+    python -m bench.ivf_sweep --vectors 200000 --dim 768 --nprobe 1 2 4 8 16 32 64
+    python -m bench.ivf_sweep --store data/numpy_store --nprobe 4 8 16
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from bench.pipeline import git_revision, percentile
+from bench.quantization import fill, synthetic_vectors
+from services.vectorstores.ivf_store import IVFStore
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, block_rows: int = 65536) -> np.ndarray:
+    """Row positions of the exact top-k per query, scanned in blocks."""
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores, rows = [], []
+    for lo in range(0, len(vectors), block_rows):
+        block = queries @ np.asarray(vectors[lo:lo + block_rows]).T
+        top = np.argpartition(-block, min(k, block.shape[1]) - 1, axis=1)[:, :k]
+        scores.append(np.take_along_axis(block, top, axis=1))
+        rows.append(top + lo)
+    scores, rows = np.concatenate(scores, axis=1), np.concatenate(rows, axis=1)
+    return np.take_along_axis(rows, np.argsort(-scores, axis=1)[:, :k], axis=1)
+
+
+def sweep(store: IVFStore, queries: np.ndarray, truth: List[set], k: int, nprobes: List[int]) -> Dict:
+    sizes = np.diff(store._offsets)
+    centroid_scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ store._centroids.T
+    out = {}
+    for nprobe in nprobes:
+        latency, recall = [], []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ids = store.query(q, n_results=k, nprobe=nprobe)["ids"][0]
+            latency.append((time.perf_counter() - start) * 1000)
+            recall.append(len(set(ids) & expected) / k)
+        probed = np.argsort(-centroid_scores, axis=1)[:, :nprobe]
+        out[f"nprobe={nprobe}"] = {f"recall@{k}": round(statistics.fmean(recall), 4),
+                                   "p50_ms": round(percentile(latency, 50), 3),
+                                   "p95_ms": round(percentile(latency, 95), 3),
+                                   "scanned": round(float(sizes[probed].sum(axis=1).mean()) / store.count(), 4)}
+    return out
+
+
+def run(args) -> Dict:
+    results: Dict = {"params": vars(args).copy()}
+    if args.store:
+        store = IVFStore(str(args.store), nlist=args.nlist, min_train_rows=0)
+        if not store.trained or args.nlist:
+            store.retrain()
+    else:
+        store = fill(IVFStore(nlist=args.nlist, min_train_rows=0), synthetic_vectors(args.vectors, args.dim))
+        start = time.perf_counter()
+        store.flush()
+        results["train_s"] = round(time.perf_counter() - start, 3)
+    vectors = store.vectors
+    rng = np.random.default_rng(1)
+    queries = np.asarray(vectors[rng.integers(0, len(vectors), args.queries)], dtype=np.float32)
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+
+    start = time.perf_counter()
+    exact = exact_top_k(vectors, queries, args.k)
+    results["exact_ms_per_query"] = round((time.perf_counter() - start) * 1000 / len(queries), 3)
+    truth = [{store._ids[j] for j in row} for row in exact]
+    results["index"] = store.stats()
+    results["sweep"] = sweep(store, queries, truth, args.k, args.nprobe)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--store", type=Path, help="persisted numpy/IVF store directory; default: synthetic vectors")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--nlist", type=int, default=None, help="lists to train; default 4 * sqrt(rows)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args)
+    results["revision"] = git_revision()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    payload = json.dumps(results, indent=2, default=str)
+    if args.out:
+        args.out.write_text(payload, encoding="utf-8")
+    print(payload)
+
+
+if __name__ == "__main__":
+    main()
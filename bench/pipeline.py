@@ -0,0 +1,167 @@
+"""
+Offline benchmark for ingest, index and query.
+
+Uses the deterministic FakeEmbeddingService / FakeLLMService (with configurable injected
+latency) and a synthetic corpus scaled up from tests/assets/eval_source_document.pdf, so
+runs are comparable across commits without calling any live API.
+
+    python -m bench.pipeline --docs 200 --queries 200 --out bench/pipeline.json
+"""
+import argparse
+import json
+import logging
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from index.build_index import index_stream
+from ingest.chunker import METHODS, Chunker
+from ingest.ingest_pdfs import document_id, extract_pages
+from query.run_query import search_and_synthesize
+from services.factory import get_embedding_service, get_vector_store, refresh_services
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE_PDF = ROOT / "tests" / "assets" / "eval_source_document.pdf"
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def synthetic_corpus(pages: List[str], n_docs: int, doc_scale: int = 4, seed: int = 0) -> List[Dict]:
+    """Scale the source document up to `n_docs` documents, each `doc_scale` times its length."""
+    rng = random.Random(seed)
+    paragraphs = [p for page in pages for p in page.split("\n") if p.strip()]
+    per_doc = max(1, len(paragraphs) * doc_scale)
+    docs = []
+    for d in range(n_docs):
+        picked = [paragraphs[rng.randrange(len(paragraphs))] for _ in range(per_doc)]
+        docs.append({"source": f"synthetic/doc-{d:05d}.pdf", "text": f"Document {d}.\n" + "\n".join(picked)})
+    return docs
+
+
+def bench_config(args) -> Dict:
+    return {
+        "embeddings": {"provider": "fake", "fake": {"dimension": args.dim, "latency_s": args.embed_latency}},
+        "llm": {"provider": "fake", "fake": {"latency_s": args.llm_latency}},
+        "vector_store": {"type": args.store, "collection_name": "bench_pipeline"},
+        "answer_cache": {"enabled": False},
+        "evaluation": {"enabled": False},
+    }
+
+
+def run(args) -> Dict:
+    results: Dict = {"params": vars(args).copy()}
+
+    # extraction: pages/sec on the real PDF
+    start = time.perf_counter()
+    pages_done = 0
+    for _ in range(args.extract_repeats):
+        pages = extract_pages(SOURCE_PDF)
+        pages_done += len(pages)
+    elapsed = time.perf_counter() - start
+    results["extract"] = {"pages": pages_done, "seconds": round(elapsed, 3),
+                          "pages_per_sec": round(pages_done / elapsed, 2)}
+
+    # chunking: MB/sec over the synthetic corpus
+    corpus = synthetic_corpus(pages, args.docs, args.doc_scale)
+    total_bytes = sum(len(d["text"].encode("utf-8")) for d in corpus)
+    rows = []
+    chunker = Chunker(args.chunk_size, args.chunk_overlap, args.chunk_method)
+    # tokenizer/sentence-model loading is a one-off per process; report it apart from throughput
+    start = time.perf_counter()
+    chunker.split(corpus[0]["text"])
+    warmup = time.perf_counter() - start
+    start = time.perf_counter()
+    chunked = chunker.chunk_documents([[doc["text"]] for doc in corpus])
+    for doc, chunks in zip(corpus, chunked):
+        doc_id = document_id(Path(doc["source"]))
+        for i, c in enumerate(chunks):
+            rows.append({"id": f"{doc_id}-chunk-{i}", "text": c.text, "source": doc["source"], **c.offsets()})
+    elapsed = time.perf_counter() - start
+    results["chunk"] = {"docs": len(corpus), "chunks": len(rows), "mb": round(total_bytes / 1e6, 3),
+                        "seconds": round(elapsed, 3), "mb_per_sec": round(total_bytes / 1e6 / elapsed, 3),
+                        "warmup_s": round(warmup, 3)}
+
+    # indexing: chunks/sec through the streaming pipeline
+    cfg = bench_config(args)
+    refresh_services()
+    embedder, store = get_embedding_service(cfg), get_vector_store(cfg)
+    start = time.perf_counter()
+    indexed = index_stream(iter(rows), embedder, store, window_size=args.window_size)
+    elapsed = time.perf_counter() - start
+    results["index"] = {"chunks": indexed, "seconds": round(elapsed, 3),
+                        "chunks_per_sec": round(indexed / elapsed, 2)}
+
+    # query: end-to-end latency percentiles
+    rng = random.Random(1)
+    queries = [" ".join(rng.choice(rows)["text"].split()[:12]) for _ in range(args.queries)]
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        search_and_synthesize(q, n_results=args.n_results, cfg=cfg)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["query"] = {"queries": len(latencies),
+                        "p50_ms": round(percentile(latencies, 50), 3),
+                        "p95_ms": round(percentile(latencies, 95), 3),
+                        "p99_ms": round(percentile(latencies, 99), 3),
+                        "mean_ms": round(statistics.fmean(latencies), 3)}
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    refresh_services()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100, help="synthetic documents to generate")
+    parser.add_argument("--doc-scale", type=int, default=4, help="synthetic document length vs. the source PDF")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--store", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=600)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--chunk-method", default="cached_sentence_splitter", choices=METHODS)
+    parser.add_argument("--window-size", type=int, default=256)
+    parser.add_argument("--n-results", type=int, default=3)
+    parser.add_argument("--extract-repeats", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="injected seconds per embed request")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="injected seconds per synthesis")
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args)
+    results["revision"] = git_revision()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    payload = json.dumps(results, indent=2, default=str)
+    if args.out:
+        args.out.write_text(payload, encoding="utf-8")
+    print(payload)
+
+
+if __name__ == "__main__":
+    main()
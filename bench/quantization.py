@@ -0,0 +1,101 @@
+"""
+Quantized vector storage: memory, latency and recall@k against exact search.
+
+Clustered synthetic vectors (queries are perturbed corpus rows, like paraphrased chunk
+text) are indexed in an exact NumpyStore and in QuantizedStore with int8 and binary codes
+at several rerank factors. Quantized stores are flushed and reopened so reranks read the
+memory-mapped vectors.npy, as they would in production.
+
+    python -m bench.quantization --vectors 200000 --dim 768 --queries 200
+"""
+import argparse
+import json
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from bench.pipeline import git_revision, percentile
+from services.vectorstores.numpy_store import NumpyStore
+from services.vectorstores.quantized_store import QuantizedStore
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def fill(store, vectors: np.ndarray, batch: int = 50000):
+    for lo in range(0, len(vectors), batch):
+        ids = [f"c{i}" for i in range(lo, min(len(vectors), lo + batch))]
+        store.save(ids, [""] * len(ids), [{}] * len(ids), vectors[lo:lo + batch])
+    return store
+
+
+def measure(store, queries: np.ndarray, truth: List[List[str]], k: int) -> Dict:
+    latency, recall = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids = store.query(q, n_results=k)["ids"][0]
+        latency.append((time.perf_counter() - start) * 1000)
+        recall.append(len(set(ids) & set(expected)) / k)
+    return {f"recall@{k}": round(statistics.fmean(recall), 4),
+            "p50_ms": round(percentile(latency, 50), 3), "p95_ms": round(percentile(latency, 95), 3)}
+
+
+def run(args) -> Dict:
+    results: Dict = {"params": vars(args).copy()}
+    vectors = synthetic_vectors(args.vectors, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)] + 0.3 * rng.normal(
+        size=(args.queries, args.dim)).astype(np.float32)
+
+    exact = fill(NumpyStore(), vectors)
+    truth = [exact.query(q, n_results=args.k)["ids"][0] for q in queries]
+    per_million = 1e6 / args.vectors
+    results["exact"] = dict(measure(exact, queries, truth, args.k),
+                            resident_mb_per_million=round(exact.vectors.nbytes * per_million / 1e6, 1))
+    del exact
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_quantization_"))
+    for quantization in ("int8", "binary"):
+        path = workdir / quantization
+        store = fill(QuantizedStore(str(path), quantization=quantization), vectors)
+        store.flush()
+        store = QuantizedStore(str(path), quantization=quantization)
+        sizes = store.memory_bytes()
+        for factor in args.rerank_factors:
+            store.rerank_factor = factor
+            results[f"{quantization}_rerank{factor}"] = dict(
+                measure(store, queries, truth, args.k),
+                resident_mb_per_million=round((sizes["codes"] + sizes["full_precision_resident"]) * per_million / 1e6, 1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[0, 4, 10])
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args)
+    results["revision"] = git_revision()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    payload = json.dumps(results, indent=2, default=str)
+    if args.out:
+        args.out.write_text(payload, encoding="utf-8")
+    print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Retrieval comparison: vector-only vs BM25-only vs hybrid (lexical fast path + RRF).
+
+Synthetic chunks are built from tests/assets/eval_source_document.pdf paragraphs and each
+carries a unique part number and clause id. Queries are either identifier lookups or a
+span of words from one chunk; that chunk's id is the ground truth for recall@k. The
+vector and hybrid modes run query.run_query.retrieve, with FakeEmbeddingService latency
+standing in for the embedding API round trip.
+
+    python -m bench.retrieval --chunks 5000 --queries 300 --embed-latency 0.05
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bench.pipeline import SOURCE_PDF, git_revision, percentile
+from index.bm25 import BM25Index
+from index.build_index import index_stream
+from ingest.ingest_pdfs import extract_pages
+from query.run_query import retrieve
+from services.factory import get_embedding_service, get_vector_store, refresh_services
+
+
+def synthetic_chunks(n_chunks: int, paragraphs_per_chunk: int = 3, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    paragraphs = [p for page in extract_pages(SOURCE_PDF) for p in page.split("\n") if p.strip()]
+    rows = []
+    for c in range(n_chunks):
+        picked = [paragraphs[rng.randrange(len(paragraphs))] for _ in range(paragraphs_per_chunk)]
+        rows.append({"id": f"chunk-{c}", "source": f"synthetic/doc-{c // 20:05d}.pdf", "paragraphs": picked,
+                     "text": f"{' '.join(picked)} Part number PN-{c:06d}. See clause {c // 100}.{c % 100}.{c % 7 + 1}."})
+    return rows
+
+
+def make_queries(rows: List[Dict], n: int, seed: int = 1) -> List[Tuple[str, str, str]]:
+    """(kind, query, expected chunk id): half identifier lookups, half natural-language spans."""
+    rng = random.Random(seed)
+    out = []
+    for q in range(n):
+        row = rng.choice(rows)
+        c = int(row["id"].split("-")[1])
+        if q % 2 == 0:
+            query = rng.choice([f"What is the specification of part PN-{c:06d}?",
+                                f"clause {c // 100}.{c % 100}.{c % 7 + 1} requirements"])
+            out.append(("identifier", query, row["id"]))
+        else:
+            # paragraphs repeat across chunks; a span across a paragraph boundary narrows it to a few
+            j = rng.randrange(len(row["paragraphs"]) - 1)
+            query = " ".join(row["paragraphs"][j].split()[-6:] + row["paragraphs"][j + 1].split()[:6])
+            out.append(("natural", query, row["id"]))
+    return out
+
+
+def bench_config(args, lexical_path: str = None) -> Dict:
+    return {
+        "embeddings": {"provider": "fake", "fake": {"dimension": args.dim, "latency_s": args.embed_latency}},
+        "vector_store": {"type": "numpy", "collection_name": "bench_retrieval"},
+        "lexical": {"enabled": lexical_path is not None, "path": lexical_path or "",
+                    "candidates": args.candidates},
+    }
+
+
+def measure(queries: List[Tuple[str, str, str]], search: Callable[[str], Tuple[List[str], bool]],
+            k: int) -> Dict:
+    by_kind: Dict[str, Dict[str, List]] = {}
+    for kind, query, expected in queries:
+        start = time.perf_counter()
+        ids, skipped = search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = by_kind.setdefault(kind, {"latency": [], "hits": [], "skipped": []})
+        stats["latency"].append(elapsed)
+        stats["hits"].append(expected in ids[:k])
+        stats["skipped"].append(skipped)
+    return {kind: {"queries": len(s["latency"]),
+                   f"recall@{k}": round(sum(s["hits"]) / len(s["hits"]), 4),
+                   "p50_ms": round(percentile(s["latency"], 50), 3),
+                   "p95_ms": round(percentile(s["latency"], 95), 3),
+                   "mean_ms": round(statistics.fmean(s["latency"]), 3),
+                   "skipped_embedding": round(sum(s["skipped"]) / len(s["skipped"]), 4)}
+            for kind, s in by_kind.items()}
+
+
+def run(args) -> Dict:
+    results: Dict = {"params": vars(args).copy()}
+    rows = synthetic_chunks(args.chunks)
+    queries = make_queries(rows, args.queries)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_retrieval_"))
+    lexical_path = str(workdir / "bm25.idx")
+
+    start = time.perf_counter()
+    BM25Index.build(rows).save(lexical_path)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index = BM25Index.load(lexical_path)
+    results["bm25"] = {"build_s": round(build_s, 3), "load_ms": round((time.perf_counter() - start) * 1000, 3),
+                       "size_mb": round(Path(lexical_path).stat().st_size / 1e6, 3), "terms": len(index.terms)}
+
+    # vectors are indexed without injected latency; it only applies at query time
+    refresh_services()
+    index_cfg = dict(bench_config(args), embeddings={"provider": "fake", "fake": {"dimension": args.dim}})
+    index_stream(iter(rows), get_embedding_service(index_cfg), get_vector_store(index_cfg))
+
+    vector_cfg = bench_config(args)
+    hybrid_cfg = bench_config(args, lexical_path)
+    vector_cfg["vector_store"] = hybrid_cfg["vector_store"] = index_cfg["vector_store"]
+
+    def _retrieve(cfg):
+        def _search(query):
+            hits, q_emb = retrieve(query, args.k, cfg)
+            return hits["ids"][0], q_emb is None
+        return _search
+
+    results["vector"] = measure(queries, _retrieve(vector_cfg), args.k)
+    results["bm25_only"] = measure(queries, lambda q: ([i for i, _ in index.search(q, args.k)], True), args.k)
+    results["hybrid"] = measure(queries, _retrieve(hybrid_cfg), args.k)
+    refresh_services()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=20, help="per-ranking depth fused by RRF")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="injected seconds per embed request")
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args)
+    results["revision"] = git_revision()
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    payload = json.dumps(results, indent=2, default=str)
+    if args.out:
+        args.out.write_text(payload, encoding="utf-8")
+    print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Time-to-first-query for a persistent ChromaStore.
+
+Builds (or reuses) a persisted collection of N synthetic chunks per size, then starts a
+fresh interpreter that imports the store, opens the collection and runs one query.
+
+    python -m bench.startup --sizes 10000 100000 1000000 --out bench/startup.json
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+DIM = 256
+BATCH = 5000  # below chroma's max batch size
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from services.vectorstores.chroma_store import ChromaStore
+t1 = time.perf_counter()
+store = ChromaStore(collection_name=sys.argv[2], persist_path=sys.argv[1])
+t2 = time.perf_counter()
+store.query([0.1] * int(sys.argv[3]), n_results=3)
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "open_s": t2 - t1, "first_query_s": t3 - t2, "total_s": t3 - t0}))
+"""
+
+
+def build(path: Path, collection: str, size: int) -> float:
+    from services.vectorstores.chroma_store import ChromaStore
+    store = ChromaStore(collection_name=collection, persist_path=str(path))
+    if store.col.count() == size:
+        return 0.0
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for lo in range(0, size, BATCH):
+        hi = min(size, lo + BATCH)
+        ids = [f"bench-{i}" for i in range(lo, hi)]
+        embs = rng.standard_normal((hi - lo, DIM), dtype=np.float32).tolist()
+        store.save(ids, [f"synthetic chunk {i}" for i in range(lo, hi)],
+                   [{"source": "bench", "i": i} for i in range(lo, hi)], embs)
+    return time.perf_counter() - start
+
+
+def probe(path: Path, collection: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE, str(path), collection, str(DIM)],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--root", type=Path, default=Path("data/bench_startup"))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        path = args.root / f"chroma_{size}"
+        build_s = build(path, "bench_startup", size)
+        runs = [probe(path, "bench_startup") for _ in range(args.repeats)]
+        best = min(runs, key=lambda r: r["total_s"])
+        results.append({"chunks": size, "build_s": round(build_s, 2), **{k: round(v, 4) for k, v in best.items()}})
+        logging.info(f'startup {results[-1]}')
+        print(json.dumps(results[-1]))
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
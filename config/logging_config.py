@@ -1,6 +1,8 @@
 import logging
 import sys
 
+from services import telemetry
+
 LEVEL_COLORS = {
     "DEBUG": "\033[36m",
     "INFO": "\033[32m",
@@ -18,10 +20,13 @@ class ColorFormatter(logging.Formatter):
         return super().format(record)
 
 
-def setup_logging():
+def setup_logging(enable_telemetry: bool = True):
     """
     Force a clean logging environment even when Uvicorn/LangGraph
     auto-configures their own handlers.
+
+    With `enable_telemetry`, per-stage spans are recorded (services/telemetry.py) and every
+    record carries the current request id, so a query's latency breakdown can be followed.
     """
     # 1. Remove existing handlers
     root = logging.getLogger()
@@ -30,13 +35,14 @@ def setup_logging():
 
     LOG_FORMAT = (
         "%(asctime)s.%(msecs)03d | %(levelname)-8s | "
-        "%(name)s | %(module)s.%(funcName)s:%(lineno)d | %(message)s"
+        "%(request_id)s | %(name)s | %(module)s.%(funcName)s:%(lineno)d | %(message)s"
     )
     DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
     # 2. Create your colored handler
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(ColorFormatter(LOG_FORMAT, DATE_FORMAT))
+    handler.addFilter(telemetry.RequestIdFilter())
 
     # 3. Rebuild logging tree with your rules
     logging.basicConfig(
@@ -58,3 +64,6 @@ def setup_logging():
     ]
     for name in noisy:
         logging.getLogger(name).setLevel(logging.WARNING)
+
+    # 5. Per-stage timing and request-scoped latency breakdowns
+    telemetry.enable(enable_telemetry)
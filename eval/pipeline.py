@@ -0,0 +1,245 @@
+"""
+Sampled background evaluation of answered queries.
+
+The online path hands (query, answer, contexts) records to an EvaluationPipeline, which
+samples them, queues them on a bounded queue and evaluates them on worker threads with
+the LlamaIndex evaluators. Results go to a JSONL or SQLite sink; aggregate scores are
+kept in memory and can be recomputed from a sink with `python -m eval.pipeline <path>`.
+"""
+import json
+import logging
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class EvalRecord:
+    query: str
+    answer: str
+    contexts: List[str]
+    request_id: Optional[str] = None
+    created: float = field(default_factory=time.time)
+
+
+def default_evaluators() -> Dict[str, object]:
+    """The evaluators that used to run inline in run_query; built per worker thread."""
+    from llama_index.core.evaluation import AnswerRelevancyEvaluator, FaithfulnessEvaluator
+    return {
+        "AnswerRelevancyEvaluator": AnswerRelevancyEvaluator(),
+        "FaithfulnessEvaluator": FaithfulnessEvaluator(),
+    }
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def write(self, result: Dict) -> None:
+        with self._lock:
+            self._fh.write(json.dumps(result) + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+class SqliteSink:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "created REAL, request_id TEXT, query TEXT, answer TEXT, evaluator TEXT, "
+            "passing INTEGER, score REAL, feedback TEXT, error TEXT)"
+        )
+
+    def write(self, result: Dict) -> None:
+        passing = result.get("passing")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result["created"], result.get("request_id"), result["query"], result["answer"],
+                 result["evaluator"], None if passing is None else int(passing), result.get("score"),
+                 result.get("feedback"), result.get("error")),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def make_sink(path: str):
+    """SQLite for .sqlite/.db paths, JSONL otherwise."""
+    return SqliteSink(path) if Path(path).suffix in (".sqlite", ".db") else JsonlSink(path)
+
+
+class Aggregator:
+    """Running per-evaluator count, pass rate and mean score."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def add(self, result: Dict) -> None:
+        with self._lock:
+            t = self._totals.setdefault(result["evaluator"],
+                                        {"count": 0, "errors": 0, "passing": 0, "scored": 0, "score_sum": 0.0})
+            t["count"] += 1
+            if result.get("error"):
+                t["errors"] += 1
+                return
+            if result.get("passing"):
+                t["passing"] += 1
+            if result.get("score") is not None:
+                t["scored"] += 1
+                t["score_sum"] += float(result["score"])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for name, t in self._totals.items():
+                evaluated = t["count"] - t["errors"]
+                out[name] = {
+                    "count": t["count"],
+                    "errors": t["errors"],
+                    "pass_rate": round(t["passing"] / evaluated, 4) if evaluated else None,
+                    "mean_score": round(t["score_sum"] / t["scored"], 4) if t["scored"] else None,
+                }
+            return out
+
+
+class EvaluationPipeline:
+    def __init__(self, evaluators_factory: Callable[[], Dict[str, object]] = default_evaluators,
+                 sink=None, sample_rate: float = 0.1, workers: int = 2, queue_size: int = 1000,
+                 rng: Callable[[], float] = random.random, close_timeout: Optional[float] = None):
+        self.evaluators_factory = evaluators_factory
+        self.close_timeout = close_timeout  # default bound on close(); None waits for the whole queue
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.aggregate = Aggregator()
+        self.stats = {"submitted": 0, "sampled": 0, "dropped": 0, "evaluated": 0}
+        self._rng = rng
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "EvaluationPipeline":
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"eval-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, record: EvalRecord) -> bool:
+        """Queue a record for evaluation if sampled; never blocks the caller."""
+        self.stats["submitted"] += 1
+        if self._rng() >= self.sample_rate:
+            return False
+        self.stats["sampled"] += 1
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def _worker(self) -> None:
+        evaluators = None
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            if evaluators is None:
+                evaluators = self.evaluators_factory()
+            for name, evaluator in evaluators.items():
+                result = {**asdict(record), "evaluator": name}
+                result.pop("contexts")
+                try:
+                    with span("evaluate") as s:
+                        res = evaluator.evaluate(query=record.query, response=record.answer, contexts=record.contexts)
+                        s.add(items=1)
+                    result.update(passing=getattr(res, "passing", None), score=getattr(res, "score", None),
+                                  feedback=getattr(res, "feedback", None))
+                except Exception as e:
+                    result["error"] = str(e)
+                    logger.debug(f"{name} failed: {e}")
+                self.aggregate.add(result)
+                if self.sink is not None:
+                    self.sink.write(result)
+            self.stats["evaluated"] += 1
+
+    def close(self, drain: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers. With `drain`, queued records are evaluated first, for at most
+        `timeout` seconds (default `close_timeout`); whatever is still queued then is dropped.
+        """
+        timeout = self.close_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if drain and deadline is not None:
+            while self._threads and not self._queue.empty() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        if not drain or deadline is not None:
+            discarded = 0
+            try:
+                while True:
+                    self._queue.get_nowait()
+                    discarded += 1
+            except queue.Empty:
+                pass
+            if discarded:
+                self.stats["dropped"] += discarded
+                logger.warning(f'evaluation pipeline closing: dropped {discarded} queued records')
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        busy = [t.name for t in self._threads if t.is_alive()]
+        self._threads = []
+        if busy:
+            # daemon threads: an in-flight judge call is abandoned at exit, and the sink stays open for it
+            logger.warning(f'evaluation pipeline closing: {busy} still evaluating after {timeout}s, not waiting')
+            return
+        if self.sink is not None:
+            self.sink.close()
+        logger.info(f'evaluation pipeline stopped: {self.stats}, scores: {self.aggregate.summary()}')
+
+
+def summarize(path: str) -> Dict[str, Dict[str, float]]:
+    """Aggregate scores from a JSONL or SQLite sink."""
+    agg = Aggregator()
+    if Path(path).suffix in (".sqlite", ".db"):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT evaluator, passing, score, error FROM evaluations").fetchall()
+        conn.close()
+        for evaluator, passing, score, error in rows:
+            agg.add({"evaluator": evaluator, "passing": passing, "score": score, "error": error})
+    else:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    agg.add(json.loads(line))
+    return agg.summary()
+
+
+if __name__ == "__main__":
+    print(json.dumps(summarize(sys.argv[1] if len(sys.argv) > 1 else "data/evaluations.jsonl"), indent=2))
@@ -0,0 +1,229 @@
+"""
+Compact on-disk BM25 index over chunks.jsonl.
+
+build_index writes it next to the vector index; run_query loads it once and uses it to
+answer identifier-style queries (part numbers, clause ids) without an embedding call, and
+otherwise fuses its ranking with the vector hits by reciprocal rank.
+
+File layout (native byte order, recorded in the header):
+    b"BM25" | version u8 | header length u32 | JSON header (ids, terms, k1, b, byteorder)
+    doc_lens u32[n_docs] | offsets u32[n_terms + 1] | postings doc u32[] | postings tf u16[]
+Postings of term t are [offsets[t], offsets[t + 1]) in both postings arrays.
+"""
+import json
+import logging
+import math
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"BM25"
+VERSION = 1
+
+_TOKEN = re.compile(r"[0-9a-z]+(?:[-./_][0-9a-z]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; compound tokens such as "pn-1042" or "4.2.1" also yield their parts."""
+    out = []
+    for tok in _TOKEN.findall(text.lower()):
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(p for p in re.split(r"[-./_]", tok) if p)
+    return out
+
+
+def is_identifier(token: str) -> bool:
+    """Tokens that name something exactly: anything containing a digit."""
+    return any(ch.isdigit() for ch in token)
+
+
+class BM25Index:
+    def __init__(self, ids: List[str], terms: List[str], doc_lens: array, offsets: array,
+                 post_docs: array, post_tfs: array, k1: float = 1.2, b: float = 0.75):
+        self.ids = ids
+        self.terms = terms
+        self.doc_lens = doc_lens
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.k1 = k1
+        self.b = b
+        n = len(ids)
+        self.avgdl = (sum(doc_lens) / n) if n else 0.0
+        self._term_index = {t: i for i, t in enumerate(terms)}
+        self._idf = [math.log(1 + (n - df + 0.5) / (df + 0.5))
+                     for df in (offsets[i + 1] - offsets[i] for i in range(len(terms)))]
+        avgdl = self.avgdl or 1.0
+        # zero-copy views of the postings for vectorised scoring
+        self._docs = np.frombuffer(post_docs, dtype=f"u{post_docs.itemsize}")
+        self._tfs = np.frombuffer(post_tfs, dtype=f"u{post_tfs.itemsize}").astype(np.float32)
+        self._norm = k1 * (1 - b + b * np.frombuffer(doc_lens, dtype=f"u{doc_lens.itemsize}") / avgdl)
+        self._positions: Optional[Dict[str, int]] = None
+
+    # --- build / persist ---------------------------------------------------------------
+
+    @classmethod
+    def build(cls, rows: Iterable[Dict], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """Index rows with "id" and "text", streaming them once."""
+        ids: List[str] = []
+        doc_lens = array("I")
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for row in rows:
+            doc = len(ids)
+            ids.append(row["id"])
+            counts: Dict[str, int] = defaultdict(int)
+            tokens = tokenize(row["text"])
+            for tok in tokens:
+                counts[tok] += 1
+            doc_lens.append(len(tokens))
+            for tok, tf in counts.items():
+                postings[tok].append((doc, min(tf, 0xFFFF)))
+        terms = sorted(postings)
+        offsets, post_docs, post_tfs = array("I", [0]), array("I"), array("H")
+        for term in terms:
+            for doc, tf in postings[term]:
+                post_docs.append(doc)
+                post_tfs.append(tf)
+            offsets.append(len(post_docs))
+        logging.info(f'bm25: indexed {len(ids)} chunks, {len(terms)} terms, {len(post_docs)} postings')
+        return cls(ids, terms, doc_lens, offsets, post_docs, post_tfs, k1, b)
+
+    def save(self, path: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = json.dumps({"ids": self.ids, "terms": self.terms, "k1": self.k1, "b": self.b,
+                             "byteorder": sys.byteorder}).encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(MAGIC + struct.pack("<BI", VERSION, len(header)) + header)
+            for arr in (self.doc_lens, self.offsets, self.post_docs, self.post_tfs):
+                arr.tofile(fh)
+        os.replace(tmp, path)
+        logging.info(f'bm25: wrote {path} ({path.stat().st_size / 1e6:.1f} MB)')
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "rb") as fh:
+            if fh.read(4) != MAGIC:
+                raise ValueError(f"{path} is not a BM25 index")
+            version, header_len = struct.unpack("<BI", fh.read(5))
+            if version != VERSION:
+                raise ValueError(f"unsupported BM25 index version {version}")
+            header = json.loads(fh.read(header_len))
+            n_docs, n_terms = len(header["ids"]), len(header["terms"])
+            swap = header["byteorder"] != sys.byteorder
+            doc_lens, offsets, post_docs, post_tfs = array("I"), array("I"), array("I"), array("H")
+            doc_lens.fromfile(fh, n_docs)
+            offsets.fromfile(fh, n_terms + 1)
+            if swap:
+                doc_lens.byteswap()
+                offsets.byteswap()
+            post_docs.fromfile(fh, offsets[-1])
+            post_tfs.fromfile(fh, offsets[-1])
+            if swap:
+                post_docs.byteswap()
+                post_tfs.byteswap()
+        return cls(header["ids"], header["terms"], doc_lens, offsets, post_docs, post_tfs, header["k1"], header["b"])
+
+    # --- search ----------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document_frequency(self, term: str) -> int:
+        t = self._term_index.get(term)
+        return 0 if t is None else self.offsets[t + 1] - self.offsets[t]
+
+    def _score(self, terms: Sequence[str]) -> np.ndarray:
+        """Dense BM25 scores over all chunks; chunks that match no query term score 0."""
+        docs, parts = [], []
+        for term in set(terms):
+            t = self._term_index.get(term)
+            if t is None:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            doc, tf = self._docs[lo:hi], self._tfs[lo:hi]
+            docs.append(doc)
+            parts.append(self._idf[t] * (self.k1 + 1) * tf / (tf + self._norm[doc]))
+        if not docs:
+            return np.zeros(len(self.ids))
+        return np.bincount(np.concatenate(docs), weights=np.concatenate(parts), minlength=len(self.ids))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score), best first; ties go to the earlier chunk."""
+        scores = self._score(tokenize(query))
+        hits = np.flatnonzero(scores)
+        if len(hits) > k > 0:
+            kth = np.partition(scores[hits], len(hits) - k)[len(hits) - k]
+            hits = hits[scores[hits] >= kth]
+        hits = hits[np.lexsort((hits, -scores[hits]))][:max(k, 0)]
+        return [(self.ids[doc], float(scores[doc])) for doc in hits]
+
+    def confident(self, query: str, hits: Sequence[Tuple[str, float]], max_df: int = 3,
+                  margin: float = 0.5) -> bool:
+        """
+        True when the query names something exactly: it has identifier tokens that occur
+        in at most `max_df` chunks, the best hit contains all of them, and its score beats
+        the runner-up by `margin` (relative).
+        """
+        if not hits:
+            return False
+        idents = {t for t in _TOKEN.findall(query.lower()) if is_identifier(t)}  # whole tokens, not parts
+        if not idents or any(not 0 < self.document_frequency(t) <= max_df for t in idents):
+            return False
+        doc = self._doc_positions().get(hits[0][0])
+        if doc is None or any(not self._contains(t, doc) for t in idents):
+            return False
+        return len(hits) == 1 or hits[0][1] >= (1 + margin) * hits[1][1]
+
+    def _contains(self, term: str, doc: int) -> bool:
+        # postings are written in document order, so membership is a binary search
+        t = self._term_index[term]
+        lo, hi = self.offsets[t], self.offsets[t + 1]
+        i = bisect_left(self.post_docs, doc, lo, hi)
+        return i < hi and self.post_docs[i] == doc
+
+    def _doc_positions(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        return self._positions
+
+
+def rrf_fuse(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal-rank fusion: score(d) = sum over rankings of 1 / (k + rank)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+class LexicalSearch:
+    """A loaded BM25Index plus the retrieval policy configured under `lexical:`."""
+
+    def __init__(self, index: BM25Index, candidates: int = 20, rrf_k: int = 60, fast_path: bool = True,
+                 max_df: int = 3, margin: float = 0.5):
+        self.index = index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.fast_path = fast_path
+        self.max_df = max_df
+        self.margin = margin
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        return self.index.search(query, k or self.candidates)
+
+    def confident(self, query: str, hits: Sequence[Tuple[str, float]]) -> bool:
+        return self.fast_path and self.index.confident(query, hits, self.max_df, self.margin)
+
+    def fuse(self, vector_ids: Sequence[str], lexical_hits: Sequence[Tuple[str, float]]) -> List[str]:
+        return [chunk_id for chunk_id, _ in rrf_fuse([vector_ids, [i for i, _ in lexical_hits]], self.rrf_k)]
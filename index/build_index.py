@@ -1,21 +1,258 @@
+import argparse
+import hashlib
 import json
+import logging
+import queue
+import threading
+from itertools import groupby
 from pathlib import Path
-from services.factory import get_embedding_service, get_vector_store
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from index.bm25 import BM25Index
+from services.embedding.base import EmbeddingService
+from services.factory import get_embedding_service, get_vector_store, load_config
+from services.telemetry import span
+from services.vectorstores.base import VectorStore
 
 CHUNKS_FILE = Path("data/chunks.jsonl")
 
+_DONE = object()
+
+OFFSET_FIELDS = ("char_start", "char_end", "page", "page_end")
+# per-document fields written by ingest; the vector store indexes them for `where` filters
+DOCUMENT_FIELDS = ("doc_id", "tenant", "ingested_at")
+
+
+def iter_chunks(chunk_file: Path) -> Iterator[Dict]:
+    """Yield chunk rows from a JSONL file one line at a time."""
+    with chunk_file.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_windows(rows: Iterable[Dict], window_size: int) -> Iterator[List[Dict]]:
+    """Group rows into lists of at most `window_size` items."""
+    window: List[Dict] = []
+    for row in rows:
+        window.append(row)
+        if len(window) >= window_size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def chunk_fields(row: Dict) -> Dict:
+    """Character/page span and document fields recorded by ingest, carried into store metadata when present."""
+    return {k: row[k] for k in OFFSET_FIELDS + DOCUMENT_FIELDS if row.get(k) is not None}
+
+
+def content_hash(text: str) -> str:
+    """Hash of a chunk's text, stored in metadata to detect changed chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def document_fingerprint(ids: Sequence[str], hashes: Sequence[str]) -> str:
+    """Fingerprint of a whole document: its ordered chunk ids and their content hashes."""
+    h = hashlib.sha256()
+    for chunk_id, chunk_hash in zip(ids, hashes):
+        h.update(f"{chunk_id}:{chunk_hash}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _embed(embedder: EmbeddingService, texts: List[str]) -> List[List[float]]:
+    with span("embed") as s:
+        embs = embedder.embed(texts)
+        chars = sum(map(len, texts))
+        s.add(items=len(texts), bytes=chars, tokens=chars // 4)
+    return embs
+
+
+def index_stream(rows: Iterable[Dict], embedder: EmbeddingService, store: VectorStore,
+                 window_size: int = 256, max_pending: int = 2) -> int:
+    """
+    Embed and save rows in bounded windows. Embedding runs on the calling thread while a
+    writer thread saves finished windows; the queue between them holds at most
+    `max_pending` windows, so a slow store throttles embedding instead of buffering the corpus.
+    """
+    pending: "queue.Queue" = queue.Queue(maxsize=max_pending)
+    errors: List[BaseException] = []
+    saved = 0
+
+    def _writer():
+        nonlocal saved
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                return
+            if errors:
+                continue  # drain so the producer never blocks after a failure
+            ids, texts, metas, embs = item
+            try:
+                with span("store.save") as s:
+                    store.save(ids, texts, metas, embs)
+                    s.add(items=len(ids))
+                saved += len(ids)
+                logging.info(f'saved window, total indexed: {saved}')
+            except BaseException as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=_writer, name="index-writer", daemon=True)
+    writer.start()
+    positions: Dict[str, int] = {}
+    try:
+        for window in iter_windows(rows, window_size):
+            if errors:
+                break
+            texts = [row["text"] for row in window]
+            ids = [row["id"] for row in window]
+            metas = []
+            for row in window:
+                i = positions.get(row["source"], 0)
+                positions[row["source"]] = i + 1
+                metas.append({"source": row["source"], "i": i, "content_hash": content_hash(row["text"]),
+                              **chunk_fields(row)})
+            pending.put((ids, texts, metas, _embed(embedder, texts)))
+    finally:
+        pending.put(_DONE)
+        writer.join()
+    if errors:
+        raise errors[0]
+    return saved
+
+
+def index_full(rows: Iterable[Dict], embedder: EmbeddingService, store: VectorStore, window_size: int = 256) -> int:
+    """
+    Rebuild the store from `rows`. Existing chunks are removed first: on a persisted store
+    save() does not overwrite ids that are already there (Chroma's add ignores them), so
+    stale text and embeddings, and chunks no longer in `rows`, would otherwise survive.
+    """
+    existing = list(store.get_metadata())
+    if existing:
+        logging.info(f'full build: removing {len(existing)} previously indexed chunks')
+        store.delete(existing)
+    return index_stream(rows, embedder, store, window_size=window_size)
+
+
+def index_incremental(rows: Iterable[Dict], embedder: EmbeddingService, store: VectorStore,
+                      window_size: int = 256) -> Dict[str, int]:
+    """
+    Bring the store in line with `rows`, touching only what changed.
+
+    Rows must be grouped by source (as ingest writes them). Documents whose fingerprint
+    matches the stored one are skipped; otherwise only chunks with a new content hash are
+    embedded and upserted, unchanged chunks get their metadata refreshed, and chunks that
+    no longer exist - including every chunk of a vanished document - are deleted.
+    """
+    existing: Dict[str, Dict[str, Dict]] = {}
+    for chunk_id, meta in store.get_metadata().items():
+        existing.setdefault(meta.get("source", ""), {})[chunk_id] = meta
+
+    stats = {"docs": 0, "docs_changed": 0, "unchanged": 0, "upserted": 0, "deleted": 0}
+    batch_ids: List[str] = []
+    batch_texts: List[str] = []
+    batch_metas: List[Dict] = []
+    seen = set()
+
+    def _flush():
+        if batch_ids:
+            embs = _embed(embedder, batch_texts)
+            with span("store.save") as s:
+                store.upsert(batch_ids, batch_texts, batch_metas, embs)
+                s.add(items=len(batch_ids))
+            stats["upserted"] += len(batch_ids)
+            batch_ids.clear()
+            batch_texts.clear()
+            batch_metas.clear()
+
+    for source, group in groupby(rows, key=lambda r: r["source"]):
+        if source in seen:
+            raise ValueError(f"chunks of {source} are not contiguous in the chunk file")
+        seen.add(source)
+        stats["docs"] += 1
+        group = list(group)
+        ids = [row["id"] for row in group]
+        hashes = [content_hash(row["text"]) for row in group]
+        fingerprint = document_fingerprint(ids, hashes)
+        old = existing.pop(source, {})
+        current = set(ids)
+        if set(old) == current and all(m.get("doc_fingerprint") == fingerprint for m in old.values()):
+            stats["unchanged"] += len(ids)
+            continue
+
+        stats["docs_changed"] += 1
+        refresh_ids, refresh_metas = [], []
+        for i, (row, chunk_hash) in enumerate(zip(group, hashes)):
+            meta = {"source": source, "i": i, "content_hash": chunk_hash, "doc_fingerprint": fingerprint,
+                    **chunk_fields(row)}
+            prev = old.get(row["id"])
+            if prev is not None and prev.get("content_hash") == chunk_hash:
+                refresh_ids.append(row["id"])
+                refresh_metas.append(meta)
+                stats["unchanged"] += 1
+                continue
+            batch_ids.append(row["id"])
+            batch_texts.append(row["text"])
+            batch_metas.append(meta)
+            if len(batch_ids) >= window_size:
+                _flush()
+        if refresh_ids:
+            store.update_metadata(refresh_ids, refresh_metas)
+        stale = [chunk_id for chunk_id in old if chunk_id not in current]
+        store.delete(stale)
+        stats["deleted"] += len(stale)
+    _flush()
+
+    for source, old in existing.items():
+        logging.info(f'removing {len(old)} chunks of vanished document {source}')
+        store.delete(list(old))
+        stats["deleted"] += len(old)
+
+    logging.info(f'incremental index: {stats}')
+    return stats
+
+
+def build_lexical(chunk_file: Path, path: str) -> BM25Index:
+    """Rebuild the BM25 index from the chunk file; cheap enough to redo on every run."""
+    with span("lexical.build") as s:
+        index = BM25Index.build(iter_chunks(chunk_file))
+        index.save(path)
+        s.add(items=len(index))
+    return index
+
 
-def main(chunk_file: Path):
-    embedder = get_embedding_service()
-    store = get_vector_store()
-    rows = [json.loads(line) for line in chunk_file.read_text(encoding="utf-8").splitlines()]
-    texts = [row["text"] for row in rows]
-    ids = [row["id"] for row in rows]
-    metas = [{"source": row["source"], "i": i} for i, row in enumerate(rows)]
-    embs = embedder.embed(texts)
-    store.save(ids, texts, metas, embs)
-    print(f"indexed {len(ids)} chunks")
+def main(chunk_file: Path = CHUNKS_FILE, window_size: int = 256, incremental: bool = False,
+         retrain: bool = False):
+    cfg = load_config()
+    embedder = get_embedding_service(cfg)
+    store = get_vector_store(cfg)
+    if incremental:
+        stats = index_incremental(iter_chunks(chunk_file), embedder, store, window_size=window_size)
+        print(f"upserted {stats['upserted']}, deleted {stats['deleted']}, unchanged {stats['unchanged']} chunks")
+    else:
+        count = index_full(iter_chunks(chunk_file), embedder, store, window_size=window_size)
+        print(f"indexed {count} chunks")
+    # an IVF store trains its lists on the first large-enough flush and afterwards only
+    # assigns new rows; --retrain re-clusters everything, e.g. after the corpus has drifted
+    if retrain and hasattr(store, "retrain"):
+        store.retrain()
+    with span("store.flush"):
+        store.flush()
+    if hasattr(store, "stats"):
+        print(f"vector index: {store.stats()}")
+    lex_cfg = cfg.get("lexical") or {}
+    if lex_cfg.get("enabled"):
+        index = build_lexical(chunk_file, lex_cfg["path"])
+        print(f"bm25: {len(index)} chunks, {len(index.terms)} terms -> {lex_cfg['path']}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Embed data/chunks.jsonl into the configured vector store.")
+    parser.add_argument("chunk_file", nargs="?", type=Path, default=CHUNKS_FILE)
+    parser.add_argument("--window-size", type=int, default=256)
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert changed chunks and delete stale ones instead of a full build")
+    parser.add_argument("--retrain", action="store_true", help="re-cluster the IVF index from scratch")
+    args = parser.parse_args()
+    main(args.chunk_file, args.window_size, args.incremental, args.retrain)
@@ -0,0 +1,106 @@
+"""
+Move chunks between vector-store shards after changing vector_store.shards.
+
+A chunk's shard is a jump consistent hash of its id over the shard count, so growing
+from N to N + 1 shards moves about 1/(N + 1) of the chunks and shrinking moves only the
+chunks on removed shards. Shard 0 of every layout is the unsharded store (see
+services.factory.shard_section), so sharding an existing store from 1 to N shards copies
+only the (N - 1)/N of its chunks that land on the new shards. With `shard_paths`
+configured, shard 0 is shard_paths[0], and the unsharded store at persist_path counts as
+shard 0 only if it is that same directory. Every current shard is scanned once; chunks
+that belong elsewhere are upserted into their new shard and deleted from the old one once
+its scan is done, so an interrupted run can simply be repeated.
+
+    python -m index.rebalance --shards 8 --dry-run
+    python -m index.rebalance --shards 8          # then set vector_store.shards: 8
+"""
+import argparse
+import json
+import logging
+from collections import Counter
+from typing import Dict, List
+
+from services.factory import load_config, open_store, shard_section
+from services.vectorstores.base import VectorStore
+from services.vectorstores.sharded_store import shard_for
+
+
+def layout(vs_cfg: Dict, n_shards: int) -> List[Dict]:
+    """Store sections of an `n_shards` layout, as the factory opens them."""
+    if n_shards == 1:
+        section = dict(vs_cfg, shards=1)
+        section.pop("shard_paths", None)
+        return [section]
+    return [shard_section(vs_cfg, i) for i in range(n_shards)]
+
+
+def open_layouts(vs_cfg: Dict, old: int, new: int):
+    """
+    (sources, targets, stores) for moving from `old` to `new` shards. Each physical store
+    is opened once, and shard i of both layouts is the same store.
+    """
+    stores: Dict[str, VectorStore] = {}
+    old_keys, new_keys = [], []
+    for keys, n in ((old_keys, old), (new_keys, new)):
+        for section in layout(vs_cfg, n):
+            key = json.dumps(section, sort_keys=True)
+            if key not in stores:
+                stores[key] = open_store(section)
+            keys.append(key)
+    retired = [stores[k] for k in set(old_keys) - set(new_keys)]
+    return [stores[k] for k in old_keys], [stores[k] for k in new_keys], retired
+
+
+def rebalance(sources: List[VectorStore], targets: List[VectorStore], batch_size: int = 1000,
+              dry_run: bool = False) -> Dict:
+    """Move every chunk of `sources` whose shard among `targets` is a different store."""
+    moves: Counter = Counter()
+    for src, store in enumerate(sources):
+        stale = []
+        for batch in store.scan(batch_size):
+            by_dst: Dict[int, List[int]] = {}
+            for row, chunk_id in enumerate(batch["ids"]):
+                dst = shard_for(chunk_id, len(targets))
+                if targets[dst] is not store:
+                    by_dst.setdefault(dst, []).append(row)
+            for dst, rows in by_dst.items():
+                moves[f"{src}->{dst}"] += len(rows)
+                if not dry_run:
+                    targets[dst].upsert([batch["ids"][r] for r in rows], [batch["documents"][r] for r in rows],
+                                        [batch["metadatas"][r] for r in rows], [batch["embeddings"][r] for r in rows])
+                stale.extend(batch["ids"][r] for r in rows)
+        if not dry_run and stale:
+            store.delete(stale)
+        logging.info(f'shard {src}: {len(stale)} chunks {"would move" if dry_run else "moved"}')
+    if not dry_run:
+        for store in {id(s): s for s in sources + targets}.values():
+            store.flush()
+    return {"moved": sum(moves.values()), "moves": dict(moves)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, required=True, help="new shard count")
+    parser.add_argument("--from-shards", type=int, help="current shard count (default: vector_store.shards)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report how many chunks would move")
+    args = parser.parse_args()
+
+    vs_cfg = load_config()["vector_store"]
+    if not vs_cfg.get("persist_path") and not vs_cfg.get("shard_paths"):
+        parser.error("rebalancing needs a persistent store (vector_store.persist_path)")
+    old = args.from_shards or vs_cfg.get("shards", 1)
+    sources, targets, retired = open_layouts(vs_cfg, old, args.shards)
+    before = [s.count() for s in sources]
+    result = rebalance(sources, targets, args.batch_size, args.dry_run)
+    result.update(before=before, after=None if args.dry_run else [s.count() for s in targets])
+    if not args.dry_run:
+        for store in retired:
+            store.delete_collection(getattr(store, "collection_name", ""))
+    print(json.dumps(result, indent=2))
+    if not args.dry_run and old != args.shards:
+        print(f"now set vector_store.shards: {args.shards}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+
+from services.factory import load_config
+from services.vectorstores.chroma_store import ChromaStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot or restore the persistent vector store.")
+    parser.add_argument("action", choices=["snapshot", "restore"])
+    parser.add_argument("--path", help="snapshot directory (default: vector_store.snapshot_path)")
+    args = parser.parse_args()
+
+    cfg = load_config()["vector_store"]
+    snapshot_path = args.path or cfg.get("snapshot_path", "data/chroma_snapshot")
+    if not cfg.get("persist_path"):
+        raise SystemExit("vector_store.persist_path is not configured")
+    if args.action == "snapshot":
+        store = ChromaStore(collection_name=cfg.get("collection_name", "doc_intel_eval"),
+                            persist_path=cfg["persist_path"])
+        print(f"snapshot written to {store.snapshot(snapshot_path)}")
+    else:
+        ChromaStore.restore(snapshot_path, cfg["persist_path"])
+        print(f"restored {snapshot_path} -> {cfg['persist_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Chunking engine used by ingest.
+
+`chunk_text_llama` builds a new SentenceSplitter for every call and returns bare strings.
+`Chunker` keeps one splitter - with its tokenizer and sentence tokenizer - per
+(chunk_size, chunk_overlap) for the life of the process, chunks many documents per call
+and returns every chunk with its character span and page range in the document text.
+Chunk boundaries are the splitter's own, so output matches chunk_text_llama exactly
+(`python -m ingest.chunker --validate` checks this on the configured sources).
+
+Select with `chunking.method` in settings.yaml:
+    cached_sentence_splitter   shared splitter, offsets recorded (default)
+    llama_sentence_splitter    a fresh splitter per document, as before
+"""
+import argparse
+import json
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("cached_sentence_splitter", "llama_sentence_splitter")
+
+
+@dataclass
+class Chunk:
+    text: str
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    page: Optional[int] = None       # 1-based page holding the first character
+    page_end: Optional[int] = None   # 1-based page holding the last character
+
+    def offsets(self) -> Dict[str, int]:
+        """The offset fields that are known, ready to merge into chunk metadata."""
+        return {k: v for k, v in asdict(self).items() if k != "text" and v is not None}
+
+
+def _build_splitter(chunk_size: int, chunk_overlap: int):
+    from llama_index.core.node_parser import SentenceSplitter
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+@lru_cache(maxsize=None)
+def get_splitter(chunk_size: int, chunk_overlap: int):
+    """Process-wide SentenceSplitter per configuration; worker processes build their own once."""
+    return _build_splitter(chunk_size, chunk_overlap)
+
+
+def join_pages(pages: Sequence[str]) -> str:
+    """Document text as ingest builds it: every page followed by a newline."""
+    return "".join(page + "\n" for page in pages)
+
+
+def page_starts(pages: Sequence[str]) -> List[int]:
+    starts, pos = [], 0
+    for page in pages:
+        starts.append(pos)
+        pos += len(page) + 1
+    return starts
+
+
+def locate(text: str, pieces: Sequence[str], starts: Sequence[int] = (0,)) -> List[Chunk]:
+    """
+    Find each chunk in `text`, in order. Chunks overlap, so the search for the next one
+    resumes just past the previous start; a chunk that is not a verbatim substring
+    (the splitter strips whitespace at the edges, nothing else) is kept without offsets.
+    """
+    chunks: List[Chunk] = []
+    cursor = 0
+    for piece in pieces:
+        i = text.find(piece, cursor)
+        if i < 0:
+            chunks.append(Chunk(piece))
+            continue
+        end = i + len(piece)
+        chunks.append(Chunk(piece, i, end, bisect_right(starts, i), bisect_right(starts, max(i, end - 1))))
+        cursor = i + 1
+    return chunks
+
+
+class Chunker:
+    def __init__(self, chunk_size: int = 600, chunk_overlap: int = 150, method: str = "cached_sentence_splitter"):
+        if method not in METHODS:
+            raise ValueError(f"unknown chunking method {method!r}, expected one of {METHODS}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.method = method
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "Chunker":
+        chunking = cfg.get("chunking") or {}
+        return cls(chunking.get("chunk_size", 600), chunking.get("chunk_overlap", 150),
+                   chunking.get("method", "cached_sentence_splitter"))
+
+    def _splitter(self):
+        if self.method == "llama_sentence_splitter":
+            return _build_splitter(self.chunk_size, self.chunk_overlap)
+        return get_splitter(self.chunk_size, self.chunk_overlap)
+
+    def split(self, text: str) -> List[str]:
+        """Chunk texts only, without offsets."""
+        return self._splitter().split_text(text) if text else []
+
+    def chunk_pages(self, pages: Sequence[str]) -> List[Chunk]:
+        text = join_pages(pages)
+        return locate(text, self.split(text), page_starts(pages))
+
+    def chunk_text(self, text: str) -> List[Chunk]:
+        return locate(text, self.split(text))
+
+    def chunk_documents(self, documents: Sequence[Sequence[str]]) -> List[List[Chunk]]:
+        """Chunk many documents (each a list of page texts) with one splitter."""
+        splitter = self._splitter()
+        out = []
+        for pages in documents:
+            text = join_pages(pages)
+            out.append(locate(text, splitter.split_text(text) if text else [], page_starts(pages)))
+        return out
+
+
+def validate(documents: Sequence[Sequence[str]], chunk_size: int = 600, chunk_overlap: int = 150,
+             sources: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Compare Chunker output with chunk_text_llama and check every recorded span maps back
+    to its chunk text. Returns counts plus the mismatching documents: their entries in
+    `sources` when given, otherwise their indices in `documents`.
+    """
+    from ingest.ingest_pdfs import chunk_text_llama
+
+    report = {"docs": 0, "chunks": 0, "boundary_mismatches": [], "missing_offsets": 0, "bad_offsets": 0}
+    chunker = Chunker(chunk_size, chunk_overlap)
+    for n, (pages, chunks) in enumerate(zip(documents, chunker.chunk_documents(documents))):
+        text = join_pages(pages)
+        report["docs"] += 1
+        report["chunks"] += len(chunks)
+        if [c.text for c in chunks] != chunk_text_llama(text, chunk_size, chunk_overlap):
+            report["boundary_mismatches"].append(sources[n] if sources is not None else n)
+        for c in chunks:
+            if c.char_start is None:
+                report["missing_offsets"] += 1
+            elif text[c.char_start:c.char_end] != c.text:
+                report["bad_offsets"] += 1
+    return report
+
+
+def main():
+    from ingest.ingest_pdfs import extract_pages, resolve_sources
+    from services.factory import load_config
+
+    parser = argparse.ArgumentParser(description="Check the chunking engine against the LlamaIndex splitter.")
+    parser.add_argument("--validate", action="store_true", required=True)
+    parser.parse_args()
+
+    cfg = load_config()
+    sources = resolve_sources(cfg["ingest"]["sources"])
+    documents = [extract_pages(p) for p in sources]
+    report = validate(documents, cfg["chunking"]["chunk_size"], cfg["chunking"]["chunk_overlap"],
+                      [str(p) for p in sources])
+    print(json.dumps(report, indent=2))
+    if report["boundary_mismatches"] or report["bad_offsets"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Page-level PDF extraction.
+
+Large documents are split into page ranges that worker processes extract independently
+(each opens the PDF with only its own pages loaded), and extracted page text is cached in
+SQLite keyed by (file hash, page number), so re-ingesting an unchanged PDF skips
+pdfplumber entirely and a partially cached one only extracts the missing pages.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: Path, block_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def page_count(path: Path) -> int:
+    """Number of pages, read from the page tree root instead of materializing every page."""
+    import pdfplumber
+    from pdfminer.pdftypes import resolve1
+
+    with pdfplumber.open(path) as pdf:
+        try:
+            return int(resolve1(resolve1(pdf.doc.catalog["Pages"])["Count"]))
+        except (KeyError, TypeError, ValueError):
+            return len(pdf.pages)
+
+
+def probe(path: Path) -> Tuple[str, int]:
+    return file_hash(path), page_count(path)
+
+
+def extract_range(path: Path, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Text of pages [start, stop) (0-based, `stop=None` for the rest); loads only those pages."""
+    import pdfplumber
+
+    pages = None if start == 0 and stop is None else list(range(start + 1, (page_count(path) if stop is None else stop) + 1))
+    with pdfplumber.open(path, pages=pages) as pdf:
+        return [p.extract_text() or "" for p in pdf.pages]
+
+
+def page_ranges(missing: Sequence[int], range_size: int) -> List[Tuple[int, int]]:
+    """Group sorted page numbers into contiguous [start, stop) runs of at most `range_size` pages."""
+    ranges: List[Tuple[int, int]] = []
+    for page in missing:
+        if ranges and ranges[-1][1] == page and page - ranges[-1][0] < range_size:
+            ranges[-1] = (ranges[-1][0], page + 1)
+        else:
+            ranges.append((page, page + 1))
+    return ranges
+
+
+class PageCache:
+    """Extracted page text keyed by (file hash, page number)."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (file_hash TEXT, page INTEGER, text TEXT, PRIMARY KEY (file_hash, page))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS documents (file_hash TEXT PRIMARY KEY, pages INTEGER)")
+        self._conn.commit()
+
+    def page_count(self, digest: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM documents WHERE file_hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, digest: str) -> Dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT page, text FROM pages WHERE file_hash = ?", (digest,)).fetchall()
+        return dict(rows)
+
+    def put(self, digest: str, pages: Dict[int, str], total: Optional[int] = None) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                                   [(digest, n, text) for n, text in pages.items()])
+            if total is not None:
+                self._conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (digest, total))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DocumentPages:
+    """Assembles one document's pages from the cache and extracted ranges."""
+
+    def __init__(self, path: Path, digest: str, total: int, cached: Dict[int, str]):
+        self.path = path
+        self.digest = digest
+        self.total = total
+        self.pages: Dict[int, str] = {n: t for n, t in cached.items() if n < total}
+        self.cached = len(self.pages)
+        self.extract_s = 0.0
+
+    def missing_ranges(self, range_size: int) -> List[Tuple[int, int]]:
+        return page_ranges([n for n in range(self.total) if n not in self.pages], range_size)
+
+    def add(self, start: int, texts: Sequence[str]) -> Dict[int, str]:
+        added = {start + i: t for i, t in enumerate(texts)}
+        self.pages.update(added)
+        return added
+
+    @property
+    def complete(self) -> bool:
+        return len(self.pages) >= self.total
+
+    def ordered(self) -> List[str]:
+        return [self.pages[n] for n in range(self.total)]
+
+
+def extract_pages(path: Path, cache: Optional[PageCache] = None, range_size: int = 64) -> List[str]:
+    """Extract every page of a PDF in-process, reusing and filling `cache` when given."""
+    if cache is None:
+        return extract_range(path)
+    digest = file_hash(path)
+    total = cache.page_count(digest)
+    if total is None:
+        total = page_count(path)
+    doc = DocumentPages(path, digest, total, cache.get(digest))
+    for start, stop in doc.missing_ranges(range_size):
+        cache.put(digest, doc.add(start, extract_range(path, start, stop)))
+    cache.put(digest, {}, total)
+    if doc.cached:
+        logger.info(f'{path}: {doc.cached}/{total} pages from cache')
+    return doc.ordered()
@@ -1,40 +1,236 @@
+import argparse
+import hashlib
 import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from glob import glob
 from pathlib import Path
-import pdfplumber
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import json
+from dataclasses import asdict
+
+from ingest import extract
+from ingest.chunker import Chunker
+from ingest.extract import PageCache
+from services import telemetry
 from services.factory import load_config
-from llama_index.core.node_parser import SentenceSplitter
+
+CHUNKS_FILE = Path("data/chunks.jsonl")
 
 
 # LlamaIndex splitter import local to avoid heavy import unless used
 def chunk_text_llama(text, chunk_size=600, chunk_overlap=150):
-    logging.info(f'chunking text: {text[:10] if text else None} . . ,chunk_size: {chunk_size},overlap: {chunk_overlap}')
+    logging.debug(f'chunking text: {text[:10] if text else None} . . ,chunk_size: {chunk_size},overlap: {chunk_overlap}')
+    from llama_index.core.node_parser import SentenceSplitter
 
     splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     nodes = splitter.split_text(text)
     return [getattr(n, "get_content", lambda: str(n))() for n in nodes]
 
 
+def extract_pages(path: Path, cache: Optional[PageCache] = None) -> List[str]:
+    """Extract the text of every page of a PDF, one string per page."""
+    logging.info(f'extracting pages from: {path}')
+    return extract.extract_pages(path, cache)
+
+
 def extract_text(path: Path) -> str:
     logging.info(f'extracting text from: {path}')
-    txt = ""
-    with pdfplumber.open(path) as pdf:
-        for p in pdf.pages:
-            txt += (p.extract_text() or "") + "\n"
-    return txt
+    return "".join(page + "\n" for page in extract_pages(path))
+
+
+def _expand(entry: Dict) -> List[Path]:
+    raw = str(entry["path"])
+    target = Path(raw)
+    if target.is_dir():
+        return sorted(target.rglob("*.pdf"))
+    if any(ch in raw for ch in "*?["):
+        return sorted(Path(m) for m in glob(raw, recursive=True))
+    return [target]
+
+
+def resolve_sources(sources: Sequence[Dict]) -> List[Path]:
+    """Expand configured source entries (files, directories or glob patterns) into PDF paths."""
+    resolved: Dict[str, Path] = {}
+    for entry in sources:
+        for m in _expand(entry):
+            resolved.setdefault(m.as_posix(), m)
+    return list(resolved.values())
+
+
+def source_tenants(sources: Sequence[Dict], default: Optional[str] = None) -> Dict[str, str]:
+    """Tenant of each resolved source path: the entry's `tenant`, else `default` (first matching entry wins)."""
+    tenants: Dict[str, str] = {}
+    for entry in sources:
+        tenant = entry.get("tenant", default)
+        if tenant is None:
+            continue
+        for m in _expand(entry):
+            tenants.setdefault(str(m), tenant)
+    return tenants
+
+
+def document_id(path: Path) -> str:
+    """Stable identifier for a source document, used as the chunk id prefix."""
+    return hashlib.sha1(Path(path).as_posix().encode("utf-8")).hexdigest()[:12]
+
+
+def chunk_document(source: Path, pages: List[str], chunk_size: int = 600, chunk_overlap: int = 150,
+                   method: str = "cached_sentence_splitter", extract_s: float = 0.0) -> Dict:
+    """Chunk an already extracted document; runs inside a worker process."""
+    start = time.perf_counter()
+    chunks = [asdict(c) for c in Chunker(chunk_size, chunk_overlap, method).chunk_pages(pages)]
+    # timings travel back with the result; worker processes have their own metrics registry
+    timings = {"extract": extract_s, "chunk": time.perf_counter() - start,
+               "bytes": sum(len(page) + 1 for page in pages)}
+    return {"source": str(source), "doc_id": document_id(source), "pages": len(pages), "chunks": chunks,
+            "timings": timings}
+
+
+def ingest_document(path: Path, chunk_size: int = 600, chunk_overlap: int = 150,
+                    method: str = "cached_sentence_splitter", cache: Optional[PageCache] = None) -> Dict:
+    """Extract and chunk a single document in-process."""
+    start = time.perf_counter()
+    pages = extract_pages(path, cache)
+    return chunk_document(path, pages, chunk_size, chunk_overlap, method, time.perf_counter() - start)
+
+
+def _timed_extract_range(path: Path, start: int, stop: int) -> Tuple[List[str], float]:
+    began = time.perf_counter()
+    return extract.extract_range(path, start, stop), time.perf_counter() - began
+
+
+def _ingest_parallel(pool: ProcessPoolExecutor, paths: Sequence[Path], chunk_args: Tuple,
+                     cache: Optional[PageCache], range_size: int, record, fail) -> None:
+    """
+    Schedule every document as page ranges on one pool: probe (hash + page count), extract
+    the ranges not already cached, then chunk once all of a document's pages are in. A
+    2,000-page manual thus spreads over every worker instead of pinning one.
+    """
+    futures: Dict = {pool.submit(extract.probe, p): ("probe", p, None) for p in paths}
+    docs: Dict[Path, extract.DocumentPages] = {}
+
+    def _chunk(doc: extract.DocumentPages) -> None:
+        docs.pop(doc.path, None)
+        futures[pool.submit(chunk_document, doc.path, doc.ordered(), *chunk_args, doc.extract_s)] = \
+            ("chunk", doc.path, None)
+
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for fut in done:
+            kind, path, start = futures.pop(fut)
+            try:
+                if kind == "probe":
+                    digest, total = fut.result()
+                    doc = docs[path] = extract.DocumentPages(path, digest, total, cache.get(digest) if cache else {})
+                    if cache is not None:
+                        cache.put(digest, {}, total)
+                    ranges = doc.missing_ranges(range_size)
+                    for r_start, r_stop in ranges:
+                        futures[pool.submit(_timed_extract_range, path, r_start, r_stop)] = ("extract", path, r_start)
+                    if not ranges:
+                        _chunk(doc)
+                elif kind == "extract":
+                    texts, seconds = fut.result()
+                    doc = docs.get(path)
+                    if doc is None:
+                        continue  # another range of this document already failed
+                    added = doc.add(start, texts)
+                    doc.extract_s += seconds
+                    if cache is not None:
+                        cache.put(doc.digest, added)
+                    if doc.complete:
+                        _chunk(doc)
+                else:
+                    record(fut.result())
+            except Exception as e:
+                if path in docs or kind != "extract":
+                    docs.pop(path, None)
+                    fail(path, e)
+
+
+def _write_document(fh, doc: Dict, tenant: Optional[str] = None) -> None:
+    ingested_at = int(time.time())
+    for i, c in enumerate(doc["chunks"]):
+        row = {"id": f"{doc['doc_id']}-chunk-{i}", "text": c["text"], "source": doc["source"], "doc_id": doc["doc_id"],
+               "ingested_at": ingested_at}
+        if tenant is not None:
+            row["tenant"] = tenant
+        row.update((k, v) for k, v in c.items() if k != "text" and v is not None)
+        fh.write(json.dumps(row) + "\n")
+
+
+def ingest_sources(paths: Sequence[Path], out: Path = CHUNKS_FILE, chunk_size: int = 600,
+                   chunk_overlap: int = 150, workers: int = None, method: str = "cached_sentence_splitter",
+                   page_cache: Optional[str] = None, range_size: int = 64,
+                   tenants: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Extract and chunk many documents across a process pool, streaming chunks into `out`
+    as each document finishes. Documents are extracted in ranges of `range_size` pages,
+    with page text cached in `page_cache` (SQLite) when set. Returns a throughput report.
+    """
+    workers = workers or os.cpu_count() or 1
+    out.parent.mkdir(parents=True, exist_ok=True)
+    report = {"docs": 0, "pages": 0, "chunks": 0, "failed": 0, "workers": workers}
+    start = time.perf_counter()
+
+    def _record(doc: Dict) -> None:
+        _write_document(fh, doc, (tenants or {}).get(doc["source"]))
+        report["docs"] += 1
+        report["pages"] += doc["pages"]
+        report["chunks"] += len(doc["chunks"])
+        timings = doc.get("timings") or {}
+        if timings:
+            telemetry.record("extract", timings["extract"], items=doc["pages"], bytes=timings["bytes"])
+            telemetry.record("chunk", timings["chunk"], items=len(doc["chunks"]), bytes=timings["bytes"])
+
+    def _fail(path: Path, e: Exception) -> None:
+        report["failed"] += 1
+        logging.error(f'ingest failed for {path}: {e}')
+
+    cache = PageCache(page_cache) if page_cache else None
+    try:
+        with out.open("w", encoding="utf-8") as fh:
+            if workers == 1:
+                for p in paths:
+                    try:
+                        _record(ingest_document(p, chunk_size, chunk_overlap, method, cache))
+                    except Exception as e:
+                        _fail(p, e)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    _ingest_parallel(pool, paths, (chunk_size, chunk_overlap, method), cache, range_size,
+                                     _record, _fail)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["docs_per_sec"] = round(report["docs"] / elapsed, 2) if elapsed else 0.0
+    report["pages_per_sec"] = round(report["pages"] / elapsed, 2) if elapsed else 0.0
+    logging.info(f'ingest throughput: {report}')
+    return report
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract and chunk configured PDF sources.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: ingest.workers or cpu count)")
+    parser.add_argument("--out", type=Path, default=CHUNKS_FILE)
+    args = parser.parse_args()
+
     cfg = load_config()
-    src = Path(cfg["ingest"]["sources"][0]["path"])
-    out = Path("data/chunks.jsonl")
-    out.parent.mkdir(parents=True, exist_ok=True)
-    text = extract_text(src)
-    chunks = chunk_text_llama(text, cfg["chunking"]["chunk_size"], cfg["chunking"]["chunk_overlap"])
-    with out.open("w", encoding="utf-8") as fh:
-        for i, c in enumerate(chunks):
-            fh.write(json.dumps({"id": f"chunk-{i}", "text": c, "source": str(src)}) + "\n")
-    print(f"wrote {len(chunks)} chunks -> {out}")
+    paths = resolve_sources(cfg["ingest"]["sources"])
+    workers = args.workers or cfg["ingest"].get("workers")
+    chunking = cfg["chunking"]
+    report = ingest_sources(paths, args.out, chunking["chunk_size"], chunking["chunk_overlap"], workers,
+                            chunking.get("method", "cached_sentence_splitter"),
+                            cfg["ingest"].get("page_cache"), cfg["ingest"].get("range_size", 64),
+                            source_tenants(cfg["ingest"]["sources"], cfg["ingest"].get("tenant")))
+    print(f"wrote {report['chunks']} chunks from {report['docs']} docs -> {args.out} "
+          f"({report['docs_per_sec']} docs/sec, {report['pages_per_sec']} pages/sec)")
 
 
 if __name__ == "__main__":
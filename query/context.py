@@ -0,0 +1,186 @@
+"""
+Prompt context packing.
+
+Retrieved chunks overlap by `chunking.chunk_overlap` and neighbouring chunks of one
+document are often retrieved together, so the passages handed to the LLM repeat text.
+ContextBuilder merges adjacent or overlapping chunks of the same source (by their "i"
+index and char offsets), drops repeated text, and packs the result greedily, best hit
+first, into an input-token budget. Each build returns a ContextReport with the tokens
+saved against plain concatenation.
+"""
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+_SPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def text_overlap(a: str, b: str, probe: int = 32) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`; overlaps shorter than `probe` count as 0."""
+    head = b[:probe]
+    if not head:
+        return 0
+    pos = a.find(head, max(0, len(a) - len(b)))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return 0
+
+
+@dataclass
+class Passage:
+    text: str
+    meta: Dict
+    rank: int  # best retrieval rank among the chunks merged into it
+    ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ContextReport:
+    passages_in: int = 0
+    passages_out: int = 0
+    merged: int = 0  # chunks folded into a neighbour
+    duplicates: int = 0  # passages or lines dropped as repeats
+    dropped: int = 0  # passages that did not fit the budget
+    truncated: bool = False
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def as_dict(self) -> Dict:
+        return dict(asdict(self), tokens_saved=self.tokens_saved)
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens: Optional[int] = None, merge: bool = True, dedupe_min_chars: int = 40):
+        self.max_tokens = max_tokens
+        self.merge = merge
+        self.dedupe_min_chars = dedupe_min_chars
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "ContextBuilder":
+        ctx_cfg = cfg.get("context") or {}
+        return cls(max_tokens=ctx_cfg.get("max_input_tokens"), merge=ctx_cfg.get("merge_adjacent", True),
+                   dedupe_min_chars=ctx_cfg.get("dedupe_min_chars", 40))
+
+    def build(self, docs: Sequence[str], metas: Sequence[Dict], ids: Optional[Sequence[str]] = None
+              ) -> Tuple[List[str], List[Dict], ContextReport]:
+        """Packed (docs, metas) for the prompt, best passage first, plus what packing saved."""
+        ids = list(ids) if ids is not None else [str(n) for n in range(len(docs))]
+        report = ContextReport(passages_in=len(docs), tokens_in=sum(estimate_tokens(d) for d in docs))
+        passages = [Passage(d, dict(m or {}), rank, [i]) for rank, (d, m, i) in enumerate(zip(docs, metas, ids))]
+        if self.merge:
+            passages = self._merge(passages, report)
+        passages = self._dedupe(sorted(passages, key=lambda p: p.rank), report)
+        passages = self._pack(passages, report)
+        report.passages_out = len(passages)
+        report.tokens_out = sum(estimate_tokens(p.text) for p in passages)
+        return [p.text for p in passages], [p.meta for p in passages], report
+
+    # --- merging -----------------------------------------------------------------------
+
+    def _merge(self, passages: List[Passage], report: ContextReport) -> List[Passage]:
+        by_source: Dict[str, List[Passage]] = {}
+        loose = []
+        for p in passages:
+            if "source" in p.meta and isinstance(p.meta.get("i"), int):
+                by_source.setdefault(p.meta["source"], []).append(p)
+            else:
+                loose.append(p)
+        out = loose
+        for group in by_source.values():
+            group.sort(key=lambda p: p.meta["i"])
+            current = group[0]
+            for p in group[1:]:
+                joined = self._join(current, p)
+                if joined is None:
+                    out.append(current)
+                    current = p
+                else:
+                    current = joined
+                    report.merged += 1
+            out.append(current)
+        return out
+
+    @staticmethod
+    def _join(a: Passage, b: Passage) -> Optional[Passage]:
+        """`a` followed by `b` without the text they share, or None when they are not neighbours."""
+        a_end, b_start = a.meta.get("char_end"), b.meta.get("char_start")
+        offsets = isinstance(a_end, int) and isinstance(b_start, int)
+        if offsets and b_start <= a_end:
+            shared = a_end - b_start
+            # offsets are exact when each text spans its offsets; otherwise match the text
+            if shared and b.text[:shared] != a.text[-shared:]:
+                shared = text_overlap(a.text, b.text)
+        elif b.meta["i"] - a.meta["i"] == 1:
+            shared = 0 if offsets else text_overlap(a.text, b.text)
+        else:
+            return None
+        text = a.text + b.text[shared:] if shared else f"{a.text}\n{b.text}"
+        meta = dict(a.meta)
+        for key in ("char_end", "page_end"):
+            if key in b.meta:
+                meta[key] = b.meta[key]
+        meta["i_end"] = b.meta.get("i_end", b.meta["i"])
+        return Passage(text, meta, min(a.rank, b.rank), a.ids + b.ids)
+
+    # --- dedupe and packing ------------------------------------------------------------
+
+    def _dedupe(self, passages: List[Passage], report: ContextReport) -> List[Passage]:
+        """Drop passages already contained in a better-ranked one, and repeated long lines."""
+        kept: List[Passage] = []
+        seen_text: List[str] = []
+        seen_lines = set()
+        for p in passages:
+            norm = _SPACE.sub(" ", p.text).strip()
+            if not norm or any(norm in s for s in seen_text):
+                report.duplicates += 1
+                continue
+            if self.dedupe_min_chars:
+                lines = []
+                for line in p.text.split("\n"):
+                    key = _SPACE.sub(" ", line).strip()
+                    if len(key) >= self.dedupe_min_chars:
+                        if key in seen_lines:
+                            report.duplicates += 1
+                            continue
+                        seen_lines.add(key)
+                    lines.append(line)
+                p.text = "\n".join(lines)
+                if not p.text.strip():
+                    continue
+            seen_text.append(norm)
+            kept.append(p)
+        return kept
+
+    def _pack(self, passages: List[Passage], report: ContextReport) -> List[Passage]:
+        if self.max_tokens is None:
+            return passages
+        packed, used = [], 0
+        for p in passages:
+            tokens = estimate_tokens(p.text)
+            if used + tokens <= self.max_tokens:
+                packed.append(p)
+                used += tokens
+            elif not packed:
+                # the best passage alone is over budget: keep its head rather than nothing
+                cut = p.text[: self.max_tokens * CHARS_PER_TOKEN]
+                p.text = cut[: cut.rfind(" ")] if " " in cut else cut
+                packed.append(p)
+                used = estimate_tokens(p.text)
+                report.truncated = True
+            else:
+                report.dropped += 1
+        return packed
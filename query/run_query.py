@@ -1,22 +1,24 @@
+import argparse
+import asyncio
+import atexit
+import json
 import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from llama_index.core.evaluation import FaithfulnessEvaluator, AnswerRelevancyEvaluator, EvaluationResult
+from eval.pipeline import EvalRecord
+from services.llm.streaming import StreamStats
+from services import telemetry
+from services.telemetry import request_id_var, request_scope, span
+from services.factory import (get_context_builder, get_embedding_service, get_vector_store, get_llm_service,
+                              get_answer_cache, get_eval_pipeline, get_lexical_index)
 
-from services.factory import get_embedding_service, get_vector_store, get_llm_service
 
-
-def search_and_synthesize(query: str, n_results=3, cfg=None):
-    logging.info(f'synthesizing query: {query}')
-
-    embedder = get_embedding_service(cfg)
-    store = get_vector_store(cfg)
-    q_emb = embedder.embed([query])[0]
-    hits = store.query(q_emb, n_results=n_results)
-    # Format passages for prompt
-    docs = hits.get("documents", [[]])[0]
-    metas = hits.get("metadatas", [[]])[0]
+def build_prompt(query: str, docs: Sequence[str], metas: Sequence[Dict]) -> str:
     passages = "\n\n".join([f"[{i + 1}] {m.get('source', '')}: {d}" for i, (d, m) in enumerate(zip(docs, metas))])
-    prompt = f"""
+    return f"""
     Answer using only the passages.
     Add references.
     Query:
@@ -28,67 +30,319 @@ def search_and_synthesize(query: str, n_results=3, cfg=None):
     If not found, say 'Answer not found.
     """
 
-    llm = get_llm_service()
-    response = llm.synthesize(prompt)
+
+def prompt_for_hits(query: str, hits: Dict, context=None) -> Tuple[str, List[str], List[Dict]]:
+    """
+    Prompt for one query's hits, with the passages packed by `context` (a ContextBuilder)
+    when given. Returns (prompt, docs, metas) as they went into the prompt.
+    """
+    docs = hits.get("documents", [[]])[0]
+    metas = hits.get("metadatas", [[]])[0]
+    with span("prompt") as s:
+        if context is not None:
+            docs, metas, report = context.build(docs, metas, hits.get("ids", [[]])[0])
+            s.add(tokens=report.tokens_out, tokens_saved=report.tokens_saved)
+            logging.info(f'context: {report.tokens_out} tokens, {report.tokens_saved} saved '
+                         f'({report.merged} merged, {report.duplicates} duplicates, {report.dropped} over budget)')
+        prompt = build_prompt(query, docs, metas)
+        s.add(bytes=len(prompt))
+    return prompt, docs, metas
+
+
+def _hits_from_ids(store, ids: Sequence[str], known: Optional[Dict] = None) -> Dict:
+    """Single-query hits dict for `ids` in order, reusing rows already in `known` (vector hits)."""
+    rows = {}
+    if known:
+        for i, d, m, dist in zip(known["ids"][0], known["documents"][0], known["metadatas"][0],
+                                 known["distances"][0]):
+            rows[i] = (d, m, dist)
+    missing = [i for i in ids if i not in rows]
+    if missing:
+        got = store.get(missing)
+        for i, d, m in zip(got["ids"], got["documents"], got["metadatas"]):
+            rows[i] = (d, m, None)  # lexical-only hit: no vector distance
+    ids = [i for i in ids if i in rows]
+    return {"ids": [ids], "documents": [[rows[i][0] for i in ids]], "metadatas": [[rows[i][1] for i in ids]],
+            "distances": [[rows[i][2] for i in ids]]}
+
+
+def _in_scope(store, lexical_hits: List, where: Dict) -> List:
+    """Lexical hits whose chunk metadata matches `where`."""
+    from services.vectorstores.metadata_index import matches
+    got = store.get([i for i, _ in lexical_hits])
+    keep = {i for i, m in zip(got["ids"], got["metadatas"]) if matches(m or {}, where)}
+    return [hit for hit in lexical_hits if hit[0] in keep]
+
+
+def retrieve(query: str, n_results=3, cfg=None, search_params: Optional[Dict] = None,
+             where: Optional[Dict] = None) -> Tuple[Dict, Optional[List[float]]]:
+    """
+    Hits for `query` plus its embedding. With a lexical index configured, an exact
+    identifier match is answered from BM25 alone (no embedding call, embedding None);
+    otherwise the vector and BM25 rankings are fused by reciprocal rank.
+    `search_params` go to the vector store for this request only (e.g. {"nprobe": 16}).
+    `where` scopes retrieval to chunks whose metadata matches it, e.g. {"tenant": "acme"}
+    or {"doc_id": "report.pdf", "page": {"$lte": 10}}; see services/vectorstores/metadata_index.py.
+    """
+    store = get_vector_store(cfg)
+    lexical = get_lexical_index(cfg)
+    lexical_hits = []
+    if lexical is not None:
+        with span("retrieve.lexical") as s:
+            lexical_hits = lexical.search(query)
+            if where and lexical_hits:
+                lexical_hits = _in_scope(store, lexical_hits, where)
+            s.add(items=len(lexical_hits))
+        if lexical.confident(query, lexical_hits):
+            logging.info(f'lexical fast path: {lexical_hits[0][0]}')
+            return _hits_from_ids(store, [i for i, _ in lexical_hits[:n_results]]), None
+
+    embedder = get_embedding_service(cfg)
+    with span("embed") as s:
+        q_emb = embedder.embed([query])[0]
+        s.add(items=1, bytes=len(query))
+    with span("retrieve") as s:
+        k = max(n_results, lexical.candidates) if lexical_hits else n_results
+        params = dict(search_params or {}, where=where) if where else search_params or {}
+        hits = store.query(q_emb, n_results=k, **params)
+        s.add(items=len(hits.get("ids", [[]])[0]))
+    if lexical_hits:
+        fused = lexical.fuse(hits.get("ids", [[]])[0], lexical_hits)[:n_results]
+        hits = _hits_from_ids(store, fused, hits)
+    return hits, q_emb
+
+
+def search_and_synthesize(query: str, n_results=3, cfg=None, search_params: Optional[Dict] = None,
+                          where: Optional[Dict] = None):
+    with request_scope():
+        return _search_and_synthesize(query, n_results, cfg, search_params, where)
+
+
+def _search_and_synthesize(query: str, n_results=3, cfg=None, search_params: Optional[Dict] = None,
+                           where: Optional[Dict] = None):
+    logging.info(f'synthesizing query: {query}')
+
+    store = get_vector_store(cfg)
+    hits, q_emb = retrieve(query, n_results, cfg, search_params, where)
+    chunk_ids, chunk_docs = hits.get("ids", [[]])[0], hits.get("documents", [[]])[0]
+    # the answer cache is keyed on the query embedding, which the lexical fast path skips
+    answer_cache = get_answer_cache(cfg) if q_emb is not None else None
+    if answer_cache is not None:
+        cached = answer_cache.lookup(q_emb, chunk_ids, store.generation, chunk_docs)
+        if cached is not None:
+            logging.info(f'answer cache hit, stats: {answer_cache.stats()}')
+            return cached, hits
+    prompt, docs, metas = prompt_for_hits(query, hits, get_context_builder(cfg))
+
+    llm = get_llm_service(cfg)
+    with span("synthesize") as s:
+        response = llm.synthesize(prompt)
+        s.add(items=1)
+    if answer_cache is not None and isinstance(response, str):
+        answer_cache.put(q_emb, chunk_ids, response, store.generation, chunk_docs)
     response_text = response if isinstance(response, str) else getattr(response, "text", str(response))
+    submit_evaluation(get_eval_pipeline(cfg), query, response_text, docs, metas)
+    return response, hits
 
-    # --- contexts for evaluators ---
+
+def submit_evaluation(eval_pipeline, query: str, answer: str, docs: Sequence[str], metas: Sequence[Dict]) -> None:
+    """Hand a finished answer to the sampled background evaluation (eval/pipeline.py), off the query path."""
+    if eval_pipeline is None:
+        return
     contexts = [f"{m.get('source', 'source')}: {d}" for d, m in zip(docs, metas)]
+    eval_pipeline.submit(EvalRecord(query=query, answer=answer, contexts=contexts, request_id=request_id_var.get()))
 
-    # --- evaluators (only 2, as requested) ---
-    evaluations = {}
-
-    try:
-        rel_eval = AnswerRelevancyEvaluator()
-        rel_res: EvaluationResult = rel_eval.evaluate(query=query, response=response_text, contexts=contexts)
-        evaluations["AnswerRelevancyEvaluator"] = rel_res.to_dict() if hasattr(rel_res, "to_dict") else rel_res
-        logging.info(f"AnswerRelevancyEvaluator -> {evaluations['AnswerRelevancyEvaluator']}")
-    except Exception as e:
-        evaluations["AnswerRelevancyEvaluator"] = {"error": str(e)}
-        logging.debug(f"AnswerRelevancyEvaluator failed: {e}")
-
-    try:
-        faith_eval = FaithfulnessEvaluator()
-        faith_res: EvaluationResult = faith_eval.evaluate(query=query, response=response_text, contexts=contexts)
-        evaluations["FaithfulnessEvaluator"] = faith_res.to_dict() if hasattr(faith_res, "to_dict") else faith_res
-        logging.info(f"FaithfulnessEvaluator -> {evaluations['FaithfulnessEvaluator']}")
-    except Exception as e:
-        evaluations["FaithfulnessEvaluator"] = {"error": str(e)}
-        logging.debug(f"FaithfulnessEvaluator failed: {e}")
 
-    return response, hits
+def _when_complete(stream: Iterator[str], on_complete: Callable[[str], None]) -> Iterator[str]:
+    parts = []
+    for text in stream:
+        parts.append(text)
+        yield text
+    on_complete("".join(parts))
 
 
-async def synthesize(query: str, n_results=3, cfg=None):
-    logging.info(f'synthesizing query: {query}')
+async def _awhen_complete(stream: AsyncIterator[str], on_complete: Callable[[str], None]) -> AsyncIterator[str]:
+    parts = []
+    async for text in stream:
+        parts.append(text)
+        yield text
+    on_complete("".join(parts))
 
-    embedder = get_embedding_service(cfg)
+
+def _finish_stream(cfg, query: str, answer_cache, q_emb, chunk_ids, generation, chunk_docs,
+                   docs, metas) -> Callable[[str], None]:
+    """What a streamed answer does once complete: fill the answer cache and submit it for evaluation."""
+    eval_pipeline = get_eval_pipeline(cfg)
+
+    def on_complete(answer: str) -> None:
+        if answer_cache is not None:
+            answer_cache.put(q_emb, chunk_ids, answer, generation, chunk_docs)
+        submit_evaluation(eval_pipeline, query, answer, docs, metas)
+    return on_complete
+
+
+async def _aiter_one(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+def search_and_synthesize_stream(query: str, n_results=3, cfg=None, stats: Optional[StreamStats] = None,
+                                 search_params: Optional[Dict] = None, where: Optional[Dict] = None
+                                 ) -> Tuple[Iterator[str], Dict]:
+    """
+    Like search_and_synthesize, but returns (token_stream, hits) so callers can forward
+    partial answers as they arrive. Time-to-first-token and tokens/sec land in `stats`.
+    """
+    logging.info(f'streaming query: {query}')
     store = get_vector_store(cfg)
-    q_emb = embedder.embed([query])[0]
-    hits = store.query(q_emb, n_results=n_results)
-    # Format passages for prompt
-    docs = hits.get("documents", [[]])[0]
-    metas = hits.get("metadatas", [[]])[0]
-    passages = "\n\n".join([f"[{i + 1}] {m.get('source', '')}: {d}" for i, (d, m) in enumerate(zip(docs, metas))])
-    prompt = f"""
-    Answer using only the passages. 
-    Query:
-    {query}
+    hits, q_emb = retrieve(query, n_results, cfg, search_params, where)
+    chunk_ids, chunk_docs = hits.get("ids", [[]])[0], hits.get("documents", [[]])[0]
+    answer_cache = get_answer_cache(cfg) if q_emb is not None else None
+    if answer_cache is not None:
+        cached = answer_cache.lookup(q_emb, chunk_ids, store.generation, chunk_docs)
+        if cached is not None:
+            return iter([cached]), hits
+    prompt, docs, metas = prompt_for_hits(query, hits, get_context_builder(cfg))
+    stream = get_llm_service(cfg).synthesize_stream(prompt, stats=stats)
+    on_complete = _finish_stream(cfg, query, answer_cache, q_emb, chunk_ids, store.generation, chunk_docs, docs, metas)
+    return _when_complete(stream, on_complete), hits
 
-    Passages:
-    {passages}
 
-    If not found, say 'Answer not found.
+async def asearch_and_synthesize_stream(query: str, n_results=3, cfg=None,
+                                        stats: Optional[StreamStats] = None, where: Optional[Dict] = None
+                                        ) -> Tuple[AsyncIterator[str], Dict]:
+    """Async variant of search_and_synthesize_stream; retrieval runs off the event loop."""
+    logging.info(f'streaming query: {query}')
+    store = get_vector_store(cfg)
+    hits, q_emb = await asyncio.to_thread(retrieve, query, n_results, cfg, None, where)
+    chunk_ids, chunk_docs = hits.get("ids", [[]])[0], hits.get("documents", [[]])[0]
+    answer_cache = get_answer_cache(cfg) if q_emb is not None else None
+    if answer_cache is not None:
+        cached = answer_cache.lookup(q_emb, chunk_ids, store.generation, chunk_docs)
+        if cached is not None:
+            return _aiter_one(cached), hits
+    prompt, docs, metas = prompt_for_hits(query, hits, get_context_builder(cfg))
+    stream = get_llm_service(cfg).asynthesize_stream(prompt, stats=stats)
+    on_complete = _finish_stream(cfg, query, answer_cache, q_emb, chunk_ids, store.generation, chunk_docs, docs, metas)
+    return _awhen_complete(stream, on_complete), hits
+
+
+def split_hits(hits: Dict, n_queries: int) -> List[Dict]:
+    """Split a multi-query result dict into one single-query dict per query."""
+    keys = [k for k, v in hits.items() if isinstance(v, list) and len(v) == n_queries]
+    return [{k: [hits[k][i]] for k in keys} for i in range(n_queries)]
+
+
+def search_and_synthesize_batch(queries: Sequence[str], n_results=3, cfg=None,
+                                max_concurrency: int = 4) -> List[Tuple[str, Dict]]:
     """
+    Answer many queries at once: one batched embedding request, one multi-query vector
+    search, then synthesis with at most `max_concurrency` LLM calls in flight.
+    Returns (answer, hits) per query in input order.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    logging.info(f'synthesizing batch of {len(queries)} queries')
+
+    embedder = get_embedding_service(cfg)
+    store = get_vector_store(cfg)
+    llm = get_llm_service(cfg)
+    with span("embed") as s:
+        q_embs = embedder.embed(queries)
+        s.add(items=len(queries), bytes=sum(len(q) for q in queries))
+    with span("retrieve") as s:
+        per_query = split_hits(store.query_batch(q_embs, n_results=n_results), len(queries))
+        s.add(items=sum(len(h.get("ids", [[]])[0]) for h in per_query))
+
+    answer_cache = get_answer_cache(cfg)
+    context = get_context_builder(cfg)
+
+    def _answer(args):
+        query, q_emb, hits = args
+        chunk_ids, chunk_docs = hits.get("ids", [[]])[0], hits.get("documents", [[]])[0]
+        if answer_cache is not None:
+            cached = answer_cache.lookup(q_emb, chunk_ids, store.generation, chunk_docs)
+            if cached is not None:
+                return cached
+        prompt, _, _ = prompt_for_hits(query, hits, context)
+        try:
+            with span("synthesize") as s:
+                answer = llm.synthesize(prompt)
+                s.add(items=1)
+        except Exception as e:
+            logging.error(f'synthesis failed for {query[:50]}: {e}')
+            return f"error: {e}"
+        if answer_cache is not None:
+            answer_cache.put(q_emb, chunk_ids, answer, store.generation, chunk_docs)
+        return answer
 
-    llm = get_llm_service()
-    answer = await llm.synthesize_agentic(prompt)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        answers = list(pool.map(_answer, zip(queries, q_embs, per_query)))
+    return list(zip(answers, per_query))
+
+
+def run_batch(in_path: Path, out_path: Path, field: str = "query", n_results: int = 3,
+              max_concurrency: int = 4, cfg=None) -> int:
+    """JSONL in, JSONL out: each input record gets `answer`, `ids` and `distances` added."""
+    records = [json.loads(line) for line in in_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    results = search_and_synthesize_batch([str(r[field]) for r in records], n_results, cfg, max_concurrency)
+    with out_path.open("w", encoding="utf-8") as fh:
+        for record, (answer, hits) in zip(records, results):
+            record = dict(record, answer=answer, ids=hits.get("ids", [[]])[0],
+                          distances=hits.get("distances", [[]])[0])
+            fh.write(json.dumps(record) + "\n")
+    return len(records)
+
+
+async def synthesize(query: str, n_results=3, cfg=None, search_params: Optional[Dict] = None,
+                     where: Optional[Dict] = None):
+    """Agentic variant of search_and_synthesize; retrieval and context match the sync path."""
+    logging.info(f'synthesizing query: {query}')
+
+    # lexical search, embedding and vector search are blocking calls; keep them off the event loop
+    hits, _ = await asyncio.to_thread(retrieve, query, n_results, cfg, search_params, where)
+    prompt, _, _ = prompt_for_hits(query, hits, get_context_builder(cfg))
+
+    llm = get_llm_service(cfg)
+    with span("synthesize") as s:
+        answer = await llm.synthesize_agentic(prompt)
+        s.add(items=1)
     return answer, hits
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer questions over the indexed corpus.")
+    parser.add_argument("--batch", type=Path, help="JSONL file of queries to answer in one batch")
+    parser.add_argument("--out", type=Path, default=Path("data/answers.jsonl"), help="JSONL output for --batch")
+    parser.add_argument("--field", default="query", help="record field holding the query text")
+    parser.add_argument("--n-results", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4, help="max concurrent LLM calls")
+    parser.add_argument("--stream", action="store_true", help="print the answer as it is generated")
+    parser.add_argument("--metrics-out", type=Path, help="enable stage telemetry and write a JSON snapshot here")
+    parser.add_argument("--nprobe", type=int, help="IVF lists to scan for this query (vector_store.index: ivf)")
+    parser.add_argument("--where", type=json.loads,
+                        help='metadata filter as JSON, e.g. \'{"tenant": "acme", "page": {"$lte": 10}}\'')
+    args = parser.parse_args()
+    search_params = {"nprobe": args.nprobe} if args.nprobe else None
+    if args.metrics_out:
+        telemetry.enable()
+        atexit.register(telemetry.metrics.write_snapshot, str(args.metrics_out))
+    if args.batch:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        n = run_batch(args.batch, args.out, args.field, args.n_results, args.concurrency)
+        print(f"answered {n} queries -> {args.out}")
+        sys.exit(0)
+
     q = input("Question: ").strip()
-    ans, hits = search_and_synthesize(q)
-    print(ans)
+    if args.stream:
+        stream_stats = StreamStats()
+        tokens, hits = search_and_synthesize_stream(q, args.n_results, stats=stream_stats, search_params=search_params,
+                                                   where=args.where)
+        for text in tokens:
+            print(text, end="", flush=True)
+        print(f"\n(ttft {stream_stats.ttft_s or 0:.2f}s, {stream_stats.tokens_per_sec or 0:.1f} tokens/sec)")
+    else:
+        ans, hits = search_and_synthesize(q, args.n_results, search_params=search_params, where=args.where)
+        print(ans)
     for i, h in enumerate(hits.get("documents", [[]])[0], 1):
         print(f"[{i}] {h[:200]}")
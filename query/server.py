@@ -0,0 +1,280 @@
+"""
+Long-running asyncio query service.
+
+Concurrent queries are collected into micro-batches so one embedding request and one
+multi-query vector search serve the whole batch; identical in-flight queries are
+coalesced into a single computation, and new work is shed once the queue is full.
+
+    python -m query.server --port 8080
+    curl -XPOST localhost:8080/query -d '{"query": "what are the key concepts?"}'
+    curl localhost:8080/metrics   # Prometheus text; GET /stats for JSON
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from query.run_query import prompt_for_hits, split_hits, submit_evaluation
+from services import telemetry
+from services.embedding.base import EmbeddingService
+from services.llm.base import LLMService
+from services.telemetry import request_scope, span
+from services.vectorstores.base import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(RuntimeError):
+    """Raised when the request queue is full and the query is shed."""
+
+
+def _coalesce_key(query: str) -> str:
+    return " ".join(query.split())
+
+
+class QueryServer:
+    def __init__(self, embedder: EmbeddingService, store: VectorStore, llm: LLMService, n_results: int = 3,
+                 max_batch: int = 32, max_wait_ms: float = 5.0, max_queue: int = 1024,
+                 max_concurrent_synthesis: int = 16, max_inflight_batches: int = 4, context=None,
+                 max_body_bytes: int = 1 << 20, answer_cache=None, eval_pipeline=None):
+        self.embedder = embedder
+        self.store = store
+        self.llm = llm
+        self.n_results = n_results
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.max_concurrent_synthesis = max_concurrent_synthesis
+        self.max_inflight_batches = max_inflight_batches
+        self.context = context  # query.context.ContextBuilder packing the prompt passages, if any
+        self.max_body_bytes = max_body_bytes  # larger HTTP request bodies are rejected with 413
+        self.answer_cache = answer_cache  # services.llm.answer_cache.SemanticAnswerCache, if any
+        self.eval_pipeline = eval_pipeline  # eval.pipeline.EvaluationPipeline sampling served answers, if any
+        self.stats = {"received": 0, "coalesced": 0, "shed": 0, "batches": 0, "batched_queries": 0,
+                      "cached": 0, "errors": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._synthesis: Optional[asyncio.Semaphore] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._synthesis = asyncio.Semaphore(self.max_concurrent_synthesis)
+        self._batch_slots = asyncio.Semaphore(self.max_inflight_batches)
+        self._batcher = asyncio.create_task(self._batch_loop(), name="query-batcher")
+
+    async def stop(self) -> None:
+        if self._batcher:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def answer(self, query: str) -> Tuple[str, Dict]:
+        """Answer one query; returns (answer, hits) like run_query.search_and_synthesize."""
+        self.stats["received"] += 1
+        key = _coalesce_key(query)
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            # the caller's context (request id, stage breakdown) travels with the query
+            self._queue.put_nowait((query, fut, contextvars.copy_context()))
+        except asyncio.QueueFull:
+            self.stats["shed"] += 1
+            raise Overloaded(f"query queue full ({self.max_queue})")
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # only pull work when a batch slot is free, so excess load stays queued and is shed
+            await self._batch_slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch: List[Tuple[str, asyncio.Future, contextvars.Context]]) -> None:
+        try:
+            await self._process_batch(batch)
+        finally:
+            self._batch_slots.release()
+
+    async def _process_batch(self, batch: List[Tuple[str, asyncio.Future, contextvars.Context]]) -> None:
+        self.stats["batches"] += 1
+        self.stats["batched_queries"] += len(batch)
+        queries = [q for q, _, _ in batch]
+        contexts = [ctx for _, _, ctx in batch]
+        try:
+            start = time.perf_counter()
+            with span("embed") as s:
+                embs = await asyncio.to_thread(self.embedder.embed, queries)
+                s.add(items=len(queries), bytes=sum(len(q) for q in queries))
+            telemetry.share("embed", time.perf_counter() - start, contexts)
+            start = time.perf_counter()
+            with span("retrieve") as s:
+                hits = await asyncio.to_thread(self.store.query_batch, embs, self.n_results)
+                s.add(items=len(queries))
+            telemetry.share("retrieve", time.perf_counter() - start, contexts)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f'retrieval failed for batch of {len(batch)}: {e}')
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        per_query = split_hits(hits, len(batch))
+        # each answer is synthesized in its request's context, so its spans and logs carry the request
+        tasks = [ctx.run(asyncio.create_task, self._synthesize(q, e, h, fut))
+                 for (q, fut, ctx), e, h in zip(batch, embs, per_query)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _synthesize(self, query: str, q_emb, hits: Dict, fut: asyncio.Future) -> None:
+        # every failure lands on `fut`, otherwise the waiting client would hang
+        chunk_ids, chunk_docs = hits.get("ids", [[]])[0], hits.get("documents", [[]])[0]
+        generation = self.store.generation
+        try:
+            if self.answer_cache is not None:
+                cached = await asyncio.to_thread(self.answer_cache.lookup, q_emb, chunk_ids, generation, chunk_docs)
+                if cached is not None:
+                    self.stats["cached"] += 1
+                    if not fut.done():
+                        fut.set_result((cached, hits))
+                    return
+            prompt, docs, metas = prompt_for_hits(query, hits, self.context)
+            async with self._synthesis:
+                with span("synthesize") as s:
+                    answer = await asyncio.to_thread(self.llm.synthesize, prompt)
+                    s.add(items=1)
+            if self.answer_cache is not None and isinstance(answer, str):
+                self.answer_cache.put(q_emb, chunk_ids, answer, generation, chunk_docs)
+            submit_evaluation(self.eval_pipeline, query, answer, docs, metas)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result((answer, hits))
+
+    def snapshot(self) -> Dict:
+        batches = self.stats["batches"]
+        return {**self.stats,
+                "queue_depth": self._queue.qsize() if self._queue else 0,
+                "inflight": len(self._inflight),
+                "avg_batch_size": round(self.stats["batched_queries"] / batches, 2) if batches else 0.0}
+
+
+# --- thin HTTP adapter ---------------------------------------------------------------------
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict,
+                   content_type: str = "application/json") -> None:
+    body = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    writer.write(head.encode("ascii") + body)
+    await writer.drain()
+    writer.close()
+
+
+async def _handle(server: QueryServer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            return await _respond(writer, 400, {"error": "invalid Content-Length"})
+        if length < 0:
+            return await _respond(writer, 400, {"error": "invalid Content-Length"})
+        if length > server.max_body_bytes:
+            return await _respond(writer, 413, {"error": f"body exceeds {server.max_body_bytes} bytes"})
+        body = await reader.readexactly(length)
+        if len(request_line) < 2:
+            return await _respond(writer, 400, {"error": "malformed request"})
+        method, path = request_line[0], request_line[1]
+        if method == "GET" and path == "/stats":
+            return await _respond(writer, 200, {**server.snapshot(), "telemetry": telemetry.metrics.snapshot()})
+        if method == "GET" and path == "/metrics":
+            return await _respond(writer, 200, telemetry.metrics.to_prometheus(), "text/plain; version=0.0.4")
+        if method != "POST" or path != "/query":
+            return await _respond(writer, 404, {"error": f"no route for {method} {path}"})
+        try:
+            query = json.loads(body or b"{}")["query"]
+        except (ValueError, KeyError, TypeError):
+            return await _respond(writer, 400, {"error": "body must be JSON with a 'query' field"})
+        try:
+            with request_scope(headers.get("x-request-id")):
+                answer, hits = await server.answer(str(query))
+        except Overloaded as e:
+            return await _respond(writer, 503, {"error": str(e)})
+        await _respond(writer, 200, {"answer": answer, "ids": hits.get("ids", [[]])[0],
+                                     "distances": hits.get("distances", [[]])[0]})
+    except Exception as e:
+        logger.error(f'request failed: {e}')
+        if not writer.is_closing():
+            await _respond(writer, 500, {"error": str(e)})
+
+
+async def serve_http(server: QueryServer, host: str = "127.0.0.1", port: int = 8080) -> None:
+    await server.start()
+    http = await asyncio.start_server(lambda r, w: _handle(server, r, w), host, port)
+    logger.info(f'query server listening on {host}:{port}')
+    try:
+        async with http:
+            await http.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    from config.logging_config import setup_logging
+    from services.factory import (get_answer_cache, get_context_builder, get_embedding_service, get_eval_pipeline,
+                                  get_vector_store, get_llm_service, load_config)
+
+    parser = argparse.ArgumentParser(description="Run the async query server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    setup_logging()
+    cfg = load_config()
+    srv_cfg = cfg.get("server") or {}
+    server = QueryServer(get_embedding_service(cfg), get_vector_store(cfg), get_llm_service(cfg),
+                         context=get_context_builder(cfg), answer_cache=get_answer_cache(cfg),
+                         eval_pipeline=get_eval_pipeline(cfg), **srv_cfg)
+    asyncio.run(serve_http(server, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
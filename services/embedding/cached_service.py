@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .base import EmbeddingService
+
+# sqlite default SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds
+_LOOKUP_CHUNK = 500
+
+
+class CachedEmbeddingService(EmbeddingService):
+    """
+    Persistent, content-addressed cache in front of any EmbeddingService.
+
+    Vectors are stored in SQLite as float32 blobs keyed by sha256 of
+    (model, task_type, output_dimensionality, text). Only cache misses are sent
+    upstream; the least recently used entries are evicted beyond `max_entries`.
+    Hits only record their use time in memory; those timestamps are written in one
+    batch before an eviction, every `touch_batch` hits, and on close, so reads stay reads.
+    """
+
+    def __init__(self, inner: EmbeddingService, path: str = "data/embedding_cache.sqlite",
+                 max_entries: int = 1_000_000, touch_batch: int = 1024):
+        self.inner = inner
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logging.info(f'embedding cache at {self.path}, entries: {self._size}')
+
+    def _key(self, text: str, task_type: Optional[str], output_dimensionality: Optional[int]) -> str:
+        model = getattr(self.inner, "model", type(self.inner).__name__)
+        task = task_type or getattr(self.inner, "type", None)
+        dim = output_dimensionality or getattr(self.inner, "dimension", None)
+        raw = "\x1f".join([str(model), str(task), str(dim), text])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), _LOOKUP_CHUNK):
+            part = unique[i: i + _LOOKUP_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            self._touched.update(dict.fromkeys(found, now))
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+        return found
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def _store(self, items: Dict[str, Sequence[float]]) -> None:
+        now = time.time()
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (key, vec, last_used) VALUES (?, ?, ?)",
+            [(k, array("f", v).tobytes(), now) for k, v in items.items()],
+        )
+        self._size += self._conn.total_changes - before
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            self._flush_touched()
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (overflow,)
+            )
+            self._size -= overflow
+            logging.info(f'embedding cache evicted {overflow} entries')
+
+    def embed(self, texts: Sequence[str],
+              task_type: str = None,
+              output_dimensionality: int = None) -> List[List[float]]:
+        """Return cached vectors where available and embed only the misses."""
+        texts = list(texts)
+        keys = [self._key(t, task_type, output_dimensionality) for t in texts]
+        miss_index: Dict[str, int] = {}
+        with self._lock:
+            cached = self._lookup(keys)
+            for k in keys:
+                if k not in cached and k not in miss_index:
+                    miss_index[k] = len(miss_index)
+            self.hits += len(keys) - sum(1 for k in keys if k in miss_index)
+            self.misses += len(miss_index)
+
+        if miss_index:
+            miss_texts = [None] * len(miss_index)
+            for k, t in zip(keys, texts):
+                if k in miss_index:
+                    miss_texts[miss_index[k]] = t
+            kwargs = {}
+            if task_type:
+                kwargs["task_type"] = task_type
+            if output_dimensionality:
+                kwargs["output_dimensionality"] = output_dimensionality
+            fresh = self.inner.embed(miss_texts, **kwargs)
+            new_items = {k: fresh[i] for k, i in miss_index.items()}
+            with self._lock:
+                self._store(new_items)
+                self._conn.commit()
+            cached.update({k: list(v) for k, v in new_items.items()})
+
+        logging.info(f'embedding cache: {len(texts)} texts, {len(miss_index)} sent upstream')
+        return [cached[k] for k in keys]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, self._size
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+        inner_close = getattr(self.inner, "close", None)
+        if callable(inner_close):
+            inner_close()
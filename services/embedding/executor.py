@@ -0,0 +1,169 @@
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+EmbedCall = Callable[[List[str]], List[List[float]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for batching and rate limits."""
+    return max(1, len(text) // 4)
+
+
+def _transport_errors() -> tuple:
+    """Connection/timeout exception types of the HTTP clients that are loaded (never imports them)."""
+    errors = [ConnectionError, TimeoutError, socket.gaierror]
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        errors.append(httpx.TransportError)  # connect/read/write errors and timeouts
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        errors += [requests.exceptions.ConnectionError, requests.exceptions.Timeout]
+    return tuple(errors)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    True for rate-limit and server errors (429/5xx) raised by the SDK or an HTTP client,
+    and for transport failures without a status (connection resets, DNS errors, timeouts).
+    """
+    if isinstance(exc, _transport_errors()):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    try:
+        return int(status) in RETRYABLE_STATUS
+    except (TypeError, ValueError):
+        return False
+
+
+class RateLimiter:
+    """Token-bucket limiter over requests/sec and tokens/sec; a rate of None disables that bucket."""
+
+    def __init__(self, requests_per_sec: Optional[float] = None, tokens_per_sec: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.requests_per_sec = requests_per_sec
+        self.tokens_per_sec = tokens_per_sec
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        now = clock()
+        self._req_allowance = requests_per_sec or 0.0
+        self._tok_allowance = tokens_per_sec or 0.0
+        self._last = now
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_sec:
+            self._req_allowance = min(self.requests_per_sec, self._req_allowance + elapsed * self.requests_per_sec)
+        if self.tokens_per_sec:
+            self._tok_allowance = min(self.tokens_per_sec, self._tok_allowance + elapsed * self.tokens_per_sec)
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request carrying `tokens` tokens may be sent."""
+        if not self.requests_per_sec and not self.tokens_per_sec:
+            return
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                # a single request larger than the bucket is allowed once the bucket is full
+                need_tok = min(tokens, self.tokens_per_sec) if self.tokens_per_sec else 0
+                wait = 0.0
+                if self.requests_per_sec and self._req_allowance < 1:
+                    wait = max(wait, (1 - self._req_allowance) / self.requests_per_sec)
+                if self.tokens_per_sec and self._tok_allowance < need_tok:
+                    wait = max(wait, (need_tok - self._tok_allowance) / self.tokens_per_sec)
+                if wait <= 0:
+                    if self.requests_per_sec:
+                        self._req_allowance -= 1
+                    if self.tokens_per_sec:
+                        self._tok_allowance -= need_tok
+                    return
+            self._sleep(wait)
+
+
+class EmbeddingExecutor:
+    """
+    Runs embedding requests for a list of texts: deduplicates them, packs batches by
+    token budget, sends batches with bounded concurrency under a rate limit, and retries
+    429/5xx failures with jittered exponential backoff. Output order matches input order.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_batch_items: int = 100, max_batch_tokens: int = 8000,
+                 requests_per_sec: Optional[float] = None, tokens_per_sec: Optional[float] = None,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_concurrency = max_concurrency
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self.limiter = RateLimiter(requests_per_sec, tokens_per_sec, sleep=sleep)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+
+    def make_batches(self, texts: Sequence[str], max_batch_items: Optional[int] = None) -> List[List[str]]:
+        """Pack texts into batches bounded by item count and estimated token budget."""
+        max_items = max_batch_items or self.max_batch_items
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        budget = 0
+        for t in texts:
+            cost = estimate_tokens(t)
+            if batch and (len(batch) >= max_items or budget + cost > self.max_batch_tokens):
+                batches.append(batch)
+                batch, budget = [], 0
+            batch.append(t)
+            budget += cost
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _send(self, call: EmbedCall, batch: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(t) for t in batch)
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                vectors = call(batch)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay = random.uniform(0, delay)  # full jitter
+                attempt += 1
+                logger.warning(f'embedding batch failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s')
+                self._sleep(delay)
+                continue
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"embedding backend returned {len(vectors)} vectors for {len(batch)} texts")
+            return vectors
+
+    def run(self, texts: Sequence[str], call: EmbedCall, max_batch_items: Optional[int] = None) -> List[List[float]]:
+        """Embed `texts` through `call`, returning one vector per input text in order."""
+        texts = list(texts)
+        if not texts:
+            return []
+        unique = list(dict.fromkeys(texts))
+        batches = self.make_batches(unique, max_batch_items)
+        logger.info(f'embedding {len(texts)} texts ({len(unique)} unique) in {len(batches)} batches')
+        futures = [self._pool.submit(self._send, call, b) for b in batches]
+        by_text: Dict[str, List[float]] = {}
+        for batch, fut in zip(batches, futures):
+            by_text.update(zip(batch, fut.result()))
+        return [by_text[t] for t in texts]
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,45 @@
+import hashlib
+import math
+import re
+import time
+from typing import List, Sequence
+
+from .base import EmbeddingService
+
+_TOKEN = re.compile(r"\w+")
+
+
+class FakeEmbeddingService(EmbeddingService):
+    """
+    Deterministic offline stand-in for GenAIEmbeddingService.
+
+    Texts are embedded by hashing their words into `dimension` buckets (signed feature
+    hashing), so texts sharing vocabulary land close together and retrieval behaves
+    plausibly. `latency_s` per request and `per_item_latency_s` per text simulate the API.
+    """
+
+    def __init__(self, dimension: int = 256, latency_s: float = 0.0, per_item_latency_s: float = 0.0):
+        self.model: str = "fake-embedding"
+        self.dimension = dimension
+        self.type: str = "semantic_similarity"
+        self.latency_s = latency_s
+        self.per_item_latency_s = per_item_latency_s
+        self.requests = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vec = [0.0] * self.dimension
+        for token in _TOKEN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+        return [x / norm for x in vec]
+
+    def embed(self, texts: Sequence[str], task_type: str = None,
+              output_dimensionality: int = None) -> List[List[float]]:
+        texts = list(texts)
+        self.requests += 1
+        delay = self.latency_s + self.per_item_latency_s * len(texts)
+        if delay:
+            time.sleep(delay)
+        return [self._vector(t) for t in texts]
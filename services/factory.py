@@ -1,35 +1,284 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import yaml
 from pathlib import Path
 
-from services.embedding.genai_service import GenAIEmbeddingService
+from services.embedding.cached_service import CachedEmbeddingService
+from services.embedding.executor import EmbeddingExecutor
 from services.llm.base import LLMService
-from services.llm.genai_llm_service import GenAILLMService
-from services.vectorstores.chroma_store import ChromaStore
+
+# Provider backends (google.genai, chromadb, llama_index) are imported inside the
+# builders below so that only the selected backend is loaded, and only on first use.
+
+_config_lock = threading.Lock()
+_config_cache: Dict[str, Tuple[float, Dict]] = {}
 
 
 def load_config(path="config/settings.yaml"):
-    with open(path, "r") as fh:
-        logging.info('Loading config')
-        return yaml.safe_load(fh)
+    """Load settings.yaml, re-reading the file only when its mtime changes."""
+    key = os.path.abspath(path)
+    mtime = os.path.getmtime(key)
+    with _config_lock:
+        cached = _config_cache.get(key)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r") as fh:
+                logging.info('Loading config')
+                cached = (mtime, yaml.safe_load(fh))
+            _config_cache[key] = cached
+    return copy.deepcopy(cached[1])
 
 
-def get_embedding_service(cfg=None):
-    cfg = cfg or load_config()
+class ServiceRegistry:
+    """
+    Process-wide cache of long-lived services keyed by kind and the config section that
+    built them, so clients (and their pooled HTTP connections / collection handles) are
+    constructed once and shared across threads and asyncio tasks.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._services: Dict[Tuple[str, str], Any] = {}
+
+    @staticmethod
+    def _key(kind: str, section: Any) -> Tuple[str, str]:
+        return kind, json.dumps(section, sort_keys=True, default=str)
+
+    def get(self, kind: str, section: Any, build: Callable[[], Any], replace: bool = False) -> Any:
+        """
+        Cached service for (kind, section), built on first use. With `replace`, building
+        it closes the other cached services of that kind (older versions of one resource).
+        """
+        key = self._key(kind, section)
+        service = self._services.get(key)
+        if service is not None:
+            return service
+        stale = []
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                logging.info(f'registry: building {kind} service')
+                service = build()
+                if replace:
+                    stale = [self._services.pop(k) for k in list(self._services) if k[0] == kind]
+                self._services[key] = service
+        for old in stale:
+            self._close(old)
+        return service
+
+    @staticmethod
+    def _close(service: Any) -> None:
+        for name in ("close", "shutdown"):
+            hook = getattr(service, name, None)
+            if callable(hook):
+                try:
+                    hook()
+                except Exception as e:
+                    logging.warning(f'registry: {type(service).__name__}.{name} failed: {e}')
+                return
+
+    def refresh(self, kind: Optional[str] = None) -> None:
+        """Close and drop cached services (all, or one kind); the next get() rebuilds them."""
+        with self._lock:
+            doomed = [k for k in self._services if kind is None or k[0] == kind]
+            services = [self._services.pop(k) for k in doomed]
+        for service in services:
+            self._close(service)
+
+    def shutdown(self) -> None:
+        self.refresh()
+
+
+registry = ServiceRegistry()
+atexit.register(registry.shutdown)
+
+
+def shutdown_services() -> None:
+    """Close every cached service; call on process/server shutdown."""
+    registry.shutdown()
+
+
+def refresh_services(kind: Optional[str] = None) -> None:
+    """Rebuild services on next use, e.g. after settings.yaml or credentials change."""
+    registry.refresh(kind)
+
+
+def _build_embedding_service(cfg) -> Any:
     if cfg["embeddings"]["provider"] == "google.genai":
+        from services.embedding.genai_service import GenAIEmbeddingService
         logging.info('Creating GenAIEmbeddingService')
-        return GenAIEmbeddingService(api_key=cfg.get("google_api_key"))
-    raise RuntimeError("Unknown embedding provider")
+        executor = EmbeddingExecutor(**(cfg["embeddings"].get("executor") or {}))
+        service = GenAIEmbeddingService(api_key=cfg.get("google_api_key"), executor=executor)
+    elif cfg["embeddings"]["provider"] == "fake":
+        from services.embedding.fake_service import FakeEmbeddingService
+        logging.info('Creating FakeEmbeddingService')
+        fake_cfg = cfg["embeddings"].get("fake") or {}
+        service = FakeEmbeddingService(**fake_cfg)
+    else:
+        raise RuntimeError("Unknown embedding provider")
+    cache_cfg = cfg["embeddings"].get("cache") or {}
+    if cache_cfg.get("enabled"):
+        logging.info('Wrapping embedding service with CachedEmbeddingService')
+        return CachedEmbeddingService(service,
+                                      path=cache_cfg.get("path", "data/embedding_cache.sqlite"),
+                                      max_entries=cache_cfg.get("max_entries", 1_000_000),
+                                      touch_batch=cache_cfg.get("touch_batch", 1024))
+    return service
 
 
-def get_vector_store(cfg=None):
-    cfg = cfg or load_config()
-    if cfg["vector_store"]["type"] == "chroma":
+def shard_section(vs_cfg: Dict, i: int) -> Dict:
+    """
+    Config of shard `i`. Shard 0 is the unsharded store itself (same collection and
+    persist_path), so going from 1 to N shards leaves its chunks in place; shard i > 0 gets
+    collection `<collection_name>_shard<i>` in the sibling directory `<persist_path>-shard<i>`.
+    With `shard_paths`, shard i lives in shard_paths[i] instead.
+    """
+    section = dict(vs_cfg, shards=1)
+    section.pop("shard_paths", None)
+    if i:
+        section["collection_name"] = f'{vs_cfg.get("collection_name", "doc_intel_eval")}_shard{i}'
+    if vs_cfg.get("shard_paths"):
+        section["persist_path"] = vs_cfg["shard_paths"][i]
+    elif vs_cfg.get("persist_path") and i:
+        section["persist_path"] = f'{os.path.normpath(vs_cfg["persist_path"])}-shard{i}'
+    return section
+
+
+def open_shards(vs_cfg: Dict, n_shards: int) -> List[Any]:
+    """
+    Uncached stores for shards 0..n_shards-1 (used by the sharded store and index/rebalance.py);
+    a single shard is the plain, unsharded store.
+    """
+    if n_shards == 1:
+        return [open_store(vs_cfg)]
+    return [open_store(shard_section(vs_cfg, i)) for i in range(n_shards)]
+
+
+def _build_vector_store(cfg) -> Any:
+    vs_cfg = cfg["vector_store"]
+    n_shards = vs_cfg.get("shards", 1)
+    if n_shards > 1:
+        from services.vectorstores.sharded_store import ShardedStore
+        logging.info(f'Creating sharded store with {n_shards} {vs_cfg["type"]} shards')
+        return ShardedStore(open_shards(vs_cfg, n_shards))
+    return open_store(vs_cfg)
+
+
+def open_store(vs_cfg: Dict) -> Any:
+    """A new, uncached store for one `vector_store` section (ignores `shards`)."""
+    if vs_cfg["type"] == "chroma":
+        from services.vectorstores.chroma_store import ChromaStore
         logging.info('Creating chromadb store')
-        return ChromaStore(collection_name=cfg["vector_store"].get("collection_name", "doc_intel_eval"))
+        return ChromaStore(collection_name=vs_cfg.get("collection_name", "doc_intel_eval"),
+                           persist_path=vs_cfg.get("persist_path"))
+    if vs_cfg["type"] == "numpy" and vs_cfg.get("index", "flat") == "ivf":
+        from services.vectorstores.ivf_store import IVFStore
+        logging.info('Creating numpy store with IVF index')
+        return IVFStore(path=vs_cfg.get("persist_path"), nlist=vs_cfg.get("nlist"), nprobe=vs_cfg.get("nprobe", 8),
+                        min_train_rows=vs_cfg.get("min_train_rows", 10000), mmap=vs_cfg.get("mmap", True))
+    if vs_cfg["type"] == "numpy" and vs_cfg.get("quantization", "none") != "none":
+        from services.vectorstores.quantized_store import QuantizedStore
+        logging.info(f'Creating quantized numpy store ({vs_cfg["quantization"]})')
+        return QuantizedStore(path=vs_cfg.get("persist_path"), quantization=vs_cfg["quantization"],
+                              rerank_factor=vs_cfg.get("rerank_factor", 4))
+    if vs_cfg["type"] == "numpy":
+        from services.vectorstores.numpy_store import NumpyStore
+        logging.info('Creating numpy store')
+        return NumpyStore(path=vs_cfg.get("persist_path"), mmap=vs_cfg.get("mmap", True))
     raise RuntimeError("Unknown vectorstore")
 
 
+def get_embedding_service(cfg=None):
+    cfg = cfg or load_config()
+    section = {"embeddings": cfg["embeddings"], "api_key": cfg.get("google_api_key")}
+    return registry.get("embedding", section, lambda: _build_embedding_service(cfg))
+
+
+def get_vector_store(cfg=None):
+    cfg = cfg or load_config()
+    return registry.get("vector_store", cfg["vector_store"], lambda: _build_vector_store(cfg))
+
+
+def _build_llm_service(cfg) -> LLMService:
+    llm_cfg = cfg.get("llm") or {}
+    if llm_cfg.get("provider") == "fake":
+        from services.llm.fake_llm_service import FakeLLMService
+        logging.info('Creating FakeLLMService')
+        return FakeLLMService(**(llm_cfg.get("fake") or {}))
+    from services.llm.genai_llm_service import GenAILLMService
+    return GenAILLMService(api_key=cfg.get("google_api_key"), model=llm_cfg.get("model", "gemini-2.5-flash"),
+                           agent_model=llm_cfg.get("agent_model", "gemini-2.5-flash-lite"),
+                           agent_pool_size=llm_cfg.get("agent_pool_size", 4),
+                           agent_acquire_timeout=llm_cfg.get("agent_acquire_timeout_s"),
+                           max_output_tokens=llm_cfg.get("max_output_tokens", 1024))
+
+
 def get_llm_service(cfg=None) -> LLMService:
-    return GenAILLMService()
+    cfg = cfg or load_config()
+    section = {"llm": cfg.get("llm") or {}, "api_key": cfg.get("google_api_key")}
+    return registry.get("llm", section, lambda: _build_llm_service(cfg))
+
+
+def get_answer_cache(cfg=None):
+    """Shared SemanticAnswerCache, or None when answer_cache.enabled is off."""
+    cfg = cfg or load_config()
+    cache_cfg = cfg.get("answer_cache") or {}
+    if not cache_cfg.get("enabled"):
+        return None
+    from services.llm.answer_cache import SemanticAnswerCache
+    return registry.get("answer_cache", cache_cfg,
+                        lambda: SemanticAnswerCache(threshold=cache_cfg.get("threshold", 0.97),
+                                                    ttl_seconds=cache_cfg.get("ttl_seconds", 3600),
+                                                    max_entries=cache_cfg.get("max_entries", 10_000)))
+
+
+def get_eval_pipeline(cfg=None):
+    """Shared, started EvaluationPipeline, or None when evaluation.enabled is off."""
+    cfg = cfg or load_config()
+    eval_cfg = cfg.get("evaluation") or {}
+    if not eval_cfg.get("enabled"):
+        return None
+    from eval.pipeline import EvaluationPipeline, make_sink
+
+    def _build():
+        sink = make_sink(eval_cfg["sink"]) if eval_cfg.get("sink") else None
+        return EvaluationPipeline(sink=sink,
+                                  sample_rate=eval_cfg.get("sample_rate", 0.1),
+                                  workers=eval_cfg.get("workers", 2),
+                                  queue_size=eval_cfg.get("queue_size", 1000),
+                                  close_timeout=eval_cfg.get("shutdown_timeout_s", 5.0)).start()
+    return registry.get("evaluation", eval_cfg, _build)
+
+
+def get_lexical_index(cfg=None):
+    """Shared BM25 LexicalSearch, or None when lexical.enabled is off or the index is not built yet."""
+    cfg = cfg or load_config()
+    lex_cfg = cfg.get("lexical") or {}
+    if not lex_cfg.get("enabled") or not os.path.exists(lex_cfg.get("path", "")):
+        return None
+    from index.bm25 import BM25Index, LexicalSearch
+    # keyed on the file's mtime so an index rebuilt by build_index is reloaded on next use
+    section = dict(lex_cfg, mtime=os.path.getmtime(lex_cfg["path"]))
+    return registry.get("lexical", section,
+                        lambda: LexicalSearch(BM25Index.load(lex_cfg["path"]),
+                                              candidates=lex_cfg.get("candidates", 20),
+                                              rrf_k=lex_cfg.get("rrf_k", 60),
+                                              fast_path=lex_cfg.get("fast_path", True),
+                                              max_df=lex_cfg.get("fast_path_max_df", 3),
+                                              margin=lex_cfg.get("fast_path_margin", 0.5)),
+                        replace=True)
+
+
+def get_context_builder(cfg=None):
+    """Shared prompt ContextBuilder, or None when context.enabled is off (plain concatenation)."""
+    cfg = cfg or load_config()
+    ctx_cfg = cfg.get("context") or {}
+    if not ctx_cfg.get("enabled", True):
+        return None
+    from query.context import ContextBuilder
+    return registry.get("context", ctx_cfg, lambda: ContextBuilder.from_config(cfg))
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """
+    Bounded pool of pre-warmed agent workflows shared by concurrent async callers.
+
+    Each checkout hands one agent exclusively to the caller, so the pool size is also the
+    concurrency limit; callers beyond it wait (up to `acquire_timeout`). The pool binds to
+    the event loop that first uses it and rebuilds its agents if used from another loop,
+    since the underlying async HTTP clients are loop-bound.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 4, acquire_timeout: Optional[float] = None):
+        self.factory = factory
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.stats: Dict[str, float] = {"checkouts": 0, "timeouts": 0, "wait_s_total": 0.0, "wait_s_max": 0.0,
+                                        "run_s_total": 0.0, "run_s_max": 0.0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._agents: List[Any] = []
+
+    def _ensure_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._agents = [self.factory() for _ in range(self.size)]
+        self._idle = asyncio.Queue()
+        for agent in self._agents:
+            self._idle.put_nowait(agent)
+        logger.info(f'agent pool warmed with {self.size} agents')
+
+    async def warm(self) -> None:
+        """Build the agents up front instead of on first checkout."""
+        self._ensure_loop()
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[Any]:
+        self._ensure_loop()
+        started = time.perf_counter()
+        try:
+            agent = await asyncio.wait_for(self._idle.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        acquired = time.perf_counter()
+        self._observe("wait_s", acquired - started)
+        self.stats["checkouts"] += 1
+        try:
+            yield agent
+        finally:
+            self._observe("run_s", time.perf_counter() - acquired)
+            self._idle.put_nowait(agent)
+
+    def _observe(self, name: str, seconds: float) -> None:
+        self.stats[f"{name}_total"] += seconds
+        self.stats[f"{name}_max"] = max(self.stats[f"{name}_max"], seconds)
+
+    @property
+    def in_use(self) -> int:
+        return 0 if self._idle is None else self.size - self._idle.qsize()
+
+    def snapshot(self) -> Dict[str, float]:
+        n = self.stats["checkouts"] or 1
+        return {**self.stats, "in_use": self.in_use, "size": self.size,
+                "wait_s_avg": self.stats["wait_s_total"] / n, "run_s_avg": self.stats["run_s_total"] / n}
@@ -0,0 +1,115 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+def _unit(vec: Sequence[float]) -> Tuple[float, ...]:
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return tuple(x / norm for x in vec)
+
+
+@dataclass
+class _Entry:
+    embedding: Tuple[float, ...]
+    context: Tuple[str, ...]
+    answer: str
+    created: float
+    generation: int
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on the query embedding plus the retrieved chunks.
+
+    A stored answer is served when the retrieved context is the same set of chunks and the
+    cosine similarity between query embeddings is at least `threshold`. When the chunk
+    texts are passed, a digest of each is part of the context, so re-indexing a document
+    under the same chunk ids (also from another process, e.g. build_index) stops
+    matching its old answers. Entries expire after `ttl_seconds`, the least recently used
+    are evicted beyond `max_entries`, and entries written against an older in-process
+    vector-store generation are treated as stale.
+    """
+
+    def __init__(self, threshold: float = 0.97, ttl_seconds: float = 3600, max_entries: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_context: Dict[Tuple[str, ...], List[int]] = {}
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _context_key(chunk_ids: Sequence[str], documents: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+        if documents is None:
+            return tuple(sorted(chunk_ids))
+        digests = (hashlib.blake2b((d or "").encode("utf-8"), digest_size=8).hexdigest() for d in documents)
+        return tuple(sorted(f"{i}:{h}" for i, h in zip(chunk_ids, digests)))
+
+    def _drop(self, key: int) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_context.get(entry.context, [])
+        keys.remove(key)
+        if not keys:
+            self._by_context.pop(entry.context, None)
+
+    def lookup(self, query_embedding: Sequence[float], chunk_ids: Sequence[str],
+               generation: int = 0, documents: Optional[Sequence[str]] = None) -> Optional[str]:
+        """Return a cached answer for a similar query over the same context, or None."""
+        context = self._context_key(chunk_ids, documents)
+        q = _unit(query_embedding)
+        now = self._clock()
+        with self._lock:
+            best_key, best_sim = None, self.threshold
+            for key in list(self._by_context.get(context, ())):
+                entry = self._entries[key]
+                if entry.generation != generation or now - entry.created > self.ttl_seconds:
+                    self._drop(key)
+                    self.evictions += 1
+                    continue
+                sim = sum(a * b for a, b in zip(q, entry.embedding))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key].answer
+
+    def put(self, query_embedding: Sequence[float], chunk_ids: Sequence[str], answer: str,
+            generation: int = 0, documents: Optional[Sequence[str]] = None) -> None:
+        context = self._context_key(chunk_ids, documents)
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = _Entry(_unit(query_embedding), context, answer, self._clock(), generation)
+            self._by_context.setdefault(context, []).append(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every entry, e.g. after the index was rebuilt by another process."""
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
@@ -1,6 +1,19 @@
+import asyncio
+from typing import AsyncIterator, Iterator, Optional
+
+
 class LLMService:
-    def synthesize(self, user_prompt: str, max_output_tokens: int = 512) -> str:
+    def synthesize(self, user_prompt: str, max_output_tokens: Optional[int] = None) -> str:
         raise NotImplementedError
 
     def synthesize_agentic(self, prompt):
         raise NotImplementedError
+
+    def synthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                          stats=None) -> Iterator[str]:
+        """Yield the answer as it is generated; non-streaming services yield it in one piece."""
+        yield self.synthesize(user_prompt, max_output_tokens)
+
+    async def asynthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                                 stats=None) -> AsyncIterator[str]:
+        yield await asyncio.to_thread(self.synthesize, user_prompt, max_output_tokens)
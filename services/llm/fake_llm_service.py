@@ -0,0 +1,76 @@
+import asyncio
+import re
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from services.llm.base import LLMService
+from services.llm.streaming import StreamStats, ainstrument_stream, instrument_stream
+
+_PASSAGE = re.compile(r"\[1\][^:]*:\s*(.+)")
+
+
+class FakeLLMService(LLMService):
+    """
+    Deterministic offline stand-in for GenAILLMService.
+
+    The answer is the opening of the first passage in the prompt (or 'Answer not found.'),
+    returned after `latency_s`; streaming yields it word by word, paced by `tokens_per_sec`.
+    """
+
+    def __init__(self, latency_s: float = 0.0, tokens_per_sec: Optional[float] = None, answer_words: int = 40):
+        self.model = "fake-llm"
+        self.latency_s = latency_s
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_words = answer_words
+        self.calls = 0
+
+    def _answer(self, user_prompt: str) -> str:
+        m = _PASSAGE.search(user_prompt or "")
+        if not m:
+            return "Answer not found."
+        return " ".join(m.group(1).split()[: self.answer_words]) + " [1]"
+
+    def synthesize(self, user_prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self._answer(user_prompt)
+
+    async def synthesize_agentic(self, user_prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        self.calls += 1
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._answer(user_prompt)
+
+    def _words(self, user_prompt: str):
+        words = self._answer(user_prompt).split(" ")
+        return [w if i == len(words) - 1 else w + " " for i, w in enumerate(words)]
+
+    def synthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                          stats: Optional[StreamStats] = None) -> Iterator[str]:
+        self.calls += 1
+        stats = stats if stats is not None else StreamStats()
+        stats.started = time.perf_counter()
+
+        def _gen():
+            time.sleep(self.latency_s)
+            for word in self._words(user_prompt):
+                if self.tokens_per_sec:
+                    time.sleep(1 / self.tokens_per_sec)
+                yield word
+        yield from instrument_stream(_gen(), stats)
+
+    async def asynthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                                 stats: Optional[StreamStats] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        stats = stats if stats is not None else StreamStats()
+        stats.started = time.perf_counter()
+
+        async def _gen():
+            await asyncio.sleep(self.latency_s)
+            for word in self._words(user_prompt):
+                if self.tokens_per_sec:
+                    await asyncio.sleep(1 / self.tokens_per_sec)
+                yield word
+        async for text in ainstrument_stream(_gen(), stats):
+            yield text
@@ -1,24 +1,35 @@
 import logging
-from typing import Optional
+import time
+from typing import AsyncIterator, Iterator, Optional
 
 from google import genai
 from google.genai import types
-from google.genai.chats import Chat
 from google.genai.types import GenerateContentResponse
-from llama_index.core.agent import FunctionAgent
-from llama_index.core.evaluation import FaithfulnessEvaluator
-from llama_index.llms.google_genai import GoogleGenAI
 
+from services.llm.agent_pool import AgentPool
 from services.llm.base import LLMService
+from services import telemetry
+from services.llm.streaming import StreamStats, ainstrument_stream, instrument_stream
 
 logger = logging.getLogger(__name__)
 
 
 class GenAILLMService(LLMService):
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = "gemini-2.5-flash"):
-        """Long-lived GenAI client for synthesis (Gemini)."""
-        self.client = genai.Client(api_key=api_key) if api_key else genai.Client()
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = "gemini-2.5-flash", client=None,
+                 agent_model: str = "gemini-2.5-flash-lite", agent_pool_size: int = 4,
+                 agent_acquire_timeout: Optional[float] = None, max_output_tokens: int = 1024):
+        """
+        Long-lived GenAI client for synthesis (Gemini); `client` allows injecting a fake.
+        `max_output_tokens` is the default answer budget; gemini-2.5 thinking tokens count against it.
+        """
+        if client is not None:
+            self.client = client
+        else:
+            self.client = genai.Client(api_key=api_key) if api_key else genai.Client()
         self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.agent_model = agent_model
+        self.agent_pool = AgentPool(self._build_agent, size=agent_pool_size, acquire_timeout=agent_acquire_timeout)
         self.safety_settings = [
             types.SafetySetting(
                 category="HARM_CATEGORY_HATE_SPEECH",
@@ -47,47 +58,78 @@ class GenAILLMService(LLMService):
             "Never hallucinate facts not present in the provided information."
         )
 
-    def _get_response_text(self, agent: Chat, user_prompt: str) -> (str, GenerateContentResponse):
-        logging.info(f'user query: {user_prompt[:100]}')
-        response = agent.send_message(user_prompt)
+    def _generation_config(self, max_output_tokens: Optional[int]) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+            system_instruction=self.system_prompt,
+            safety_settings=self.safety_settings,
+            max_output_tokens=max_output_tokens or self.max_output_tokens
+        )
+
+    def _get_response_text(self, response: GenerateContentResponse) -> str:
         synthesis: str = 'not available'
         if response and response.text:
             logging.info(f'Agent summarization response: {response.text[:100]}')
             logging.info(f'Agent token usage: {response.usage_metadata.total_token_count}')
+            if telemetry.is_enabled():
+                telemetry.metrics.inc("rag_llm_tokens_total", response.usage_metadata.total_token_count or 0,
+                                      model=self.model)
             synthesis = response.text
+        return synthesis
 
-        return synthesis, response
+    def synthesize(self, user_prompt: str, max_output_tokens: Optional[int] = None) -> str:
+        """Synthesize a short answer from a free-form prompt."""
+        logger.info(f"synthesizing query: {user_prompt[:50] if user_prompt else 'NA'}")
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=user_prompt,
+            config=self._generation_config(max_output_tokens),
+        )
+        return self._get_response_text(response)
 
-    def _get_synthesizer_agent(self) -> Chat:
-        return self.client.chats.create(
+    def synthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                          stats: Optional[StreamStats] = None) -> Iterator[str]:
+        """Yield answer text as Gemini streams it; timing is recorded into `stats`."""
+        logger.info(f"streaming synthesis: {user_prompt[:50] if user_prompt else 'NA'}")
+        stats = stats if stats is not None else StreamStats()
+        stats.started = time.perf_counter()
+        chunks = self.client.models.generate_content_stream(
             model=self.model,
-            config=types.GenerateContentConfig(
-                system_instruction=self.system_prompt,
-                safety_settings=self.safety_settings,
-                max_output_tokens=1024
-            )
+            contents=user_prompt,
+            config=self._generation_config(max_output_tokens),
         )
+        yield from instrument_stream(chunks, stats)
 
-    def synthesize(self, user_prompt: str, max_output_tokens: int = 512) -> str:
-        """Synthesize a short answer from a free-form prompt."""
-        logger.info(f"synthesizing query: {user_prompt[:50] if user_prompt else 'NA'}")
-        agent: Chat = self._get_synthesizer_agent()
-        resp, response = self._get_response_text(agent, user_prompt)
-        return resp
+    async def asynthesize_stream(self, user_prompt: str, max_output_tokens: Optional[int] = None,
+                                 stats: Optional[StreamStats] = None) -> AsyncIterator[str]:
+        """Async variant of synthesize_stream using the SDK's aio client."""
+        logger.info(f"streaming synthesis: {user_prompt[:50] if user_prompt else 'NA'}")
+        stats = stats if stats is not None else StreamStats()
+        stats.started = time.perf_counter()
+        chunks = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=user_prompt,
+            config=self._generation_config(max_output_tokens),
+        )
+        async for text in ainstrument_stream(chunks, stats):
+            yield text
+
+    def _build_agent(self):
+        # llama_index is only needed on the agentic path; keep it out of module import
+        from llama_index.core.agent import FunctionAgent
+        from llama_index.llms.google_genai import GoogleGenAI
+
+        return FunctionAgent(
+            llm=GoogleGenAI(model=self.agent_model),
+            system_prompt=self.system_prompt
+        )
 
-    async def synthesize_agentic(self, user_prompt: str, max_output_tokens: int = 512) -> str:
+    async def synthesize_agentic(self, user_prompt: str, max_output_tokens: Optional[int] = None) -> str:
         """
-        LlamaIndex-style generation using Gemini LLM.
+        LlamaIndex-style generation using Gemini LLM, on an agent checked out from the pool.
         """
         logger.info(f"Synthesizing query: {user_prompt[:80]}")
-        _genai_llm = GoogleGenAI(
-            model="gemini-2.5-flash-lite",
-        )
-        evaluator = FaithfulnessEvaluator(llm=_genai_llm)
-        workflow = FunctionAgent(
-            llm=_genai_llm,
-            system_prompt=self.system_prompt
-        )
-        response = await workflow.run(user_msg=user_prompt)
-        logger.info(f'FunctionAgent: {response.text}')
+        started = time.perf_counter()
+        async with self.agent_pool.checkout() as workflow:
+            response = await workflow.run(user_msg=user_prompt)
+        logger.info(f'FunctionAgent ({time.perf_counter() - started:.2f}s): {response.text}')
         return response.text
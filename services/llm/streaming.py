@@ -0,0 +1,82 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+from services import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamStats:
+    """Timing for one streamed generation: time-to-first-token and output tokens/sec."""
+    started: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    chunks: int = 0
+    output_tokens: int = 0
+    chars: int = 0
+
+    @property
+    def ttft_s(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def total_s(self) -> Optional[float]:
+        return None if self.finished_at is None else self.finished_at - self.started
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        if self.finished_at is None or self.first_token_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.output_tokens / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"ttft_s": self.ttft_s, "total_s": self.total_s, "chunks": self.chunks,
+                "output_tokens": self.output_tokens, "tokens_per_sec": self.tokens_per_sec}
+
+    def _record(self, chunk: Any) -> str:
+        text = getattr(chunk, "text", None) if not isinstance(chunk, str) else chunk
+        if text and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text or "")
+        usage = getattr(chunk, "usage_metadata", None)
+        reported = getattr(usage, "candidates_token_count", None) if usage is not None else None
+        # the API reports the cumulative count; fall back to ~4 chars/token without it
+        self.output_tokens = reported if reported else max(self.output_tokens, self.chars // 4)
+        return text or ""
+
+    def _finish(self) -> None:
+        self.finished_at = time.perf_counter()
+        logger.info(f'stream finished: {self.as_dict()}')
+        if telemetry.is_enabled():
+            if self.ttft_s is not None:
+                telemetry.metrics.observe("rag_llm_ttft_seconds", self.ttft_s)
+            telemetry.record("synthesize", self.total_s, items=1, tokens=self.output_tokens)
+
+
+def instrument_stream(chunks: Iterable[Any], stats: Optional[StreamStats] = None) -> Iterator[str]:
+    """Yield the text of each streamed chunk while recording timing into `stats`."""
+    stats = stats if stats is not None else StreamStats()
+    try:
+        for chunk in chunks:
+            text = stats._record(chunk)
+            if text:
+                yield text
+    finally:
+        stats._finish()
+
+
+async def ainstrument_stream(chunks: AsyncIterable[Any], stats: Optional[StreamStats] = None) -> AsyncIterator[str]:
+    """Async variant of instrument_stream."""
+    stats = stats if stats is not None else StreamStats()
+    try:
+        async for chunk in chunks:
+            text = stats._record(chunk)
+            if text:
+                yield text
+    finally:
+        stats._finish()
@@ -0,0 +1,246 @@
+"""
+Lightweight per-stage tracing and metrics for the RAG pipeline.
+
+    with span("embed") as s:
+        vectors = embedder.embed(texts)
+        s.add(items=len(texts), tokens=estimated_tokens)
+
+Each span feeds a latency histogram and call/item/byte/token/error counters labelled by
+stage. Inside a `request_scope()` the span durations are also collected into a per-request
+breakdown that is logged when the scope ends, and the request id is attached to every log
+record (see config.logging_config.setup_logging). When telemetry is disabled `span()`
+returns a shared no-op object, so instrumented code pays one global lookup.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_breakdown_var: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_breakdown", default=None)
+
+_enabled = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile (Prometheus-style estimate)."""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, c in zip(self.buckets + (float("inf"),), self.counts):
+            seen += c
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+        pairs = labels + extra
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            typed = set()
+            for (name, labels), value in counters:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{self._fmt_labels(labels)} {value:g}")
+            for (name, labels), hist in histograms:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, c in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{self._fmt_labels(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._fmt_labels(labels)} {hist.sum:g}")
+                lines.append(f"{name}_count{self._fmt_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """JSON-friendly view: counters plus count/sum/mean/p50/p95/p99 per histogram."""
+        with self._lock:
+            return {
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())],
+                "histograms": [{"name": n, "labels": dict(l), "count": h.count, "sum": h.sum,
+                                "mean": h.sum / h.count if h.count else None,
+                                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                               for (n, l), h in sorted(self._histograms.items(), key=lambda kv: kv[0])],
+            }
+
+    def write_snapshot(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.snapshot(), fh, indent=2)
+
+
+metrics = MetricsRegistry()
+
+
+def enable(flag: bool = True) -> None:
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counts) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("stage", "counts", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.counts: Dict[str, float] = {}
+
+    def add(self, **counts) -> None:
+        """Record work done in this span: items, bytes, tokens, ..."""
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self._start, error=exc_type is not None, **self.counts)
+        return False
+
+
+def record(stage: str, seconds: float, error: bool = False, **counts) -> None:
+    """Record a stage timed elsewhere, e.g. inside a worker process that returned its timings."""
+    if not _enabled:
+        return
+    metrics.observe("rag_stage_seconds", seconds, stage=stage)
+    metrics.inc("rag_stage_calls_total", stage=stage)
+    if error:
+        metrics.inc("rag_stage_errors_total", stage=stage)
+    for k, v in counts.items():
+        metrics.inc(f"rag_stage_{k}_total", v, stage=stage)
+    breakdown = _breakdown_var.get()
+    if breakdown is not None:
+        breakdown[stage] = breakdown.get(stage, 0.0) + seconds
+
+
+def share(stage: str, seconds: float, contexts: Iterable[Context]) -> None:
+    """
+    Add a stage that ran once for a whole batch to the breakdown of every request in it.
+    `contexts` are the requests' contextvars.copy_context() snapshots; the batch's own span
+    records the metrics.
+    """
+    if not _enabled:
+        return
+    for ctx in contexts:
+        breakdown = ctx.get(_breakdown_var)
+        if breakdown is not None:
+            breakdown[stage] = breakdown.get(stage, 0.0) + seconds
+
+
+def span(stage: str):
+    """Time a pipeline stage; a shared no-op when telemetry is disabled."""
+    if not _enabled:
+        return _NOOP
+    return Span(stage)
+
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None) -> Iterator[Dict[str, float]]:
+    """
+    Bind a request id for logging and collect a per-stage latency breakdown, which is
+    logged (and returned via the yielded dict) when the scope exits.
+    """
+    rid = request_id or request_id_var.get() or uuid.uuid4().hex[:12]
+    breakdown: Dict[str, float] = {}
+    rid_token = request_id_var.set(rid)
+    bd_token = _breakdown_var.set(breakdown)
+    start = time.perf_counter()
+    try:
+        yield breakdown
+    finally:
+        breakdown["total"] = time.perf_counter() - start
+        _breakdown_var.reset(bd_token)
+        if _enabled:
+            metrics.observe("rag_request_seconds", breakdown["total"])
+            logger.info("latency breakdown: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in breakdown.items()))
+        request_id_var.reset(rid_token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds `request_id` to every record so formats can include %(request_id)s."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
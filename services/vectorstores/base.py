@@ -1,12 +1,67 @@
-from typing import Sequence, Dict, List
+from typing import Sequence, Dict, Iterator, List, Optional
 
 
 class VectorStore:
+    #: incremented on every write so caches keyed on retrieval results can detect index changes
+    generation: int = 0
+
+    def _bump_generation(self):
+        self.generation += 1
+
     def save(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
              embeddings: Sequence[Sequence[float]]):
         raise NotImplementedError
 
-    def query(self, query_embedding: Sequence[float], n_results: int = 3) -> Dict:
+    def upsert(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]]):
+        """Insert new ids and overwrite existing ones."""
+        raise NotImplementedError
+
+    def update_metadata(self, ids: Sequence[str], metas: Sequence[Dict]):
+        """Replace the metadata of existing ids without touching their vectors."""
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]):
+        raise NotImplementedError
+
+    def get_metadata(self, where: Optional[Dict] = None) -> Dict[str, Dict]:
+        """Return {id: metadata} for every stored chunk (optionally filtered)."""
+        raise NotImplementedError
+
+    def get(self, ids: Sequence[str]) -> Dict:
+        """Fetch stored chunks by id: {"ids", "documents", "metadatas"} in the order given, unknown ids skipped."""
         raise NotImplementedError
 
+    def query(self, query_embedding: Sequence[float], n_results: int = 3, where: Optional[Dict] = None,
+              **search_params) -> Dict:
+        """
+        Top `n_results` chunks, restricted to those whose metadata matches `where` (Chroma
+        filter syntax, see metadata_index.py). `search_params` are per-request index knobs
+        (e.g. `nprobe`); stores ignore ones they do not use.
+        """
+        raise NotImplementedError
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, **search_params) -> Dict:
+        """Query many embeddings at once; row i of each result list belongs to query i."""
+        out: Dict[str, List] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for emb in query_embeddings:
+            res = self.query(emb, n_results=n_results, where=where, **search_params)
+            for key in out:
+                out[key].append((res.get(key) or [[]])[0])
+        return out
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Every stored chunk in batches of {"ids", "documents", "metadatas", "embeddings"}, for migrations."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist buffered writes; a no-op for stores that write through."""
+
+    def close(self):
+        """Release the store; buffered stores persist writes not flushed yet."""
+
     def delete_collection(self, name: str): ...
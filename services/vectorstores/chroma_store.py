@@ -1,13 +1,23 @@
 import logging
-from typing import Sequence, Dict
+import shutil
+from pathlib import Path
+from typing import Sequence, Dict, Iterator, Optional
 import chromadb
 
 from .base import VectorStore
+from .metadata_index import to_chroma_where
 
 
 class ChromaStore(VectorStore):
-    def __init__(self, collection_name="doc_intel_eval"):
-        self.client = chromadb.Client()
+    def __init__(self, collection_name="doc_intel_eval", persist_path: Optional[str] = None):
+        """In-memory by default; with `persist_path` the collection lives on disk and survives restarts."""
+        self.persist_path = Path(persist_path) if persist_path else None
+        if self.persist_path:
+            self.persist_path.mkdir(parents=True, exist_ok=True)
+            self.client = chromadb.PersistentClient(path=str(self.persist_path))
+            logging.info(f'opening persistent chroma store at {self.persist_path}')
+        else:
+            self.client = chromadb.Client()
         self.collection_name = collection_name
         try:
             self.col = self.client.get_or_create_collection(self.collection_name)
@@ -19,11 +29,85 @@ class ChromaStore(VectorStore):
     def save(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
              embeddings: Sequence[Sequence[float]]):
         self.col.add(ids=list(ids), documents=list(docs), metadatas=list(metas), embeddings=list(embeddings))
+        self._bump_generation()
 
-    def query(self, query_embedding: Sequence[float], n_results: int = 3) -> Dict:
+    def upsert(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]]):
+        self.col.upsert(ids=list(ids), documents=list(docs), metadatas=list(metas), embeddings=list(embeddings))
+        self._bump_generation()
+
+    def update_metadata(self, ids: Sequence[str], metas: Sequence[Dict]):
+        self.col.update(ids=list(ids), metadatas=list(metas))
+        self._bump_generation()
+
+    def delete(self, ids: Sequence[str]):
+        if ids:
+            self.col.delete(ids=list(ids))
+            self._bump_generation()
+
+    def get_metadata(self, where: Optional[Dict] = None, page_size: int = 10_000) -> Dict[str, Dict]:
+        out: Dict[str, Dict] = {}
+        offset = 0
+        while True:
+            page = self.col.get(where=to_chroma_where(where), include=["metadatas"], limit=page_size, offset=offset)
+            out.update(zip(page["ids"], page["metadatas"]))
+            if len(page["ids"]) < page_size:
+                return out
+            offset += page_size
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Dict]:
+        offset = 0
+        while True:
+            page = self.col.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+            if len(page["ids"]):
+                yield {k: page[k] for k in ("ids", "documents", "metadatas", "embeddings")}
+            if len(page["ids"]) < batch_size:
+                return
+            offset += batch_size
+
+    def count(self) -> int:
+        return self.col.count()
+
+    def get(self, ids: Sequence[str]) -> Dict:
+        res = self.col.get(ids=list(ids), include=["documents", "metadatas"])
+        by_id = {i: (d, m) for i, d, m in zip(res["ids"], res["documents"], res["metadatas"])}
+        found = [i for i in ids if i in by_id]
+        return {"ids": found, "documents": [by_id[i][0] for i in found], "metadatas": [by_id[i][1] for i in found]}
+
+    def query(self, query_embedding: Sequence[float], n_results: int = 3, where: Optional[Dict] = None,
+              **search_params) -> Dict:
+        # Chroma pre-filters natively
         return self.col.query(query_embeddings=[list(query_embedding)], n_results=n_results,
-                              include=["documents", "metadatas", "distances"])
+                              where=to_chroma_where(where), include=["documents", "metadatas", "distances"])
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, **search_params) -> Dict:
+        return self.col.query(query_embeddings=[list(e) for e in query_embeddings], n_results=n_results,
+                              where=to_chroma_where(where), include=["documents", "metadatas", "distances"])
+
+    def snapshot(self, dest: str) -> Path:
+        """Copy the persisted store to `dest`; take snapshots while no writes are in flight."""
+        if not self.persist_path:
+            raise RuntimeError("snapshot requires a persistent store (vector_store.persist_path)")
+        dest = Path(dest)
+        if dest.exists():
+            shutil.rmtree(dest)
+        shutil.copytree(self.persist_path, dest)
+        logging.info(f'snapshot of {self.persist_path} written to {dest}')
+        return dest
+
+    @staticmethod
+    def restore(snapshot_path: str, persist_path: str) -> None:
+        """Replace `persist_path` with a snapshot; call before opening a ChromaStore on it."""
+        src, dest = Path(snapshot_path), Path(persist_path)
+        if not src.is_dir():
+            raise FileNotFoundError(f"snapshot not found: {src}")
+        if dest.exists():
+            shutil.rmtree(dest)
+        shutil.copytree(src, dest)
+        logging.info(f'restored snapshot {src} into {dest}')
 
     def delete_collection(self, name: str):
         logging.warning(f'deleting collection: {name}')
         self.client.delete_collection(name)
+        self._bump_generation()
@@ -0,0 +1,246 @@
+import logging
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .numpy_store import NumpyStore, _normalize
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+LABELS_FILE = "ivf_labels.npy"
+
+
+def assign(rows: np.ndarray, centroids: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid for each (normalised) row, computed in blocks."""
+    labels = np.empty(len(rows), dtype=np.int32)
+    for lo in range(0, len(rows), block_rows):
+        block = np.asarray(rows[lo:lo + block_rows], dtype=np.float32)
+        labels[lo:lo + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(rows: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-norm centroids maximising cosine similarity to their rows."""
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(rows, dtype=np.float32)
+    centroids = rows[rng.choice(len(rows), k, replace=False)].copy()
+    labels = None
+    for _ in range(iters):
+        new = assign(rows, centroids)
+        if labels is not None and np.array_equal(new, labels):
+            break
+        labels = new
+        # per-cluster sums in one pass over the rows sorted by cluster
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        centroids[filled] = np.add.reduceat(rows[order], starts[filled], axis=0)
+        # reseed empty clusters on random rows
+        centroids[~filled] = rows[rng.choice(len(rows), int((~filled).sum()), replace=False)]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class IVFStore(NumpyStore):
+    """
+    NumpyStore with an inverted-file (IVF) index for approximate search over large collections.
+
+    Rows are clustered into `nlist` lists by spherical k-means and a query only scans the
+    `nprobe` lists whose centroids are closest, so cost grows with n * nprobe / nlist instead
+    of n. flush() trains the centroids once the store holds `min_train_rows` rows, then
+    reorders the matrix by list so every inverted list is one contiguous slice of
+    vectors.npy (read straight from the memory map on load). Rows written afterwards are
+    assigned to their nearest centroid without retraining and scanned from a tail until
+    the next flush folds them into the lists; retrain() re-clusters from scratch.
+    Below `min_train_rows` the store searches exactly.
+    """
+
+    def __init__(self, path: Optional[str] = None, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_train_rows: int = 10000, train_sample: int = 100000, mmap: bool = True):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.train_sample = train_sample
+        self._centroids: Optional[np.ndarray] = None
+        self._labels: Optional[np.ndarray] = None  # capacity buffer like _vectors
+        self._offsets: Optional[np.ndarray] = None  # list l is rows [_offsets[l], _offsets[l + 1])
+        self._layout_count = 0  # rows [0, _layout_count) are grouped by list; the rest are the tail
+        super().__init__(path=path, mmap=mmap)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # --- persistence -------------------------------------------------------------------
+
+    def _load(self) -> None:
+        super()._load()
+        if not (self.path / CENTROIDS_FILE).exists():
+            return
+        self._centroids = np.load(self.path / CENTROIDS_FILE)
+        labels = np.load(self.path / LABELS_FILE)
+        if len(labels) != self._count:
+            logging.info(f'ivf: labels out of date, reassigning {self._count} vectors')
+            labels = assign(self.vectors, self._centroids)
+        self._labels = labels
+        if self._count and np.all(labels[1:] >= labels[:-1]):
+            self._set_layout()
+
+    def flush(self) -> None:
+        """Train (first time, once large enough), regroup the inverted lists, then persist."""
+        if not self.trained and self._count >= self.min_train_rows:
+            self.train()
+        if self.trained and self._layout_count < self._count:
+            self._regroup()
+        super().flush()
+
+    def _persist(self) -> None:
+        super()._persist()
+        if not self.path:
+            return
+        for name, arr in ((CENTROIDS_FILE, self._centroids),
+                          (LABELS_FILE, None if self._labels is None else self._labels[: self._count])):
+            target = self.path / name
+            if arr is None:
+                target.unlink(missing_ok=True)
+                continue
+            tmp = self.path / (name + ".tmp")
+            with tmp.open("wb") as fh:
+                np.save(fh, arr)
+            tmp.replace(target)
+
+    # --- training and layout -----------------------------------------------------------
+
+    def train(self) -> None:
+        """Cluster a sample of the stored rows and assign every row to its nearest centroid."""
+        start = time.perf_counter()
+        nlist = self.nlist or max(1, int(4 * np.sqrt(self._count)))
+        nlist = min(nlist, self._count)
+        rng = np.random.default_rng(0)
+        sample = self.vectors
+        if self._count > self.train_sample:
+            sample = self.vectors[np.sort(rng.choice(self._count, self.train_sample, replace=False))]
+        self._centroids = kmeans(sample, nlist)
+        self._labels = assign(self.vectors, self._centroids)
+        self._layout_count = 0
+        logging.info(f'ivf: trained {nlist} lists on {len(sample)} of {self._count} vectors '
+                     f'in {time.perf_counter() - start:.1f}s')
+
+    def retrain(self) -> None:
+        self.train()
+        self._regroup()
+
+    def _regroup(self) -> None:
+        """Reorder rows by list so each inverted list is contiguous."""
+        n = self._count
+        order = np.argsort(self._labels[:n], kind="stable")
+        self._reserve(0, self._vectors.shape[1])  # a memory-mapped matrix becomes writable
+        self._vectors[:n] = self._vectors[order]
+        self._labels = self._labels[order]
+        self._ids = [self._ids[j] for j in order]
+        self._docs = [self._docs[j] for j in order]
+        self._metas = [self._metas[j] for j in order]
+        self._index = {chunk_id: pos for pos, chunk_id in enumerate(self._ids)}
+        self._meta_index.invalidate()
+        self._set_layout()
+
+    def _set_layout(self) -> None:
+        counts = np.bincount(self._labels[: self._count], minlength=len(self._centroids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._layout_count = self._count
+
+    # --- writes ------------------------------------------------------------------------
+
+    def _grow_labels(self, stop: int) -> None:
+        if len(self._labels) < stop:
+            grown = np.zeros(max(stop, 2 * len(self._labels), 1024), dtype=np.int32)
+            grown[: len(self._labels)] = self._labels
+            self._labels = grown
+
+    def _write(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]], overwrite: bool) -> None:
+        before = self._count
+        super()._write(ids, docs, metas, embeddings, overwrite)
+        if not self.trained:
+            return
+        self._grow_labels(self._count)
+        self._labels[before: self._count] = assign(self._vectors[before: self._count], self._centroids)
+        if overwrite:
+            for chunk_id in ids:
+                pos = self._index[chunk_id]
+                if pos < before:
+                    label = assign(self._vectors[pos: pos + 1], self._centroids)[0]
+                    if label != self._labels[pos] and pos < self._layout_count:
+                        self._layout_count = 0  # the row left its list's slice; scan as tail until regrouped
+                    self._labels[pos] = label
+
+    def delete(self, ids: Sequence[str]):
+        for chunk_id in ids:
+            pos = self._index.get(chunk_id)
+            if pos is None:
+                continue
+            if self.trained:
+                self._labels[pos] = self._labels[self._count - 1]  # mirror NumpyStore's swap-remove
+                if pos < self._layout_count:
+                    self._layout_count = 0
+            super().delete([chunk_id])
+        self._layout_count = min(self._layout_count, self._count)
+
+    def delete_collection(self, name: str):
+        super().delete_collection(name)
+        self._centroids, self._labels, self._offsets, self._layout_count = None, None, None, 0
+        if self.path:
+            for f in (CENTROIDS_FILE, LABELS_FILE):
+                (self.path / f).unlink(missing_ok=True)
+
+    # --- reads -------------------------------------------------------------------------
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, nprobe: Optional[int] = None, **search_params) -> Dict:
+        """
+        Approximate top-k; `nprobe` overrides the configured number of lists scanned per query.
+        A `where` scope smaller than the rows nprobe lists would scan is searched exactly
+        instead; a larger one is applied as a filter on the probed lists.
+        """
+        if not self.trained or self._count == 0:
+            return super().query_batch(query_embeddings, n_results=n_results, where=where)
+        nlist = len(self._centroids)
+        nprobe = min(nprobe or self.nprobe, nlist)
+        scope = self._scope(where)
+        if scope is not None and len(scope) * nlist <= self._count * nprobe:
+            return super().query_batch(query_embeddings, n_results=n_results, where=where)
+        inside = None
+        if scope is not None:
+            inside = np.zeros(self._count, dtype=bool)
+            inside[scope] = True
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        probes = np.argpartition(-(queries @ self._centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        tail_labels = self._labels[self._layout_count: self._count]
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q, lists in zip(queries, probes):
+            # contiguous list slices are scored in place; tail rows are gathered
+            spans = [(self._offsets[l], self._offsets[l + 1]) for l in lists] if self._layout_count else []
+            spans = [(a, b) for a, b in spans if b > a]
+            tail = self._layout_count + np.flatnonzero(np.isin(tail_labels, lists))
+            cand = np.concatenate([np.arange(a, b) for a, b in spans] + [tail]).astype(np.int64)
+            scores = np.concatenate([self._vectors[a:b] @ q for a, b in spans]
+                                    + [np.asarray(self._vectors[tail], dtype=np.float32) @ q])
+            if inside is not None:
+                keep = inside[cand]
+                cand, scores = cand[keep], scores[keep]
+            k = min(n_results, len(cand))
+            top = np.argpartition(-scores, k - 1)[:k] if 0 < k < len(cand) else np.arange(len(cand))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            order = cand[top]
+            out["ids"].append([self._ids[j] for j in order])
+            out["documents"].append([self._docs[j] for j in order])
+            out["metadatas"].append([self._metas[j] for j in order])
+            out["distances"].append((1.0 - scores[top]).tolist())
+        return out
+
+    def stats(self) -> Dict:
+        sizes = np.diff(self._offsets) if self._offsets is not None else np.array([0])
+        return {"trained": self.trained, "nlist": 0 if self._centroids is None else len(self._centroids),
+                "nprobe": self.nprobe, "rows": self._count, "tail_rows": self._count - self._layout_count,
+                "largest_list": int(sizes.max()), "mean_list": float(sizes.mean())}
@@ -0,0 +1,213 @@
+"""
+Metadata index for `where`-filtered vector queries.
+
+Filters use Chroma's `where` syntax, so they pass through to Chroma unchanged:
+    {"tenant": "acme"}                          equality (several keys = all must match)
+    {"page": {"$gte": 3, "$lte": 5}}            $eq $ne $gt $gte $lt $lte $in $nin
+    {"$and": [...]} / {"$or": [...]}
+The in-process stores resolve a filter to a sorted array of row positions before any
+distance is computed: categorical fields keep a sorted position array per value, numeric
+fields keep their (value, position) pairs sorted by value for range lookups, and fields
+that are not indexed fall back to a scan over the metadata.
+"""
+import logging
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+CATEGORICAL_FIELDS = ("source", "doc_id", "tenant")
+NUMERIC_FIELDS = ("page", "ingested_at")
+
+_RANGE_OPS = ("$gt", "$gte", "$lt", "$lte")
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def to_chroma_where(where: Optional[Dict]) -> Optional[Dict]:
+    """Chroma accepts one key per filter dict; spell a multi-key equality filter as $and."""
+    if not where or len(where) == 1:
+        return where or None
+    return {"$and": [{k: v} for k, v in where.items()]}
+
+
+def _conditions(where: Dict) -> List:
+    """(field, op, value) leaves and ("$and" | "$or", [sub-filters]) nodes of one filter dict."""
+    out = []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            out.append((key, cond))
+        elif isinstance(cond, dict):
+            out.extend((key, op, value) for op, value in cond.items())
+        else:
+            out.append((key, "$eq", cond))
+    return out
+
+
+def _compare(value: Any, op: str, target: Any) -> bool:
+    if op == "$eq":
+        return value == target
+    if op == "$ne":
+        return value != target
+    if op == "$in":
+        return value in target
+    if op == "$nin":
+        return value not in target
+    try:
+        if op == "$gt":
+            return value > target
+        if op == "$gte":
+            return value >= target
+        if op == "$lt":
+            return value < target
+        if op == "$lte":
+            return value <= target
+    except TypeError:
+        return False
+    raise ValueError(f"unsupported where operator {op!r}")
+
+
+def matches(meta: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate a filter against one metadata dict; rows lacking a field never match it."""
+    if not where:
+        return True
+    for cond in _conditions(where):
+        if cond[0] == "$and":
+            if not all(matches(meta, sub) for sub in cond[1]):
+                return False
+        elif cond[0] == "$or":
+            if not any(matches(meta, sub) for sub in cond[1]):
+                return False
+        else:
+            field, op, target = cond
+            if field not in meta or not _compare(meta[field], op, target):
+                return False
+    return True
+
+
+class MetadataIndex:
+    """
+    Position index over a store's metadata list. Appends extend it in place; deletes and
+    metadata rewrites move rows around, so the owner calls invalidate() and it is rebuilt
+    from the metadata on the next filtered query.
+    """
+
+    def __init__(self, categorical: Sequence[str] = CATEGORICAL_FIELDS, numeric: Sequence[str] = NUMERIC_FIELDS):
+        self.categorical = tuple(categorical)
+        self.numeric = tuple(numeric)
+        self._valid = False
+        self._postings: Dict[str, Dict[Any, array]] = {}
+        self._num_values: Dict[str, array] = {}
+        self._num_pos: Dict[str, array] = {}
+        self._sorted: Dict[str, tuple] = {}  # field -> (values, positions) sorted by value
+
+    def invalidate(self) -> None:
+        self._valid = False
+
+    def rebuild(self, metas: Sequence[Dict]) -> None:
+        self._postings = {f: {} for f in self.categorical}
+        self._num_values = {f: array("d") for f in self.numeric}
+        self._num_pos = {f: array("q") for f in self.numeric}
+        self._sorted = {}
+        self._valid = True
+        self.append(0, metas)
+
+    def append(self, start: int, metas: Sequence[Dict]) -> None:
+        """Index rows start, start + 1, ... (appended at the end of the store)."""
+        if not self._valid:
+            return
+        for pos, meta in enumerate(metas, start):
+            for f in self.categorical:
+                value = meta.get(f)
+                if value is not None:
+                    self._postings[f].setdefault(value, array("q")).append(pos)
+            for f in self.numeric:
+                value = meta.get(f)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._num_values[f].append(value)
+                    self._num_pos[f].append(pos)
+                    self._sorted.pop(f, None)
+
+    def nbytes(self) -> int:
+        cat = sum(p.itemsize * len(p) for postings in self._postings.values() for p in postings.values())
+        num = sum(len(v) * 16 for v in self._num_values.values())
+        return cat + num
+
+    # --- evaluation --------------------------------------------------------------------
+
+    def select(self, where: Dict, metas: Sequence[Dict]) -> np.ndarray:
+        """Sorted positions of the rows matching `where`."""
+        if not self._valid:
+            self.rebuild(metas)
+        return self._select(where, metas)
+
+    def _select(self, where: Dict, metas: Sequence[Dict]) -> np.ndarray:
+        result = None
+        for cond in _conditions(where):
+            if cond[0] == "$and":
+                part = self._intersect([self._select(sub, metas) for sub in cond[1]])
+            elif cond[0] == "$or":
+                part = self._union([self._select(sub, metas) for sub in cond[1]], len(metas))
+            else:
+                part = self._leaf(*cond, metas=metas)
+            result = part if result is None else np.intersect1d(result, part, assume_unique=True)
+            if not len(result):
+                break
+        return _EMPTY if result is None else result
+
+    @staticmethod
+    def _intersect(parts: List[np.ndarray]) -> np.ndarray:
+        if not parts:
+            return _EMPTY
+        parts = sorted(parts, key=len)  # smallest first keeps every step cheap
+        result = parts[0]
+        for part in parts[1:]:
+            result = np.intersect1d(result, part, assume_unique=True)
+        return result
+
+    def _leaf(self, field: str, op: str, target: Any, metas: Sequence[Dict]) -> np.ndarray:
+        if field in self._postings:
+            postings = self._postings[field]
+            if op == "$eq":
+                return self._positions(postings.get(target))
+            if op == "$in":
+                return self._union([postings.get(t) for t in target], len(metas))
+            if op in ("$ne", "$nin"):
+                excluded = {target} if op == "$ne" else set(target)
+                return self._union([p for v, p in postings.items() if v not in excluded], len(metas))
+        if field in self._num_values and (op in _RANGE_OPS or op == "$eq") and isinstance(target, (int, float)):
+            values, positions = self._sorted_numeric(field)
+            lo, hi = 0, len(values)
+            if op in ("$gt", "$gte"):
+                lo = np.searchsorted(values, target, side="right" if op == "$gt" else "left")
+            elif op in ("$lt", "$lte"):
+                hi = np.searchsorted(values, target, side="left" if op == "$lt" else "right")
+            else:
+                lo, hi = np.searchsorted(values, target, "left"), np.searchsorted(values, target, "right")
+            return np.sort(positions[lo:hi])
+        logging.debug(f'where: {field} {op} is not indexed, scanning metadata')
+        return np.fromiter((pos for pos, meta in enumerate(metas)
+                            if field in meta and _compare(meta[field], op, target)), dtype=np.int64)
+
+    @staticmethod
+    def _positions(postings: Optional[array]) -> np.ndarray:
+        # a copy: a live view would stop the array from growing on the next append
+        return np.frombuffer(postings, dtype=np.int64).copy() if postings else _EMPTY
+
+    def _union(self, parts: List, n_rows: int) -> np.ndarray:
+        """Union of posting arrays or position arrays, by marking a row mask (linear, no sort)."""
+        parts = [p for p in parts if p is not None and len(p)]
+        if not parts:
+            return _EMPTY
+        if len(parts) == 1:
+            return self._positions(parts[0]) if isinstance(parts[0], array) else parts[0]
+        mask = np.zeros(n_rows, dtype=bool)
+        for p in parts:
+            mask[np.frombuffer(p, dtype=np.int64) if isinstance(p, array) else p] = True
+        return np.flatnonzero(mask)
+
+    def _sorted_numeric(self, field: str):
+        if field not in self._sorted:
+            values = np.frombuffer(self._num_values[field], dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            self._sorted[field] = (values[order], np.frombuffer(self._num_pos[field], dtype=np.int64)[order])
+        return self._sorted[field]
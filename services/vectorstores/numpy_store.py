@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .base import VectorStore
+from .metadata_index import MetadataIndex
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl"
+
+
+def _normalize(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+class NumpyStore(VectorStore):
+    """
+    Exact in-process vector store over a contiguous float32 matrix of L2-normalised rows.
+
+    Queries are matrix products with argpartition top-k; distances are cosine distances
+    (1 - cosine similarity). With `path` the matrix is persisted as vectors.npy and, when
+    `mmap` is set, loaded zero-copy with np.load(mmap_mode="r"); the first write after a
+    memory-mapped load copies it into a growable in-memory buffer. A `where` filter is
+    resolved against a MetadataIndex first, so only the rows in scope are scored.
+    close() persists only unflushed writes, so a read-only process never rewrites the files.
+    """
+
+    def __init__(self, path: Optional[str] = None, mmap: bool = True):
+        self.path = Path(path) if path else None
+        self.mmap = mmap
+        self._vectors: Optional[np.ndarray] = None  # capacity buffer, rows [0, _count) are live
+        self._count = 0
+        self._ids: List[str] = []
+        self._docs: List[str] = []
+        self._metas: List[Dict] = []
+        self._index: Dict[str, int] = {}
+        self._meta_index = MetadataIndex()  # built on the first filtered query
+        self._dirty = False  # writes not yet flushed to `path`
+        if self.path and (self.path / VECTORS_FILE).exists():
+            self._load()
+
+    # --- persistence -------------------------------------------------------------------
+
+    def _load(self) -> None:
+        vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r" if self.mmap else None)
+        with (self.path / RECORDS_FILE).open("r", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                self._index[rec["id"]] = len(self._ids)
+                self._ids.append(rec["id"])
+                self._docs.append(rec["document"])
+                self._metas.append(rec["metadata"])
+        self._vectors = vectors
+        self._count = len(self._ids)
+        logging.info(f'loaded {self._count} vectors from {self.path} (mmap={self.mmap})')
+
+    def flush(self) -> None:
+        """Write the matrix and records to `path` atomically."""
+        self._persist()
+        self._dirty = False
+
+    def _persist(self) -> None:
+        if not self.path:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = self.path / (VECTORS_FILE + ".tmp")
+        with tmp_vectors.open("wb") as fh:
+            np.save(fh, self.vectors)
+        tmp_records = self.path / (RECORDS_FILE + ".tmp")
+        with tmp_records.open("w", encoding="utf-8") as fh:
+            for i, d, m in zip(self._ids, self._docs, self._metas):
+                fh.write(json.dumps({"id": i, "document": d, "metadata": m}) + "\n")
+        os.replace(tmp_vectors, self.path / VECTORS_FILE)
+        os.replace(tmp_records, self.path / RECORDS_FILE)
+        logging.info(f'persisted {self._count} vectors to {self.path}')
+
+    def close(self) -> None:
+        if self._dirty:
+            self.flush()
+
+    # --- writes --------------------------------------------------------------------------
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Live rows of the matrix (a view, no copy)."""
+        if self._vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._vectors[: self._count]
+
+    def _reserve(self, extra: int, dim: int) -> None:
+        if self._vectors is None:
+            self._vectors = np.empty((max(extra, 1024), dim), dtype=np.float32)
+            return
+        if self._vectors.shape[1] != dim:
+            raise ValueError(f"embedding dimension {dim} does not match store dimension {self._vectors.shape[1]}")
+        needed = self._count + extra
+        if needed > self._vectors.shape[0] or not self._vectors.flags.writeable:
+            grown = np.empty((max(needed, 2 * self._vectors.shape[0]), dim), dtype=np.float32)
+            grown[: self._count] = self._vectors[: self._count]
+            self._vectors = grown
+
+    def _write(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]], overwrite: bool) -> None:
+        if not ids:
+            return
+        self._bump_generation()
+        self._dirty = True
+        before = self._count
+        rows = _normalize(np.asarray(embeddings, dtype=np.float32))
+        self._reserve(len(ids), rows.shape[1])
+        for chunk_id, doc, meta, row in zip(ids, docs, metas, rows):
+            pos = self._index.get(chunk_id)
+            if pos is None:
+                pos = self._count
+                self._count += 1
+                self._index[chunk_id] = pos
+                self._ids.append(chunk_id)
+                self._docs.append(doc)
+                self._metas.append(dict(meta))
+            elif overwrite:
+                self._docs[pos] = doc
+                self._metas[pos] = dict(meta)
+            else:
+                logging.warning(f'id already stored, skipping: {chunk_id}')
+                continue
+            self._vectors[pos] = row
+        if len(ids) > self._count - before:
+            self._meta_index.invalidate()  # existing rows were rewritten
+        else:
+            self._meta_index.append(before, self._metas[before:])
+
+    def save(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+             embeddings: Sequence[Sequence[float]]):
+        self._write(ids, docs, metas, embeddings, overwrite=False)
+
+    def upsert(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]]):
+        self._write(ids, docs, metas, embeddings, overwrite=True)
+
+    def update_metadata(self, ids: Sequence[str], metas: Sequence[Dict]):
+        self._bump_generation()
+        self._dirty = True
+        self._meta_index.invalidate()
+        for chunk_id, meta in zip(ids, metas):
+            self._metas[self._index[chunk_id]] = dict(meta)
+
+    def delete(self, ids: Sequence[str]):
+        """Swap-remove: the last row moves into the freed slot, keeping the matrix contiguous."""
+        self._bump_generation()
+        self._dirty = True
+        self._meta_index.invalidate()
+        for chunk_id in ids:
+            pos = self._index.pop(chunk_id, None)
+            if pos is None:
+                continue
+            self._reserve(0, self._vectors.shape[1])  # make a memory-mapped matrix writable
+            last = self._count - 1
+            if pos != last:
+                self._vectors[pos] = self._vectors[last]
+                self._ids[pos] = self._ids[last]
+                self._docs[pos] = self._docs[last]
+                self._metas[pos] = self._metas[last]
+                self._index[self._ids[pos]] = pos
+            self._ids.pop()
+            self._docs.pop()
+            self._metas.pop()
+            self._count = last
+
+    def get_metadata(self, where: Optional[Dict] = None) -> Dict[str, Dict]:
+        if not where:
+            return dict(zip(self._ids, self._metas))
+        return {self._ids[j]: self._metas[j] for j in self._scope(where)}
+
+    # --- reads ---------------------------------------------------------------------------
+
+    def get(self, ids: Sequence[str]) -> Dict:
+        found = [self._index[i] for i in ids if i in self._index]
+        return {"ids": [self._ids[j] for j in found], "documents": [self._docs[j] for j in found],
+                "metadatas": [self._metas[j] for j in found]}
+
+    def _scope(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Sorted positions of the rows matching `where`, or None for every row."""
+        if not where:
+            return None
+        return self._meta_index.select(where, self._metas)
+
+    @staticmethod
+    def _empty(n_queries: int) -> Dict:
+        return {key: [[] for _ in range(n_queries)] for key in ("ids", "documents", "metadatas", "distances")}
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, **search_params) -> Dict:
+        """Exact top-k for a batch of queries in one matrix product, over the rows matching `where`."""
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        scope = self._scope(where)
+        n = self._count if scope is None else len(scope)
+        if n == 0:
+            return self._empty(len(queries))
+        if scope is None:
+            scores = queries @ self.vectors.T  # (q, n) cosine similarities
+        elif 2 * n <= self._count:
+            # narrow scope: gather just its rows, so cost follows the scope, not the corpus
+            scores = queries @ np.asarray(self._vectors[scope], dtype=np.float32).T
+        else:
+            # broad scope: a gather would copy most of the matrix; score it in place and mask
+            scores = queries @ self.vectors.T
+            outside = np.ones(self._count, dtype=bool)
+            outside[scope] = False
+            scores[:, outside] = -np.inf
+            scope = None
+        k = min(n_results, n)
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), (len(queries), scores.shape[1]))
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row_scores, cand in zip(scores, top):
+            local = cand[np.argsort(-row_scores[cand], kind="stable")]
+            order = local if scope is None else scope[local]
+            out["ids"].append([self._ids[j] for j in order])
+            out["documents"].append([self._docs[j] for j in order])
+            out["metadatas"].append([self._metas[j] for j in order])
+            out["distances"].append((1.0 - row_scores[local]).tolist())
+        return out
+
+    def query(self, query_embedding: Sequence[float], n_results: int = 3, where: Optional[Dict] = None,
+              **search_params) -> Dict:
+        return self.query_batch([query_embedding], n_results=n_results, where=where, **search_params)
+
+    def count(self) -> int:
+        return self._count
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Dict]:
+        for lo in range(0, self._count, batch_size):
+            hi = min(self._count, lo + batch_size)
+            yield {"ids": self._ids[lo:hi], "documents": self._docs[lo:hi], "metadatas": self._metas[lo:hi],
+                   "embeddings": np.array(self._vectors[lo:hi])}
+
+    def delete_collection(self, name: str):
+        logging.warning(f'deleting numpy store: {name}')
+        self._bump_generation()
+        self._dirty = True
+        self._vectors, self._count = None, 0
+        self._ids, self._docs, self._metas, self._index = [], [], [], {}
+        self._meta_index.invalidate()
+        if self.path:
+            for f in (VECTORS_FILE, RECORDS_FILE):
+                (self.path / f).unlink(missing_ok=True)
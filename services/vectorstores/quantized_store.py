@@ -0,0 +1,212 @@
+import logging
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from .numpy_store import NumpyStore, VECTORS_FILE, _normalize
+
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return _POPCOUNT[bits]
+
+
+def quantize_int8(rows: np.ndarray):
+    """Symmetric per-row int8 codes and their float32 scales: row ~= codes * scale."""
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(rows: np.ndarray) -> np.ndarray:
+    """One sign bit per dimension, packed 8 per byte."""
+    return np.packbits(rows > 0, axis=1)
+
+
+class QuantizedStore(NumpyStore):
+    """
+    NumpyStore that searches compressed codes held in RAM and reranks a shortlist against
+    the full-precision vectors.
+
+    `quantization="int8"` keeps one byte per dimension plus a per-row scale (4x smaller);
+    `"binary"` keeps one bit per dimension (32x smaller) searched by Hamming distance. The
+    best `n_results * rerank_factor` candidates are rescored exactly from vectors.npy,
+    which after flush() or on load is memory-mapped, so only the shortlisted rows are read
+    and the float matrix does not have to stay resident. `rerank_factor=0` returns the
+    approximate ranking as is.
+    """
+
+    def __init__(self, path: Optional[str] = None, quantization: str = "int8", rerank_factor: int = 4,
+                 block_rows: int = 2048):
+        if quantization not in ("int8", "binary"):
+            raise ValueError(f"unknown quantization {quantization!r}, expected 'int8' or 'binary'")
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.block_rows = block_rows
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        super().__init__(path=path, mmap=True)
+
+    # --- persistence -------------------------------------------------------------------
+
+    def _load(self) -> None:
+        super()._load()
+        codes_file = self.path / CODES_FILE
+        if codes_file.exists():
+            self._codes = np.load(codes_file)
+            if self.quantization == "int8":
+                self._scales = np.load(self.path / SCALES_FILE)
+        if not self._codes_match():
+            logging.info(f're-quantizing {self._count} vectors ({self.quantization})')
+            self._codes, self._scales = None, None
+            self._encode(0, self._count)
+
+    def _codes_match(self) -> bool:
+        if self._codes is None or len(self._codes) < self._count:
+            return False
+        if self.quantization == "int8":
+            return self._codes.dtype == np.int8 and self._scales is not None
+        return self._codes.dtype == np.uint8
+
+    def _persist(self) -> None:
+        if not self.path:
+            return
+        super()._persist()
+        for name, arr in ((CODES_FILE, self._codes), (SCALES_FILE, self._scales)):
+            target = self.path / name
+            if arr is None:
+                target.unlink(missing_ok=True)
+                continue
+            tmp = self.path / (name + ".tmp")
+            with tmp.open("wb") as fh:
+                np.save(fh, arr[: self._count])
+            tmp.replace(target)
+        # serve reranks from the file from here on instead of keeping the floats resident
+        if self._count:
+            self._vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Bytes of the resident codes vs. the full-precision matrix (in RAM or mapped)."""
+        live = self._count
+        codes = 0 if self._codes is None else self._codes[:live].nbytes
+        scales = 0 if self._scales is None else self._scales[:live].nbytes
+        full = self.vectors.nbytes
+        return {"codes": codes + scales, "full_precision": full,
+                "full_precision_resident": 0 if isinstance(self._vectors, np.memmap) else full}
+
+    # --- codes -------------------------------------------------------------------------
+
+    def _encode(self, start: int, stop: int) -> None:
+        """(Re)compute codes for rows [start, stop), growing the code arrays as needed."""
+        if stop <= start:
+            return
+        dim = self._vectors.shape[1]
+        width = dim if self.quantization == "int8" else (dim + 7) // 8
+        dtype = np.int8 if self.quantization == "int8" else np.uint8
+        if self._codes is None or self._codes.shape[0] < stop:
+            grown = np.zeros((max(stop, 2 * (0 if self._codes is None else self._codes.shape[0]), 1024), width),
+                             dtype=dtype)
+            if self._codes is not None:
+                grown[: self._codes.shape[0]] = self._codes
+            self._codes = grown
+            if self.quantization == "int8":
+                scales = np.ones(grown.shape[0], dtype=np.float32)
+                if self._scales is not None:
+                    scales[: self._scales.shape[0]] = self._scales
+                self._scales = scales
+        for lo in range(start, stop, self.block_rows):
+            hi = min(stop, lo + self.block_rows)
+            rows = np.asarray(self._vectors[lo:hi], dtype=np.float32)
+            if self.quantization == "int8":
+                self._codes[lo:hi], self._scales[lo:hi] = quantize_int8(rows)
+            else:
+                self._codes[lo:hi] = quantize_binary(rows)
+
+    def _write(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]], overwrite: bool) -> None:
+        before = self._count
+        super()._write(ids, docs, metas, embeddings, overwrite)
+        if overwrite:
+            for chunk_id in ids:
+                pos = self._index[chunk_id]
+                if pos < before:
+                    self._encode(pos, pos + 1)
+        self._encode(before, self._count)
+
+    def delete(self, ids: Sequence[str]):
+        for chunk_id in ids:
+            pos = self._index.get(chunk_id)
+            if pos is None:
+                continue
+            last = self._count - 1
+            if pos != last:  # mirror NumpyStore's swap-remove
+                self._codes[pos] = self._codes[last]
+                if self._scales is not None:
+                    self._scales[pos] = self._scales[last]
+            super().delete([chunk_id])
+
+    def delete_collection(self, name: str):
+        super().delete_collection(name)
+        self._codes, self._scales = None, None
+        if self.path:
+            for f in (CODES_FILE, SCALES_FILE):
+                (self.path / f).unlink(missing_ok=True)
+
+    # --- reads -------------------------------------------------------------------------
+
+    def _approximate(self, queries: np.ndarray, block: Union[slice, np.ndarray],
+                     buf: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate similarity (higher is better) of the rows in `block` (a slice or positions) to each query."""
+        codes = self._codes[block]
+        if self.quantization == "int8":
+            # widen one cache-sized block at a time into a reused buffer rather than the whole matrix
+            rows = buf[: len(codes)] if buf is not None else np.empty((len(codes), queries.shape[1]), dtype=np.float32)
+            rows[...] = codes
+            return (rows @ queries.T) * self._scales[block, None]
+        q_bits = quantize_binary(queries)
+        dim = queries.shape[1]
+        hamming = np.stack([_popcount(codes ^ qb).sum(axis=1, dtype=np.int32) for qb in q_bits], axis=1)
+        return 1.0 - 2.0 * hamming.astype(np.float32) / dim  # maps Hamming distance onto [-1, 1]
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, **search_params) -> Dict:
+        """Approximate scan of the codes (only those of rows matching `where`), then exact rerank."""
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        scope = self._scope(where)
+        n = self._count if scope is None else len(scope)
+        if n == 0:
+            return self._empty(len(queries))
+        k = min(n_results, n)
+        shortlist = min(n, max(k, k * self.rerank_factor))
+        buf = np.empty((self.block_rows, queries.shape[1]), dtype=np.float32) if self.quantization == "int8" else None
+        blocks = [slice(lo, min(n, lo + self.block_rows)) if scope is None else scope[lo:lo + self.block_rows]
+                  for lo in range(0, n, self.block_rows)]
+        approx = np.concatenate([self._approximate(queries, block, buf) for block in blocks])  # (n, q)
+        positions = np.arange(n) if scope is None else scope
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for qi, q in enumerate(queries):
+            scores = approx[:, qi]
+            if shortlist < n:
+                local = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            else:
+                local = np.arange(n)
+            cand = positions[local]
+            if self.rerank_factor:
+                cand = np.sort(cand)  # ascending offsets read the mapped file sequentially
+                scores_c = np.asarray(self._vectors[cand], dtype=np.float32) @ q
+            else:
+                scores_c = scores[local]
+            top = np.argsort(-scores_c, kind="stable")[:k]
+            order = cand[top]
+            out["ids"].append([self._ids[j] for j in order])
+            out["documents"].append([self._docs[j] for j in order])
+            out["metadatas"].append([self._metas[j] for j in order])
+            out["distances"].append((1.0 - scores_c[top]).tolist())
+        return out
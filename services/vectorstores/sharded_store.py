@@ -0,0 +1,153 @@
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from .base import VectorStore
+
+_RESULT_KEYS = ("ids", "documents", "metadatas", "distances")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): growing N -> N + 1 buckets moves only 1/(N + 1) of keys."""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (1 << 31) / ((key >> 33) + 1))
+    return b
+
+
+def shard_for(chunk_id: str, n_shards: int) -> int:
+    """Stable shard of a chunk id (independent of PYTHONHASHSEED and of process)."""
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "little"), n_shards)
+
+
+def merge_top_k(results: Sequence[Dict], k: int) -> Dict:
+    """Merge single-query result dicts (each sorted by distance) into the global top-k."""
+    rows = heapq.merge(*[zip(*(r.get(key, [[]])[0] for key in _RESULT_KEYS)) for r in results],
+                       key=lambda row: row[3])
+    top = [row for _, row in zip(range(k), rows)]
+    return {key: [[row[i] for row in top]] for i, key in enumerate(_RESULT_KEYS)}
+
+
+class ShardedStore(VectorStore):
+    """
+    VectorStore that hash-partitions chunks across N underlying stores.
+
+    Each chunk id lives on exactly one shard (`shard_for`), so writes, deletes and
+    metadata updates touch only the shards owning their ids, while queries fan out to
+    every shard concurrently and the per-shard top-k lists are merged by distance. Shards
+    are independent stores (numpy matrices, Chroma collections, possibly on different
+    volumes); numpy matmuls and Chroma's native queries release the GIL, so a thread per
+    shard scales query throughput with cores. index/rebalance.py moves chunks when the
+    shard count changes.
+    """
+
+    def __init__(self, shards: Sequence[VectorStore], max_workers: Optional[int] = None):
+        if not shards:
+            raise ValueError("ShardedStore needs at least one shard")
+        self.shards = list(shards)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.shards),
+                                        thread_name_prefix="vector-shard")
+
+    @property
+    def generation(self) -> int:
+        return sum(s.generation for s in self.shards)
+
+    def shard_for(self, chunk_id: str) -> int:
+        return shard_for(chunk_id, len(self.shards))
+
+    def _map(self, fn: Callable[[VectorStore], object]) -> List:
+        if len(self.shards) == 1:
+            return [fn(self.shards[0])]
+        return list(self._pool.map(fn, self.shards))
+
+    def _partition(self, ids: Sequence[str], *columns: Sequence) -> Dict[int, List[List]]:
+        """{shard: [ids, column...]} for the rows owned by each shard."""
+        parts: Dict[int, List[List]] = {}
+        for row in zip(ids, *columns):
+            part = parts.setdefault(self.shard_for(row[0]), [[] for _ in range(len(row))])
+            for col, value in zip(part, row):
+                col.append(value)
+        return parts
+
+    def _write_each(self, method: str, ids: Sequence[str], *columns: Sequence) -> None:
+        parts = self._partition(ids, *columns)
+        futures = [self._pool.submit(getattr(self.shards[s], method), *cols) for s, cols in parts.items()]
+        for f in futures:
+            f.result()
+
+    # --- writes ------------------------------------------------------------------------
+
+    def save(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+             embeddings: Sequence[Sequence[float]]):
+        self._write_each("save", ids, docs, metas, embeddings)
+
+    def upsert(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict],
+               embeddings: Sequence[Sequence[float]]):
+        self._write_each("upsert", ids, docs, metas, embeddings)
+
+    def update_metadata(self, ids: Sequence[str], metas: Sequence[Dict]):
+        self._write_each("update_metadata", ids, metas)
+
+    def delete(self, ids: Sequence[str]):
+        self._write_each("delete", ids)
+
+    def flush(self):
+        self._map(lambda s: s.flush())
+
+    def close(self):
+        self._map(lambda s: s.close())
+        self._pool.shutdown(wait=True)
+
+    def delete_collection(self, name: str):
+        # every shard is its own collection (`<name>_shard<i>` for Chroma)
+        self._map(lambda s: s.delete_collection(getattr(s, "collection_name", name)))
+
+    # --- reads -------------------------------------------------------------------------
+
+    def get_metadata(self, where: Optional[Dict] = None) -> Dict[str, Dict]:
+        out: Dict[str, Dict] = {}
+        for part in self._map(lambda s: s.get_metadata(where)):
+            out.update(part)
+        return out
+
+    def get(self, ids: Sequence[str]) -> Dict:
+        parts = self._partition(ids)
+        found = {}
+        for s, (shard_ids,) in parts.items():
+            got = self.shards[s].get(shard_ids)
+            found.update({i: (d, m) for i, d, m in zip(got["ids"], got["documents"], got["metadatas"])})
+        ordered = [i for i in ids if i in found]
+        return {"ids": ordered, "documents": [found[i][0] for i in ordered],
+                "metadatas": [found[i][1] for i in ordered]}
+
+    def query(self, query_embedding: Sequence[float], n_results: int = 3, where: Optional[Dict] = None,
+              **search_params) -> Dict:
+        return self.query_batch([query_embedding], n_results=n_results, where=where, **search_params)
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 3,
+                    where: Optional[Dict] = None, **search_params) -> Dict:
+        """Scatter the whole batch to every shard, then merge each query's top-k by distance."""
+        query_embeddings = list(query_embeddings)
+        per_shard = self._map(lambda s: s.query_batch(query_embeddings, n_results=n_results, where=where,
+                                                      **search_params))
+        out: Dict[str, List] = {key: [] for key in _RESULT_KEYS}
+        for q in range(len(query_embeddings)):
+            merged = merge_top_k([{key: [res[key][q]] for key in _RESULT_KEYS} for res in per_shard], n_results)
+            for key in _RESULT_KEYS:
+                out[key].append(merged[key][0])
+        return out
+
+    def count(self) -> int:
+        return sum(self._map(lambda s: s.count()))
+
+    def counts(self) -> List[int]:
+        """Chunks per shard, for spotting skew."""
+        return self._map(lambda s: s.count())
+
+    def scan(self, batch_size: int = 1000) -> Iterator[Dict]:
+        for shard in self.shards:
+            yield from shard.scan(batch_size)
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from services.llm.agent_pool import AgentPool
+
+
+class _Agent:
+    running = 0
+    peak = 0
+
+    async def run(self, user_msg):
+        _Agent.running += 1
+        _Agent.peak = max(_Agent.peak, _Agent.running)
+        await asyncio.sleep(0.01)
+        _Agent.running -= 1
+        return user_msg.upper()
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_agents_and_bounds_concurrency():
+    built = []
+
+    def _factory():
+        built.append(_Agent())
+        return built[-1]
+
+    pool = AgentPool(_factory, size=3)
+    await pool.warm()
+
+    async def _call(msg):
+        async with pool.checkout() as agent:
+            return await agent.run(msg)
+
+    results = await asyncio.gather(*(_call(f"q{i}") for i in range(12)))
+
+    assert results == [f"Q{i}" for i in range(12)]
+    assert len(built) == 3
+    assert _Agent.peak <= 3
+    snap = pool.snapshot()
+    assert snap["checkouts"] == 12 and snap["in_use"] == 0
+    assert snap["wait_s_max"] > 0 and snap["run_s_avg"] > 0
+
+
+@pytest.mark.asyncio
+async def test_checkout_times_out_when_pool_exhausted():
+    pool = AgentPool(_Agent, size=1, acquire_timeout=0.01)
+    async with pool.checkout():
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.checkout():
+                pass
+    assert pool.stats["timeouts"] == 1
@@ -0,0 +1,35 @@
+from services.llm.answer_cache import SemanticAnswerCache
+
+
+def test_similar_query_over_same_context_hits():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put([1.0, 0.0, 0.0], ["c1", "c2"], "cached answer")
+
+    assert cache.lookup([0.99, 0.05, 0.0], ["c2", "c1"]) == "cached answer"
+    assert cache.lookup([0.0, 1.0, 0.0], ["c1", "c2"]) is None  # dissimilar query
+    assert cache.lookup([1.0, 0.0, 0.0], ["c1", "c3"]) is None  # different context
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_ttl_lru_and_index_generation():
+    now = [0.0]
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+    cache.put([1.0, 0.0], ["a"], "A", generation=1)
+    cache.put([0.0, 1.0], ["b"], "B", generation=1)
+    assert cache.lookup([1.0, 0.0], ["a"], generation=1) == "A"  # "a" is now most recent
+    cache.put([1.0, 1.0], ["c"], "C", generation=1)  # evicts "b"
+    assert cache.lookup([0.0, 1.0], ["b"], generation=1) is None
+
+    assert cache.lookup([1.0, 0.0], ["a"], generation=2) is None  # index changed
+    cache.put([1.0, 0.0], ["a"], "A2", generation=2)
+    now[0] = 11
+    assert cache.lookup([1.0, 0.0], ["a"], generation=2) is None  # expired
+
+
+def test_changed_chunk_text_under_same_ids_misses():
+    # build_index in another process rewrites chunk text without bumping this process's generation
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put([1.0, 0.0], ["doc-chunk-0", "doc-chunk-1"], "old answer", documents=["alpha", "beta"])
+    assert cache.lookup([1.0, 0.0], ["doc-chunk-1", "doc-chunk-0"], documents=["beta", "alpha"]) == "old answer"
+    assert cache.lookup([1.0, 0.0], ["doc-chunk-0", "doc-chunk-1"], documents=["alpha", "beta v2"]) is None
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+
+import query.run_query as run_query
+from services.embedding.base import EmbeddingService
+from services.llm.base import LLMService
+from services.vectorstores.base import VectorStore
+
+
+class _Embedder(EmbeddingService):
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return [[float(len(t))] for t in texts]
+
+
+class _Store(VectorStore):
+    def __init__(self):
+        self.batch_calls = 0
+
+    def query_batch(self, query_embeddings, n_results=3):
+        self.batch_calls += 1
+        return {
+            "ids": [[f"chunk-{int(e[0])}"] for e in query_embeddings],
+            "documents": [[f"doc for length {int(e[0])}"] for e in query_embeddings],
+            "metadatas": [[{"source": "s"}] for _ in query_embeddings],
+            "distances": [[0.1] for _ in query_embeddings],
+        }
+
+
+class _SlowLLM(LLMService):
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, user_prompt, max_output_tokens=512):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+        return "answer: " + user_prompt.split("Query:")[1].split()[0]
+
+
+class _RecordingPipeline:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+        return True
+
+
+class _QueryStore(_Store):
+    def query(self, query_embedding, n_results=3, **params):
+        return self.query_batch([query_embedding], n_results)
+
+
+def _patch(monkeypatch):
+    embedder, store, llm = _Embedder(), _Store(), _SlowLLM()
+    monkeypatch.setattr(run_query, "get_embedding_service", lambda cfg=None: embedder)
+    monkeypatch.setattr(run_query, "get_vector_store", lambda cfg=None: store)
+    monkeypatch.setattr(run_query, "get_llm_service", lambda cfg=None: llm)
+    monkeypatch.setattr(run_query, "get_answer_cache", lambda cfg=None: None)
+    return embedder, store, llm
+
+
+def test_batch_embeds_and_searches_once_and_keeps_order(monkeypatch):
+    embedder, store, llm = _patch(monkeypatch)
+    queries = ["alpha", "be", "gamma-ray", "d"]
+
+    results = run_query.search_and_synthesize_batch(queries, max_concurrency=2)
+
+    assert embedder.calls == 1 and store.batch_calls == 1
+    assert [a for a, _ in results] == [f"answer: {q}" for q in queries]
+    assert [h["ids"] for _, h in results] == [[[f"chunk-{len(q)}"]] for q in queries]
+    assert llm.peak <= 2
+
+
+def test_run_batch_jsonl_roundtrip(monkeypatch, tmp_path):
+    _patch(monkeypatch)
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    src.write_text("\n".join(json.dumps({"request_id": f"r{i}", "title": t}) for i, t in enumerate(["one", "two"])))
+
+    assert run_query.run_batch(src, out, field="title") == 2
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [r["request_id"] for r in rows] == ["r0", "r1"]
+    assert rows[1]["answer"] == "answer: two" and rows[1]["ids"] == ["chunk-3"]
+
+
+def test_streamed_answers_are_submitted_for_evaluation(monkeypatch):
+    _patch(monkeypatch)
+    pipeline = _RecordingPipeline()
+    monkeypatch.setattr(run_query, "get_vector_store", lambda cfg=None: _QueryStore())
+    monkeypatch.setattr(run_query, "get_lexical_index", lambda cfg=None: None)
+    monkeypatch.setattr(run_query, "get_context_builder", lambda cfg=None: None)
+    monkeypatch.setattr(run_query, "get_eval_pipeline", lambda cfg=None: pipeline)
+
+    tokens, _ = run_query.search_and_synthesize_stream("alpha")
+    assert not pipeline.records  # nothing is evaluated before the answer is complete
+    assert "".join(tokens) == "answer: alpha"
+
+    async def consume():
+        tokens, _ = await run_query.asearch_and_synthesize_stream("be")
+        return "".join([t async for t in tokens])
+
+    assert asyncio.run(consume()) == "answer: be"
+    assert [(r.query, r.answer, r.contexts) for r in pipeline.records] == [
+        ("alpha", "answer: alpha", ["s: doc for length 5"]), ("be", "answer: be", ["s: doc for length 2"])]
@@ -0,0 +1,135 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import query.run_query as run_query  # noqa: E402
+from index.bm25 import BM25Index, LexicalSearch, rrf_fuse, tokenize  # noqa: E402
+from services.embedding.base import EmbeddingService  # noqa: E402
+from services.vectorstores.base import VectorStore  # noqa: E402
+
+ROWS = [
+    {"id": "c0", "text": "Torque settings for part PN-1042 are listed in clause 4.2.1."},
+    {"id": "c1", "text": "The pump housing must be inspected before every service interval."},
+    {"id": "c2", "text": "Replace the housing seal when inspecting the pump; see clause 4.3."},
+    {"id": "c3", "text": "General safety guidance applies to every service task."},
+]
+
+
+def test_tokenize_keeps_identifiers_and_parts():
+    assert tokenize("Part PN-1042, clause 4.2.1.") == ["part", "pn-1042", "pn", "1042", "clause", "4.2.1", "4", "2", "1"]
+
+
+def test_search_ranks_and_roundtrips(tmp_path):
+    index = BM25Index.build(ROWS)
+    assert index.search("pump housing", k=2)[0][0] in {"c1", "c2"}
+    assert index.search("PN-1042")[0][0] == "c0"
+    assert index.search("nothing matches this") == []
+
+    path = tmp_path / "bm25.idx"
+    index.save(str(path))
+    loaded = BM25Index.load(str(path))
+    assert loaded.ids == index.ids and loaded.terms == index.terms
+    assert loaded.search("housing seal") == index.search("housing seal")
+
+
+def test_scores_match_the_bm25_formula():
+    rng = random.Random(0)
+    vocab = [f"w{i}" for i in range(40)]
+    rows = [{"id": f"c{j}", "text": " ".join(rng.choices(vocab, k=rng.randint(3, 30)))} for j in range(300)]
+    index = BM25Index.build(rows, k1=1.2, b=0.75)
+    docs = [tokenize(r["text"]) for r in rows]
+    avgdl = sum(map(len, docs)) / len(docs)
+
+    def reference(query):
+        scores = {}
+        for term in set(tokenize(query)):
+            df = sum(term in d for d in docs)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            for j, d in enumerate(docs):
+                tf = d.count(term)
+                if tf:
+                    norm = 1.2 * (1 - 0.75 + 0.75 * len(d) / avgdl)
+                    scores[j] = scores.get(j, 0.0) + idf * tf * 2.2 / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+    for query in ("w1", "w2 w3 w3", "w5 w7 w11 w13 nothing"):
+        want = reference(query)[:10]
+        got = index.search(query, k=10)
+        assert [i for i, _ in got] == [f"c{j}" for j, _ in want]
+        assert all(math.isclose(g, w, rel_tol=1e-5) for (_, g), (_, w) in zip(got, want))
+    assert index.search("w1", k=0) == []
+
+
+def test_confidence_requires_rare_identifier():
+    index = BM25Index.build(ROWS)
+    assert index.confident("specs for PN-1042", index.search("specs for PN-1042"))
+    assert index.confident("clause 4.2.1", index.search("clause 4.2.1"))
+    assert not index.confident("pump housing", index.search("pump housing"))
+    assert not index.confident("part PN-9999", index.search("part PN-9999"))
+
+
+def test_rrf_fuse_rewards_agreement():
+    fused = rrf_fuse([["a", "b", "c"], ["c", "b", "d"]], k=60)
+    order = [i for i, _ in fused]
+    assert set(order[:2]) == {"b", "c"} and set(order[2:]) == {"a", "d"}
+
+
+class _Embedder(EmbeddingService):
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return [[1.0] for _ in texts]
+
+
+class _Store(VectorStore):
+    def query(self, query_embedding, n_results=3):
+        ids = ["c3", "c1"][:n_results]
+        return {"ids": [ids], "documents": [[f"doc {i}" for i in ids]],
+                "metadatas": [[{"source": i} for i in ids]], "distances": [[0.1, 0.2][:len(ids)]]}
+
+    def get(self, ids):
+        return {"ids": list(ids), "documents": [f"doc {i}" for i in ids], "metadatas": [{"source": i} for i in ids]}
+
+
+def test_retrieve_fast_path_and_fusion(monkeypatch):
+    embedder = _Embedder()
+    monkeypatch.setattr(run_query, "get_embedding_service", lambda cfg=None: embedder)
+    monkeypatch.setattr(run_query, "get_vector_store", lambda cfg=None: _Store())
+    monkeypatch.setattr(run_query, "get_lexical_index", lambda cfg=None: LexicalSearch(BM25Index.build(ROWS)))
+
+    hits, q_emb = run_query.retrieve("what does PN-1042 need?", n_results=2)
+    assert q_emb is None and embedder.calls == 0
+    assert hits["ids"][0][0] == "c0" and hits["documents"][0][0] == "doc c0"
+
+    hits, q_emb = run_query.retrieve("pump housing inspection", n_results=3)
+    assert q_emb == [1.0] and embedder.calls == 1
+    assert set(hits["ids"][0]) >= {"c1"}
+    # c1 is in both rankings, so it outranks vector-only c3
+    assert hits["ids"][0].index("c1") < hits["ids"][0].index("c3")
+    assert hits["distances"][0][hits["ids"][0].index("c1")] == 0.2
+
+
+class _AgenticLLM:
+    async def synthesize_agentic(self, prompt):
+        self.prompt = prompt
+        return "answer"
+
+
+def test_agentic_synthesize_uses_retrieve_and_context(monkeypatch):
+    embedder, llm = _Embedder(), _AgenticLLM()
+    monkeypatch.setattr(run_query, "get_embedding_service", lambda cfg=None: embedder)
+    monkeypatch.setattr(run_query, "get_vector_store", lambda cfg=None: _Store())
+    monkeypatch.setattr(run_query, "get_lexical_index", lambda cfg=None: LexicalSearch(BM25Index.build(ROWS)))
+    monkeypatch.setattr(run_query, "get_context_builder", lambda cfg=None: None)
+    monkeypatch.setattr(run_query, "get_llm_service", lambda cfg=None: llm)
+
+    answer, hits = asyncio.run(run_query.synthesize("what does PN-1042 need?", n_results=2))
+    assert answer == "answer" and embedder.calls == 0  # lexical fast path
+    assert hits["ids"][0][0] == "c0"
+    assert llm.prompt == run_query.prompt_for_hits("what does PN-1042 need?", hits)[0]
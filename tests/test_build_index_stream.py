@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from index.build_index import iter_chunks, index_full, index_stream, index_incremental
+from services.embedding.base import EmbeddingService
+from services.vectorstores.base import VectorStore
+
+
+class _CountingEmbedder(EmbeddingService):
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class _ListStore(VectorStore):
+    def __init__(self):
+        self.rows = []
+
+    def save(self, ids, docs, metas, embeddings):
+        self.rows.extend(zip(ids, docs, metas, embeddings))
+
+
+def test_index_stream_embeds_in_bounded_windows(tmp_path):
+    chunk_file = tmp_path / "chunks.jsonl"
+    with chunk_file.open("w", encoding="utf-8") as fh:
+        for i in range(10):
+            fh.write(json.dumps({"id": f"chunk-{i}", "text": "x" * i, "source": "doc.pdf"}) + "\n")
+
+    embedder, store = _CountingEmbedder(), _ListStore()
+    count = index_stream(iter_chunks(chunk_file), embedder, store, window_size=4, max_pending=1)
+
+    assert count == 10
+    assert embedder.batches == [4, 4, 2]
+    assert [r[0] for r in store.rows] == [f"chunk-{i}" for i in range(10)]
+    assert [r[2]["i"] for r in store.rows] == list(range(10))
+
+
+class _DictStore(VectorStore):
+    """In-memory store implementing the incremental VectorStore API."""
+
+    def __init__(self):
+        self.items = {}
+        self.upserted = []
+
+    def upsert(self, ids, docs, metas, embeddings):
+        self.upserted.extend(ids)
+        for i, d, m, e in zip(ids, docs, metas, embeddings):
+            self.items[i] = (d, dict(m), e)
+
+    def update_metadata(self, ids, metas):
+        for i, m in zip(ids, metas):
+            d, _, e = self.items[i]
+            self.items[i] = (d, dict(m), e)
+
+    def delete(self, ids):
+        for i in ids:
+            self.items.pop(i, None)
+
+    def get_metadata(self, where=None):
+        return {i: m for i, (_, m, _) in self.items.items()}
+
+
+def _rows(docs):
+    return [{"id": f"{src}-chunk-{i}", "text": t, "source": src} for src, texts in docs.items()
+            for i, t in enumerate(texts)]
+
+
+def test_index_incremental_only_touches_changes():
+    embedder, store = _CountingEmbedder(), _DictStore()
+    stats = index_incremental(_rows({"a": ["one", "two"], "b": ["three"], "c": ["four"]}), embedder, store)
+    assert stats["upserted"] == 4
+
+    store.upserted.clear()
+    stats = index_incremental(_rows({"a": ["one", "two"], "b": ["three"], "c": ["four"]}), embedder, store)
+    assert stats["upserted"] == 0 and stats["deleted"] == 0 and store.upserted == []
+
+    # "a" edits its second chunk, "b" grows, "c" disappears
+    stats = index_incremental(_rows({"a": ["one", "TWO"], "b": ["three", "five"]}), embedder, store)
+    assert sorted(store.upserted) == ["a-chunk-1", "b-chunk-1"]
+    assert stats["deleted"] == 1
+    assert sorted(store.items) == ["a-chunk-0", "a-chunk-1", "b-chunk-0", "b-chunk-1"]
+    fingerprints = {m["doc_fingerprint"] for i, (_, m, _) in store.items.items() if i.startswith("a-")}
+    assert len(fingerprints) == 1
+
+    # "b" shrinks back to one chunk
+    store.upserted.clear()
+    index_incremental(_rows({"a": ["one", "TWO"], "b": ["three"]}), embedder, store)
+    assert store.upserted == []
+    assert sorted(store.items) == ["a-chunk-0", "a-chunk-1", "b-chunk-0"]
+
+
+def test_full_rebuild_replaces_persisted_chunks(tmp_path):
+    pytest.importorskip("numpy")
+    from services.vectorstores.numpy_store import NumpyStore
+
+    def _write(texts):
+        chunk_file = tmp_path / "chunks.jsonl"
+        with chunk_file.open("w", encoding="utf-8") as fh:
+            for i, text in enumerate(texts):
+                fh.write(json.dumps({"id": f"doc-chunk-{i}", "text": text, "source": "doc.pdf"}) + "\n")
+        return chunk_file
+
+    store = NumpyStore(path=str(tmp_path / "store"))
+    index_full(iter_chunks(_write(["old a", "old b", "old c"])), _CountingEmbedder(), store)
+    store.flush()
+
+    store = NumpyStore(path=str(tmp_path / "store"))
+    index_full(iter_chunks(_write(["new a", "new b"])), _CountingEmbedder(), store)
+    store.flush()
+
+    reopened = NumpyStore(path=str(tmp_path / "store"))
+    assert sorted(reopened.get_metadata()) == ["doc-chunk-0", "doc-chunk-1"]
+    assert reopened.get(["doc-chunk-0", "doc-chunk-1"])["documents"] == ["new a", "new b"]
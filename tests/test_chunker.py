@@ -0,0 +1,39 @@
+import pytest
+
+from ingest.chunker import Chunk, Chunker, get_splitter, locate, page_starts, validate
+
+
+def test_locate_records_spans_and_pages():
+    pages = ["alpha beta", "gamma delta"]
+    text = "alpha beta\ngamma delta\n"
+    chunks = locate(text, ["alpha beta\ngamma", "gamma delta", "not in text"], page_starts(pages))
+    assert chunks[0] == Chunk("alpha beta\ngamma", 0, 16, 1, 2)
+    assert chunks[1] == Chunk("gamma delta", 11, 22, 2, 2)
+    assert chunks[2].char_start is None and chunks[2].offsets() == {}
+
+
+def test_unknown_method_rejected():
+    with pytest.raises(ValueError):
+        Chunker(method="regex")
+
+
+def test_matches_llama_splitter_boundaries():
+    pytest.importorskip("llama_index.core")
+    sentence = "The quick brown fox jumps over the lazy dog near the river bank. "
+    documents = [[sentence * 40, sentence * 25], [sentence * 5], [""]]
+    report = validate(documents, chunk_size=64, chunk_overlap=16)
+    assert report["boundary_mismatches"] == []
+    assert report["bad_offsets"] == 0 and report["missing_offsets"] == 0
+    assert report["chunks"] > 3
+
+    first = Chunker(64, 16).chunk_pages(documents[0])
+    assert first[0].page == 1 and first[-1].page_end == 2
+    assert get_splitter(64, 16) is get_splitter(64, 16)
+
+
+def test_validate_reports_mismatching_sources(monkeypatch):
+    import ingest.ingest_pdfs as ingest_pdfs
+    monkeypatch.setattr(ingest_pdfs, "chunk_text_llama", lambda text, size, overlap: ["different"])
+    documents = [["some text on a page"], ["more text"]]
+    assert validate(documents, 64, 16, ["a.pdf", "b.pdf"])["boundary_mismatches"] == ["a.pdf", "b.pdf"]
+    assert validate(documents, 64, 16)["boundary_mismatches"] == [0, 1]
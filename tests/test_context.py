@@ -0,0 +1,56 @@
+from query.context import ContextBuilder, estimate_tokens, text_overlap
+
+TEXT = " ".join(f"Sentence number {n} describes clause {n} of the agreement." for n in range(60))
+
+
+def _chunk(source, i, start, stop):
+    return TEXT[start:stop], {"source": source, "i": i, "char_start": start, "char_end": stop}
+
+
+def test_text_overlap():
+    assert text_overlap(TEXT[:700], TEXT[300:1000]) == 400
+    assert text_overlap(TEXT[:300], TEXT[400:1000]) == 0
+    assert text_overlap("alpha beta", "beta gamma") == 0  # too short to trust
+
+
+def test_overlapping_chunks_merge_in_document_order():
+    chunks = [_chunk("a.pdf", 1, 800, 1800), _chunk("a.pdf", 0, 0, 1000), _chunk("a.pdf", 2, 1600, 2400)]
+    docs, metas, report = ContextBuilder().build([d for d, _ in chunks], [m for _, m in chunks])
+    assert docs == [TEXT[0:2400]]
+    assert metas[0]["char_start"] == 0 and metas[0]["char_end"] == 2400 and metas[0]["i_end"] == 2
+    assert report.merged == 2 and report.passages_out == 1
+    assert report.tokens_saved == report.tokens_in - estimate_tokens(TEXT[0:2400]) > 0
+
+
+def test_adjacent_chunks_without_offsets_merge_on_shared_text():
+    docs, _, report = ContextBuilder().build([TEXT[500:1500], TEXT[0:600]],
+                                             [{"source": "a.pdf", "i": 4}, {"source": "a.pdf", "i": 3}])
+    assert docs == [TEXT[0:1500]]
+    assert report.merged == 1
+
+
+def test_distant_chunks_and_other_sources_stay_apart():
+    chunks = [_chunk("a.pdf", 0, 0, 500), _chunk("a.pdf", 5, 2000, 2500), _chunk("b.pdf", 1, 400, 900)]
+    docs, metas, report = ContextBuilder().build([d for d, _ in chunks], [m for _, m in chunks])
+    assert [m["source"] for m in metas] == ["a.pdf", "a.pdf", "b.pdf"]  # retrieval order kept
+    assert report.merged == 0
+
+
+def test_duplicate_passages_and_repeated_lines_are_dropped():
+    header = "ACME Corp. Confidential - Master Services Agreement"
+    docs = [f"{header}\nFirst body text.", f"{header}\nSecond body text.", "First body text."]
+    metas = [{"source": "a.pdf"}, {"source": "b.pdf"}, {"source": "c.pdf"}]
+    out, _, report = ContextBuilder().build(docs, metas)
+    assert out == [f"{header}\nFirst body text.", "Second body text."]
+    assert report.duplicates == 2
+
+
+def test_budget_packs_best_hits_first():
+    docs = [TEXT[0:400], TEXT[1000:2000], TEXT[3000:3200]]
+    metas = [{"source": f"{n}.pdf"} for n in range(3)]
+    out, metas, report = ContextBuilder(max_tokens=200).build(docs, metas)
+    assert [m["source"] for m in metas] == ["0.pdf", "2.pdf"]
+    assert report.dropped == 1 and report.tokens_out <= 200
+
+    out, _, report = ContextBuilder(max_tokens=50).build([TEXT[0:1000]], [{"source": "a.pdf"}])
+    assert report.truncated and estimate_tokens(out[0]) <= 50 and TEXT.startswith(out[0])
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+from services.embedding.base import EmbeddingService
+from services.embedding.cached_service import CachedEmbeddingService
+
+
+class _RecordingEmbedder(EmbeddingService):
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_cache_sends_only_misses_upstream(tmp_path):
+    inner = _RecordingEmbedder()
+    cache = CachedEmbeddingService(inner, path=str(tmp_path / "cache.sqlite"))
+
+    first = cache.embed(["alpha", "beta", "alpha"])
+    assert inner.calls == [["alpha", "beta"]]
+    assert first == [[5.0, 1.0], [4.0, 1.0], [5.0, 1.0]]
+
+    second = cache.embed(["beta", "gamma"])
+    assert inner.calls[-1] == ["gamma"]
+    assert second == [[4.0, 1.0], [5.0, 1.0]]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+    cache.close()
+
+    # a fresh process re-opens the same file and is served entirely from disk
+    reopened = CachedEmbeddingService(_RecordingEmbedder(), path=str(tmp_path / "cache.sqlite"))
+    assert reopened.embed(["alpha", "gamma"]) == [[5.0, 1.0], [5.0, 1.0]]
+    assert reopened.inner.calls == []
+    reopened.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    inner = _RecordingEmbedder()
+    cache = CachedEmbeddingService(inner, path=str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.embed(["a"])
+    cache.embed(["bb"])
+    cache.embed(["a"])  # refresh "a"
+    cache.embed(["ccc"])  # evicts "bb"
+    assert cache.stats()["entries"] == 2
+
+    inner.calls.clear()
+    cache.embed(["a", "bb", "ccc"])
+    assert inner.calls == [["bb"]]
+    cache.close()
+
+
+def test_hits_are_counted_under_concurrency_and_touched_in_batches(tmp_path):
+    cache = CachedEmbeddingService(_RecordingEmbedder(), path=str(tmp_path / "cache.sqlite"), touch_batch=1000)
+    texts = [f"t{i}" for i in range(20)]
+    cache.embed(texts)
+    writes = cache._conn.total_changes
+
+    def worker():
+        for _ in range(50):
+            cache.embed(texts[:10])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["hits"] == 8 * 50 * 10
+    assert cache._conn.total_changes == writes  # hits did not write to sqlite
+
+    cache.close()
+    reopened = sqlite3.connect(str(tmp_path / "cache.sqlite"))
+    used = dict(reopened.execute("SELECT key, last_used FROM embeddings").fetchall())
+    reopened.close()
+    assert len(set(used.values())) > 1  # the hit keys' timestamps were flushed on close
@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from services.embedding.executor import EmbeddingExecutor, RateLimiter, is_retryable
+
+
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+class _FakeEmbeddingServer:
+    """Stub backend with injected latency, transient failures and an in-flight gauge."""
+
+    def __init__(self, latency=0.0, fail_first=0, fail_code=429):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_code = fail_code
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self._lock:
+            self.requests.append(list(batch))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            fail = len(self.requests) <= self.fail_first
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise _ApiError(self.fail_code)
+            return [[float(len(t))] for t in batch]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_executor_preserves_order_and_deduplicates():
+    server = _FakeEmbeddingServer(latency=0.01)
+    executor = EmbeddingExecutor(max_concurrency=3, max_batch_items=2)
+    texts = ["a", "bbb", "a", "cc", "dddd", "bbb", "eeeee"]
+
+    vectors = executor.run(texts, server)
+
+    assert vectors == [[float(len(t))] for t in texts]
+    sent = [t for batch in server.requests for t in batch]
+    assert sorted(sent) == sorted(set(texts))
+    assert all(len(b) <= 2 for b in server.requests)
+    assert server.peak_in_flight <= 3
+    executor.shutdown()
+
+
+def test_executor_batches_by_token_budget():
+    executor = EmbeddingExecutor(max_batch_items=100, max_batch_tokens=10)
+    batches = executor.make_batches(["x" * 20, "y" * 20, "z" * 8, "w" * 40])
+    assert [len(b) for b in batches] == [2, 1, 1]  # 5 + 5 tokens fill the first batch
+    executor.shutdown()
+
+
+def test_executor_retries_retryable_errors_with_backoff():
+    delays = []
+    server = _FakeEmbeddingServer(fail_first=2, fail_code=503)
+    executor = EmbeddingExecutor(max_concurrency=1, base_delay=0.1, sleep=delays.append)
+
+    assert executor.run(["hello"], server) == [[5.0]]
+    assert len(server.requests) == 3
+    assert len(delays) == 2 and delays[0] <= 0.1 and delays[1] <= 0.2
+    executor.shutdown()
+
+
+def test_transport_errors_without_status_are_retryable():
+    errors = [ConnectionResetError("reset by peer"), TimeoutError("read timed out"), socket.gaierror("dns")]
+    httpx = pytest.importorskip("httpx")
+    errors += [httpx.ConnectError("refused"), httpx.ReadTimeout("slow")]
+    assert all(is_retryable(e) for e in errors)
+    assert not is_retryable(ValueError("bad input"))
+
+    calls = []
+
+    def _flaky(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise ConnectionResetError("reset by peer")
+        return [[1.0] for _ in batch]
+
+    executor = EmbeddingExecutor(max_concurrency=1, sleep=lambda s: None)
+    assert executor.run(["hello"], _flaky) == [[1.0]]
+    assert len(calls) == 2
+    executor.shutdown()
+
+
+def test_executor_does_not_retry_client_errors():
+    server = _FakeEmbeddingServer(fail_first=1, fail_code=400)
+    executor = EmbeddingExecutor(sleep=lambda s: None)
+    with pytest.raises(_ApiError):
+        executor.run(["hello"], server)
+    assert len(server.requests) == 1
+    executor.shutdown()
+
+
+def test_rate_limiter_spaces_requests():
+    now = [0.0]
+    waits = []
+
+    def _sleep(s):
+        waits.append(s)
+        now[0] += s
+
+    limiter = RateLimiter(requests_per_sec=2, clock=lambda: now[0], sleep=_sleep)
+    for _ in range(4):
+        limiter.acquire()
+    # bucket starts full (2 requests), the next two wait 0.5s each
+    assert waits == [pytest.approx(0.5), pytest.approx(0.5)]
@@ -0,0 +1,68 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from eval.pipeline import EvalRecord, EvaluationPipeline, make_sink, summarize
+
+
+class _FixedEvaluator:
+    def __init__(self, score, passing=True, fail=False):
+        self.score, self.passing, self.fail = score, passing, fail
+
+    def evaluate(self, query, response, contexts):
+        if self.fail:
+            raise RuntimeError("judge unavailable")
+        return SimpleNamespace(score=self.score, passing=self.passing, feedback="ok")
+
+
+def _evaluators():
+    return {"relevancy": _FixedEvaluator(1.0), "faithfulness": _FixedEvaluator(0.0, passing=False),
+            "broken": _FixedEvaluator(0.0, fail=True)}
+
+
+def test_pipeline_samples_evaluates_and_aggregates(tmp_path):
+    sink_path = tmp_path / "evals.jsonl"
+    rolls = itertools.cycle([0.1, 0.9])  # every other record is sampled at rate 0.5
+    pipeline = EvaluationPipeline(_evaluators, sink=make_sink(str(sink_path)), sample_rate=0.5,
+                                  workers=2, rng=lambda: next(rolls)).start()
+    for i in range(6):
+        pipeline.submit(EvalRecord(query=f"q{i}", answer="a", contexts=["ctx"]))
+    pipeline.close()
+
+    assert pipeline.stats["sampled"] == 3 and pipeline.stats["evaluated"] == 3
+    summary = pipeline.aggregate.summary()
+    assert summary["relevancy"] == {"count": 3, "errors": 0, "pass_rate": 1.0, "mean_score": 1.0}
+    assert summary["faithfulness"]["pass_rate"] == 0.0
+    assert summary["broken"]["errors"] == 3
+    assert summarize(str(sink_path)) == summary
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    pipeline = EvaluationPipeline(_evaluators, sink=make_sink(str(tmp_path / "evals.sqlite")),
+                                  sample_rate=1.0, workers=1, queue_size=2)
+    # workers not started yet, so the queue fills up
+    accepted = [pipeline.submit(EvalRecord(query="q", answer="a", contexts=[])) for _ in range(4)]
+    assert accepted == [True, True, False, False]
+    assert pipeline.stats["dropped"] == 2
+    pipeline.start().close()
+    assert summarize(str(tmp_path / "evals.sqlite"))["relevancy"]["count"] == 2
+
+
+def test_bounded_close_drops_the_backlog(tmp_path):
+    release = threading.Event()
+
+    class _SlowEvaluator:
+        def evaluate(self, query, response, contexts):
+            release.wait(5)
+            return SimpleNamespace(score=1.0, passing=True, feedback="ok")
+
+    pipeline = EvaluationPipeline(lambda: {"slow": _SlowEvaluator()}, sink=make_sink(str(tmp_path / "e.jsonl")),
+                                  sample_rate=1.0, workers=1, queue_size=100, close_timeout=0.2).start()
+    for i in range(20):
+        pipeline.submit(EvalRecord(query=f"q{i}", answer="a", contexts=[]))
+    started = time.monotonic()
+    pipeline.close()
+    assert time.monotonic() - started < 2
+    assert pipeline.stats["dropped"] >= 18
+    release.set()
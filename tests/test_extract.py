@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ingest import extract
+from ingest.extract import PageCache, page_ranges
+
+PDF = Path(__file__).parent / "assets" / "eval_source_document.pdf"
+
+
+def test_page_ranges_split_runs_and_cap_size():
+    assert page_ranges([0, 1, 2, 3, 4], 2) == [(0, 2), (2, 4), (4, 5)]
+    assert page_ranges([1, 2, 5, 6, 7], 10) == [(1, 3), (5, 8)]
+    assert page_ranges([], 4) == []
+
+
+def test_cached_pages_skip_extraction(tmp_path, monkeypatch):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-fake")
+    cache = PageCache(str(tmp_path / "pages.sqlite"))
+    digest = extract.file_hash(pdf)
+    cache.put(digest, {0: "first", 2: "third"}, total=3)
+
+    calls = []
+    monkeypatch.setattr(extract, "extract_range", lambda path, start, stop: calls.append((start, stop)) or ["second"])
+    assert extract.extract_pages(pdf, cache) == ["first", "second", "third"]
+    assert calls == [(1, 2)]
+
+    # now fully cached
+    assert extract.extract_pages(pdf, cache) == ["first", "second", "third"]
+    assert calls == [(1, 2)]
+    cache.close()
+
+
+def test_parallel_page_ranges_match_sequential(tmp_path):
+    pytest.importorskip("pdfplumber")
+    pytest.importorskip("llama_index.core")
+    from ingest.ingest_pdfs import ingest_sources
+
+    seq, par = tmp_path / "seq.jsonl", tmp_path / "par.jsonl"
+    ingest_sources([PDF], seq, workers=1)
+    report = ingest_sources([PDF], par, workers=2, page_cache=str(tmp_path / "pages.sqlite"), range_size=1)
+    assert report["docs"] == 1 and report["pages"] == 2
+    rows = [json.loads(line) for line in par.read_text().splitlines()]
+    seq_rows = [json.loads(line) for line in seq.read_text().splitlines()]
+    for row in rows + seq_rows:
+        assert isinstance(row.pop("ingested_at"), int)
+    assert seq_rows == rows
+    assert rows[0]["page"] == 1 and rows[-1]["page_end"] == 2
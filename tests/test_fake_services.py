@@ -0,0 +1,26 @@
+from services.embedding.fake_service import FakeEmbeddingService
+from services.llm.fake_llm_service import FakeLLMService
+from services.llm.streaming import StreamStats
+
+
+def _cos(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_fake_embeddings_are_deterministic_and_lexically_similar():
+    embedder = FakeEmbeddingService(dimension=64)
+    a, b, c = embedder.embed(["the invoice total is due", "invoice total due today", "weather in paris"])
+    assert embedder.embed(["the invoice total is due"])[0] == a
+    assert len(a) == 64
+    assert _cos(a, b) > _cos(a, c)
+
+
+def test_fake_llm_answers_from_first_passage_and_streams():
+    llm = FakeLLMService(answer_words=3)
+    prompt = "Query:\n q\n\nPassages:\n[1] doc.pdf: alpha beta gamma delta\n\n[2] other.pdf: zeta"
+    assert llm.synthesize(prompt) == "alpha beta gamma [1]"
+    assert llm.synthesize("no passages") == "Answer not found."
+
+    stats = StreamStats()
+    assert "".join(llm.synthesize_stream(prompt, stats=stats)) == "alpha beta gamma [1]"
+    assert stats.chunks == 4 and stats.ttft_s is not None
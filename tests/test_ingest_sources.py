@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from ingest.ingest_pdfs import resolve_sources, document_id
+
+
+def test_resolve_sources_expands_dirs_and_globs(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "b.pdf").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    paths = resolve_sources([
+        {"path": str(tmp_path)},
+        {"path": str(tmp_path / "*.pdf")},  # overlaps the directory entry
+    ])
+    names = sorted(p.name for p in paths)
+    assert names == ["a.pdf", "b.pdf"]
+
+
+def test_document_id_is_stable():
+    assert document_id(Path("docs/manual.pdf")) == document_id(Path("docs/manual.pdf"))
+    assert document_id(Path("docs/manual.pdf")) != document_id(Path("docs/other.pdf"))
@@ -0,0 +1,89 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.vectorstores.ivf_store import IVFStore, kmeans  # noqa: E402
+from services.vectorstores.numpy_store import NumpyStore  # noqa: E402
+
+
+def _data(n=3000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, dim))
+    return (centers[rng.integers(0, 40, n)] + 0.4 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _fill(store, vectors, start=0):
+    ids = [f"c{i}" for i in range(start, start + len(vectors))]
+    store.save(ids, [f"doc {i}" for i in ids], [{"i": i} for i in ids], vectors)
+    return store
+
+
+def _recall(got, want):
+    return np.mean([len(set(g) & set(w)) / len(w) for g, w in zip(got["ids"], want["ids"])])
+
+
+def test_kmeans_improves_on_its_seeds():
+    rows = _data(2000)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    seeds = rows[np.random.default_rng(0).choice(len(rows), 40, replace=False)]
+    found = kmeans(rows, 40)
+    assert np.allclose(np.linalg.norm(found, axis=1), 1.0, atol=1e-5)
+    assert (rows @ found.T).max(axis=1).mean() > (rows @ seeds.T).max(axis=1).mean() + 0.05
+
+
+def test_untrained_store_is_exact():
+    vectors = _data(200)
+    store = _fill(IVFStore(min_train_rows=1000), vectors)
+    store.flush()
+    assert not store.trained
+    exact = _fill(NumpyStore(), vectors)
+    assert store.query(vectors[5], n_results=5)["ids"] == exact.query(vectors[5], n_results=5)["ids"]
+
+
+def test_nprobe_trades_recall_per_request():
+    vectors = _data()
+    store = _fill(IVFStore(nlist=64, nprobe=1, min_train_rows=1000), vectors)
+    store.flush()
+    assert store.trained and store.stats()["tail_rows"] == 0
+    queries = vectors[:40] + 0.2
+    want = _fill(NumpyStore(), vectors).query_batch(queries, n_results=10)
+    low = _recall(store.query_batch(queries, n_results=10), want)
+    full = _recall(store.query_batch(queries, n_results=10, nprobe=64), want)
+    assert full == 1.0
+    assert low < full
+    assert store.query(queries[0], n_results=10, nprobe=64)["ids"] == [want["ids"][0]]
+
+
+def test_incremental_adds_deletes_and_reload(tmp_path):
+    vectors = _data()
+    store = _fill(IVFStore(path=str(tmp_path), nlist=32, nprobe=32, min_train_rows=1000), vectors)
+    store.flush()
+    centroids = store._centroids.copy()
+
+    extra = _data(300, seed=1)
+    _fill(store, extra, start=len(vectors))
+    store.delete(["c0", "c1", "c2"])
+    store.upsert(["c3"], ["doc c3"], [{"i": "c3"}], [-vectors[3]])
+    assert store.stats()["tail_rows"] > 0
+    # new rows are searchable before the next flush, without retraining
+    assert store.query(extra[7], n_results=1)["ids"] == [[f"c{len(vectors) + 7}"]]
+    assert store.query(-vectors[3], n_results=1)["ids"] == [["c3"]]
+    assert store.query(vectors[0], n_results=1)["ids"] != [["c0"]]
+    store.flush()
+    assert np.array_equal(store._centroids, centroids)
+
+    reopened = IVFStore(path=str(tmp_path), nprobe=32)
+    assert reopened.trained and reopened.count() == len(vectors) + 300 - 3
+    assert reopened.stats()["tail_rows"] == 0
+    labels = reopened._labels[: reopened.count()]
+    assert np.all(labels[1:] >= labels[:-1])  # inverted lists are contiguous on disk
+    assert reopened.query(extra[7], n_results=1)["ids"] == [[f"c{len(vectors) + 7}"]]
+    assert reopened.get(["c3"])["documents"] == ["doc c3"]
+
+
+def test_close_without_writes_does_not_train_or_write(tmp_path):
+    store = _fill(IVFStore(path=str(tmp_path), nlist=8, min_train_rows=10000), _data(n=500))
+    store.flush()
+    store.min_train_rows = 100  # would train on the next flush
+    store.close()
+    assert not store.trained and not (tmp_path / "ivf_centroids.npy").exists()
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from bench.import_time import parse_importtime
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ["chromadb", "google.genai", "llama_index.core", "pdfplumber"]
+
+
+@pytest.mark.parametrize("module", ["services.factory", "ingest.ingest_pdfs", "index.build_index",
+                                    "query.run_query"])
+def test_entry_points_do_not_import_heavy_backends(module):
+    probe = f"import sys, {module}; print([m for m in {HEAVY!r} if m in sys.modules])"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      3000 |       3500 | yaml\n"
+    )
+    records = parse_importtime(stderr)
+    assert [r["module"] for r in records] == ["_io", "yaml"]
+    assert records[1] == {"module": "yaml", "self_us": 3000, "cumulative_us": 3500, "depth": 0}
+    assert records[0]["depth"] == 1
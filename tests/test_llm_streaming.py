@@ -0,0 +1,95 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from services.llm.genai_llm_service import GenAILLMService  # noqa: E402
+from services.llm.streaming import StreamStats  # noqa: E402
+
+
+def _chunk(text, tokens):
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(candidates_token_count=tokens,
+                                                                     total_token_count=tokens))
+
+
+class _FakeModels:
+    """Stands in for client.models / client.aio.models, streaming canned chunks with latency."""
+
+    def __init__(self, parts, first_delay=0.05, delay=0.01):
+        self.parts, self.first_delay, self.delay = parts, first_delay, delay
+        self.configs = []
+
+    def _chunks(self):
+        return [_chunk(p, 2 * (i + 1)) for i, p in enumerate(self.parts)]
+
+    def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        return _chunk("".join(self.parts), 2 * len(self.parts))
+
+    def generate_content_stream(self, model, contents, config):
+        self.configs.append(config)
+        time.sleep(self.first_delay)
+        for i, c in enumerate(self._chunks()):
+            if i:
+                time.sleep(self.delay)
+            yield c
+
+
+class _FakeAioModels(_FakeModels):
+    async def generate_content_stream(self, model, contents, config):
+        self.configs.append(config)
+
+        async def _gen():
+            await asyncio.sleep(self.first_delay)
+            for i, c in enumerate(self._chunks()):
+                if i:
+                    await asyncio.sleep(self.delay)
+                yield c
+        return _gen()
+
+
+class FakeStreamingClient:
+    def __init__(self, parts):
+        self.models = _FakeModels(parts)
+        self.aio = SimpleNamespace(models=_FakeAioModels(parts))
+
+
+def test_sync_stream_yields_chunks_and_records_ttft():
+    client = FakeStreamingClient(["The ", "answer ", "is 42."])
+    llm = GenAILLMService(client=client)
+    stats = StreamStats()
+
+    parts = list(llm.synthesize_stream("q", max_output_tokens=64, stats=stats))
+
+    assert parts == ["The ", "answer ", "is 42."]
+    assert client.models.configs[0].max_output_tokens == 64
+    assert 0.04 <= stats.ttft_s < stats.total_s
+    assert stats.output_tokens == 6 and stats.tokens_per_sec > 0
+
+
+@pytest.mark.asyncio
+async def test_async_stream_yields_chunks():
+    client = FakeStreamingClient(["a", "b"])
+    llm = GenAILLMService(client=client)
+    stats = StreamStats()
+
+    parts = [t async for t in llm.asynthesize_stream("q", stats=stats)]
+
+    assert parts == ["a", "b"]
+    assert stats.chunks == 2 and stats.ttft_s is not None
+
+
+def test_synthesize_honours_max_output_tokens():
+    client = FakeStreamingClient(["x", "y"])
+    assert GenAILLMService(client=client).synthesize("q", max_output_tokens=128) == "xy"
+    assert client.models.configs[0].max_output_tokens == 128
+
+
+def test_default_output_budget_comes_from_the_service():
+    client = FakeStreamingClient(["x"])
+    GenAILLMService(client=client).synthesize("q")
+    GenAILLMService(client=client, max_output_tokens=2048).synthesize("q")
+    assert [c.max_output_tokens for c in client.models.configs] == [1024, 2048]
@@ -0,0 +1,112 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.vectorstores.ivf_store import IVFStore  # noqa: E402
+from services.vectorstores.metadata_index import MetadataIndex, matches, to_chroma_where  # noqa: E402
+from services.vectorstores.numpy_store import NumpyStore  # noqa: E402
+from services.vectorstores.quantized_store import QuantizedStore  # noqa: E402
+
+TENANTS = ["acme", "globex", "initech"]
+
+
+def _metas(n):
+    return [{"source": f"doc{j % 7}.pdf", "doc_id": f"d{j % 7}", "tenant": TENANTS[j % 3], "page": j % 50,
+             "ingested_at": 1_700_000_000 + j} for j in range(n)]
+
+
+def _fill(store, n=600, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    ids = [f"c{j}" for j in range(n)]
+    store.save(ids, [f"doc {i}" for i in ids], _metas(n), vectors)
+    return store, vectors
+
+
+def _brute_force(vectors, metas, query, where, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    rows = [j for j in np.argsort(-scores, kind="stable") if matches(metas[j], where)]
+    return [f"c{j}" for j in rows[:k]]
+
+
+FILTERS = [
+    {"tenant": "acme"},
+    {"tenant": "acme", "doc_id": "d3"},
+    {"page": {"$gte": 10, "$lt": 20}},
+    {"tenant": {"$in": ["globex", "initech"]}, "page": {"$lte": 5}},
+    {"$or": [{"doc_id": "d1"}, {"page": {"$gt": 45}}]},
+    {"tenant": {"$ne": "acme"}},
+    {"ingested_at": {"$gte": 1_700_000_590}},
+    {"unindexed": "x"},
+]
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_select_agrees_with_matches(where):
+    metas = _metas(300)
+    index = MetadataIndex()
+    got = index.select(where, metas)
+    assert got.tolist() == [j for j, m in enumerate(metas) if matches(m, where)]
+
+
+def test_index_extends_on_append():
+    metas = _metas(100)
+    index = MetadataIndex()
+    index.select({"tenant": "acme"}, metas[:60])
+    index.append(60, metas[60:])
+    assert index.select({"page": {"$lt": 3}}, metas).tolist() == [j for j in range(100) if j % 50 < 3]
+    assert index.select({"tenant": "acme"}, metas).tolist() == list(range(0, 100, 3))
+
+
+@pytest.mark.parametrize("where", FILTERS[:6])
+def test_numpy_store_filtered_query_is_exact(where):
+    store, vectors = _fill(NumpyStore())
+    metas = _metas(len(vectors))
+    for query in vectors[:5] + 0.1:
+        assert store.query(query, n_results=5, where=where)["ids"] == [_brute_force(vectors, metas, query, where, 5)]
+
+
+def test_filter_tracks_deletes_and_upserts():
+    store, vectors = _fill(NumpyStore())
+    assert len(store.get_metadata({"tenant": "acme"})) == 200
+    store.delete([f"c{j}" for j in range(0, 30, 3)])
+    store.upsert(["c1"], ["moved"], [{"tenant": "acme", "page": 0}], [vectors[1]])
+    store.update_metadata(["c2"], [{"tenant": "acme"}])
+    scoped = store.get_metadata({"tenant": "acme"})
+    assert len(scoped) == 200 - 10 + 2
+    res = store.query(vectors[1], n_results=3, where={"tenant": "acme"})
+    assert res["ids"][0][0] == "c1"
+    assert all(m["tenant"] == "acme" for m in res["metadatas"][0])
+    assert store.query(vectors[0], n_results=3, where={"tenant": "nobody"})["ids"] == [[]]
+
+
+def test_quantized_store_respects_filter():
+    store, vectors = _fill(QuantizedStore(quantization="int8"))
+    metas = _metas(len(vectors))
+    where = {"doc_id": "d2", "page": {"$lt": 40}}
+    res = store.query_batch(vectors[:4], n_results=5, where=where)
+    for query, ids in zip(vectors[:4], res["ids"]):
+        assert ids == _brute_force(vectors, metas, query, where, 5)
+
+
+def test_ivf_store_filters_narrow_and_broad_scopes():
+    store, vectors = _fill(IVFStore(nlist=16, nprobe=4, min_train_rows=100), n=1200)
+    store.flush()
+    assert store.trained
+    metas = _metas(len(vectors))
+    # narrow: fewer rows than 4 of 16 lists hold, searched exactly
+    narrow = {"doc_id": "d4", "tenant": "acme"}
+    assert store.query(vectors[10], n_results=5, where=narrow)["ids"] == [
+        _brute_force(vectors, metas, vectors[10], narrow, 5)]
+    # broad: filtered inside the probed lists
+    broad = {"tenant": {"$ne": "acme"}}
+    res = store.query(vectors[11], n_results=5, where=broad)
+    assert all(m["tenant"] != "acme" for m in res["metadatas"][0])
+    assert res["ids"][0][0] == "c11"
+
+
+def test_to_chroma_where():
+    assert to_chroma_where(None) is None
+    assert to_chroma_where({"tenant": "acme"}) == {"tenant": "acme"}
+    assert to_chroma_where({"tenant": "acme", "page": {"$gt": 2}}) == {"$and": [{"tenant": "acme"},
+                                                                                 {"page": {"$gt": 2}}]}
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.vectorstores.numpy_store import NumpyStore  # noqa: E402
+
+
+def _store_with(tmp_path=None):
+    store = NumpyStore(path=str(tmp_path) if tmp_path else None)
+    store.save(["a", "b", "c"], ["doc a", "doc b", "doc c"],
+               [{"source": "x", "i": 0}, {"source": "x", "i": 1}, {"source": "y", "i": 0}],
+               [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+    return store
+
+
+def test_query_returns_chroma_shaped_top_k():
+    store = _store_with()
+    res = store.query([1.0, 0.1], n_results=2)
+
+    assert set(res) == {"ids", "documents", "metadatas", "distances"}
+    assert res["ids"] == [["a", "c"]]
+    assert res["documents"] == [["doc a", "doc c"]]
+    assert res["metadatas"][0][0] == {"source": "x", "i": 0}
+    dists = res["distances"][0]
+    assert dists[0] <= dists[1]
+
+
+def test_batched_search_matches_single_queries():
+    store = _store_with()
+    queries = [[1.0, 0.0], [0.0, 1.0], [0.3, 0.7]]
+    batched = store.query_batch(queries, n_results=3)
+    for i, q in enumerate(queries):
+        single = store.query(q, n_results=3)
+        assert batched["ids"][i] == single["ids"][0]
+        assert batched["distances"][i] == pytest.approx(single["distances"][0])
+
+
+def test_upsert_delete_and_reload_memory_mapped(tmp_path):
+    store = _store_with(tmp_path)
+    store.upsert(["b"], ["doc b2"], [{"source": "x", "i": 1}], [[0.0, 2.0]])
+    store.delete(["a"])
+    store.flush()
+
+    reopened = NumpyStore(path=str(tmp_path), mmap=True)
+    assert reopened.count() == 2
+    assert isinstance(reopened.vectors, np.memmap) or not reopened.vectors.flags.writeable
+    assert reopened.query([0.0, 1.0], n_results=1)["documents"] == [["doc b2"]]
+
+    reopened.save(["d"], ["doc d"], [{"source": "z", "i": 0}], [[-1.0, 0.0]])
+    assert reopened.query([-1.0, 0.0], n_results=1)["ids"] == [["d"]]
+    assert sorted(reopened.get_metadata(where={"source": "x"})) == ["b"]
+
+
+def test_close_of_a_reader_keeps_a_newer_index(tmp_path):
+    _store_with(tmp_path).flush()
+    reader = NumpyStore(path=str(tmp_path))
+    writer = NumpyStore(path=str(tmp_path))
+    writer.delete(["a", "b"])
+    writer.close()  # unflushed writes are persisted on close
+    mtime = (tmp_path / "vectors.npy").stat().st_mtime_ns
+
+    reader.query([1.0, 0.0], n_results=1)
+    reader.close()
+    assert (tmp_path / "vectors.npy").stat().st_mtime_ns == mtime
+    assert NumpyStore(path=str(tmp_path)).get_metadata() == {"c": {"source": "y", "i": 0}}
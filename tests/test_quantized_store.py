@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.vectorstores.numpy_store import NumpyStore  # noqa: E402
+from services.vectorstores.quantized_store import QuantizedStore, quantize_int8  # noqa: E402
+
+
+def _data(n=1000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(30, dim))
+    return (centers[rng.integers(0, 30, n)] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _queries(vectors, n=30, seed=1):
+    rng = np.random.default_rng(seed)
+    return vectors[rng.integers(0, len(vectors), n)] + 0.3 * rng.normal(size=(n, vectors.shape[1]))
+
+
+def _fill(store, vectors):
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.save(ids, [f"doc {i}" for i in ids], [{"i": i} for i in range(len(vectors))], vectors)
+    return store
+
+
+def test_int8_codes_reconstruct_rows():
+    rows = _data(10)
+    codes, scales = quantize_int8(rows)
+    assert codes.dtype == np.int8
+    assert np.abs(codes * scales[:, None] - rows).max() <= scales.max() / 2 + 1e-6
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_rerank_matches_exact_search(quantization):
+    vectors = _data()
+    exact = _fill(NumpyStore(), vectors)
+    store = _fill(QuantizedStore(quantization=quantization, rerank_factor=10), vectors)
+    queries = _queries(vectors)
+    got = store.query_batch(queries, n_results=5)
+    want = exact.query_batch(queries, n_results=5)
+    recall = np.mean([len(set(g) & set(w)) / 5 for g, w in zip(got["ids"], want["ids"])])
+    assert recall >= 0.95
+    # reranked distances are exact cosine distances, not code approximations
+    q, row = queries[0], vectors[int(got["ids"][0][0][1:])]
+    cosine = q @ row / (np.linalg.norm(q) * np.linalg.norm(row))
+    assert got["distances"][0][0] == pytest.approx(1.0 - cosine, abs=1e-5)
+
+
+def test_codes_follow_upsert_delete_and_reload(tmp_path):
+    vectors = _data(50, dim=16)
+    store = _fill(QuantizedStore(path=str(tmp_path), quantization="binary"), vectors)
+    store.delete(["c0", "c1"])
+    store.upsert(["c2"], ["doc c2"], [{"i": 2}], [-vectors[2]])
+    store.flush()
+    assert isinstance(store.vectors, np.memmap) or not store.vectors.flags.writeable
+    assert store.memory_bytes()["full_precision_resident"] == 0
+
+    reopened = QuantizedStore(path=str(tmp_path), quantization="binary")
+    assert reopened.count() == 48
+    assert reopened.query(-vectors[2], n_results=1)["ids"] == [["c2"]]
+    assert reopened.query(vectors[7], n_results=1)["ids"] == [["c7"]]
+    assert reopened.memory_bytes()["codes"] == 48 * 2
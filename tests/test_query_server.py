@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from query.server import Overloaded, QueryServer, _handle
+from services import telemetry
+from services.embedding.base import EmbeddingService
+from services.llm.answer_cache import SemanticAnswerCache
+from services.llm.base import LLMService
+from services.vectorstores.base import VectorStore
+
+
+class _Embedder(EmbeddingService):
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self.batches = []
+
+    def embed(self, texts):
+        time.sleep(self.latency)
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class _Store(VectorStore):
+    def query_batch(self, query_embeddings, n_results=3):
+        return {
+            "ids": [[f"chunk-{int(e[0])}"] for e in query_embeddings],
+            "documents": [["passage"] for _ in query_embeddings],
+            "metadatas": [[{"source": "s"}] for _ in query_embeddings],
+            "distances": [[0.0] for _ in query_embeddings],
+        }
+
+
+class _LLM(LLMService):
+    def __init__(self, release: threading.Event = None):
+        self.calls = 0
+        self.release = release
+
+    def synthesize(self, user_prompt, max_output_tokens=512):
+        self.calls += 1
+        if self.release:
+            self.release.wait(2)
+        return "answer"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_are_micro_batched_and_coalesced():
+    embedder, llm = _Embedder(), _LLM()
+    server = QueryServer(embedder, _Store(), llm, max_batch=16, max_wait_ms=20)
+    await server.start()
+    try:
+        queries = [f"question {i}" for i in range(10)] + ["question 1", "question  1"]
+        results = await asyncio.gather(*(server.answer(q) for q in queries))
+    finally:
+        await server.stop()
+
+    assert [h["ids"][0][0] for _, h in results[:10]] == [f"chunk-{len(q)}" for q in queries[:10]]
+    assert all(a == "answer" for a, _ in results)
+    assert len(embedder.batches) == 1 and len(embedder.batches[0]) == 10
+    assert server.stats["coalesced"] == 2
+    assert llm.calls == 10
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_load():
+    release = threading.Event()
+    server = QueryServer(_Embedder(latency=0), _Store(), _LLM(release), max_batch=1, max_wait_ms=0,
+                         max_queue=1, max_inflight_batches=1)
+    await server.start()
+    try:
+        first = asyncio.ensure_future(server.answer("a"))
+        await asyncio.sleep(0.05)  # "a" holds the only batch slot, blocked in synthesis
+        second = asyncio.ensure_future(server.answer("b"))  # fills the queue
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await server.answer("c")
+        release.set()
+        await asyncio.gather(first, second)
+    finally:
+        release.set()
+        await server.stop()
+    assert server.stats["shed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_queries_are_served_from_the_answer_cache():
+    llm = _LLM()
+    server = QueryServer(_Embedder(latency=0), _Store(), llm, max_wait_ms=0, answer_cache=SemanticAnswerCache())
+    await server.start()
+    try:
+        first = await server.answer("what is x?")
+        second = await server.answer("what is x?")
+    finally:
+        await server.stop()
+    assert first == second and first[0] == "answer"
+    assert llm.calls == 1 and server.stats["cached"] == 1
+
+
+class _RecordingPipeline:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+        return True
+
+
+@pytest.mark.asyncio
+async def test_served_answers_are_submitted_for_evaluation():
+    pipeline = _RecordingPipeline()
+    server = QueryServer(_Embedder(latency=0), _Store(), _LLM(), max_wait_ms=0, eval_pipeline=pipeline)
+    await server.start()
+    try:
+        with telemetry.request_scope("req-e"):
+            await server.answer("what is x?")
+    finally:
+        await server.stop()
+    assert [(r.query, r.answer, r.contexts, r.request_id) for r in pipeline.records] == [
+        ("what is x?", "answer", ["s: passage"], "req-e")]
+
+
+class _RequestLLM(_LLM):
+    def synthesize(self, user_prompt, max_output_tokens=512):
+        self.seen = getattr(self, "seen", []) + [telemetry.request_id_var.get()]
+        return super().synthesize(user_prompt, max_output_tokens)
+
+
+@pytest.mark.asyncio
+async def test_batched_stages_reach_each_request_scope():
+    llm = _RequestLLM()
+    server = QueryServer(_Embedder(latency=0), _Store(), llm, max_batch=4, max_wait_ms=20)
+    telemetry.enable()
+
+    async def ask(rid, query):
+        with telemetry.request_scope(rid) as breakdown:
+            await server.answer(query)
+        return breakdown
+
+    await server.start()
+    try:
+        breakdowns = await asyncio.gather(ask("req-a", "a"), ask("req-b", "bb"))
+    finally:
+        await server.stop()
+        telemetry.enable(False)
+        telemetry.metrics.reset()
+    assert all({"embed", "retrieve", "synthesize", "total"} <= set(b) for b in breakdowns)
+    assert sorted(llm.seen) == ["req-a", "req-b"]
+
+
+class _BrokenContext:
+    def build(self, docs, metas, ids=None):
+        raise ValueError("bad hits")
+
+
+@pytest.mark.asyncio
+async def test_prompt_failure_fails_the_request_not_the_batch():
+    server = QueryServer(_Embedder(latency=0), _Store(), _LLM(), max_batch=4, max_wait_ms=20,
+                         context=_BrokenContext())
+    await server.start()
+    try:
+        results = await asyncio.wait_for(asyncio.gather(server.answer("a"), server.answer("bb"),
+                                                        return_exceptions=True), 2)
+    finally:
+        await server.stop()
+    assert all(isinstance(r, ValueError) for r in results)
+    assert server.stats["errors"] == 2
+
+
+class _Writer:
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+
+async def _http(server, raw: bytes) -> bytes:
+    reader = asyncio.StreamReader()
+    reader.feed_data(raw)
+    reader.feed_eof()
+    writer = _Writer()
+    await _handle(server, reader, writer)
+    return writer.data
+
+
+@pytest.mark.asyncio
+async def test_http_rejects_bad_and_oversized_content_length():
+    server = QueryServer(_Embedder(latency=0), _Store(), _LLM(), max_body_bytes=16)
+    bad = await _http(server, b"POST /query HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+    assert bad.startswith(b"HTTP/1.1 400")
+    negative = await _http(server, b"POST /query HTTP/1.1\r\nContent-Length: -1\r\n\r\n")
+    assert negative.startswith(b"HTTP/1.1 400")
+    big = await _http(server, b"POST /query HTTP/1.1\r\nContent-Length: 17\r\n\r\n" + b"x" * 17)
+    assert big.startswith(b"HTTP/1.1 413")
@@ -0,0 +1,55 @@
+import threading
+
+from services.factory import ServiceRegistry
+
+
+class _Closable:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_registry_builds_each_config_once_across_threads():
+    registry = ServiceRegistry()
+    builds = []
+
+    def _build():
+        builds.append(1)
+        return _Closable()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("llm", {"model": "m"}, _build)))
+               for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(builds) == 1
+    assert all(r is results[0] for r in results)
+    assert registry.get("llm", {"model": "other"}, _build) is not results[0]
+
+
+def test_registry_refresh_and_shutdown_close_services():
+    registry = ServiceRegistry()
+    store = registry.get("vector_store", {"type": "chroma"}, _Closable)
+    llm = registry.get("llm", {}, _Closable)
+
+    registry.refresh("vector_store")
+    assert store.closed and not llm.closed
+    assert registry.get("vector_store", {"type": "chroma"}, _Closable) is not store
+
+    registry.shutdown()
+    assert llm.closed
+
+
+def test_registry_replace_retires_older_versions():
+    registry = ServiceRegistry()
+    v1 = registry.get("lexical", {"path": "bm25", "mtime": 1}, _Closable, replace=True)
+    other = registry.get("llm", {}, _Closable)
+    assert registry.get("lexical", {"path": "bm25", "mtime": 1}, _Closable, replace=True) is v1
+    v2 = registry.get("lexical", {"path": "bm25", "mtime": 2}, _Closable, replace=True)
+    assert v2 is not v1 and v1.closed and not other.closed
+    assert registry.get("lexical", {"path": "bm25", "mtime": 2}, _Closable, replace=True) is v2
@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from index.rebalance import layout, open_layouts, rebalance  # noqa: E402
+from services.factory import open_store  # noqa: E402
+from services.vectorstores.numpy_store import NumpyStore  # noqa: E402
+from services.vectorstores.sharded_store import ShardedStore, jump_hash, shard_for  # noqa: E402
+
+
+def _rows(n=400, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"doc-{i // 10}-chunk-{i % 10}" for i in range(n)]
+    return ids, [f"text {i}" for i in ids], [{"source": i} for i in ids], rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_shard_assignment_is_stable_and_consistent():
+    assert shard_for("doc-1-chunk-0", 4) == shard_for("doc-1-chunk-0", 4)
+    assert all(0 <= jump_hash(k, 7) < 7 for k in range(1000))
+    ids = [f"c{i}" for i in range(5000)]
+    moved = sum(shard_for(i, 4) != shard_for(i, 5) for i in ids)
+    assert abs(moved / len(ids) - 1 / 5) < 0.03  # only the new shard's share moves
+    assert all(shard_for(i, 5) == 4 for i in ids if shard_for(i, 4) != shard_for(i, 5))
+
+
+def test_scatter_gather_matches_a_single_store():
+    ids, docs, metas, vecs = _rows()
+    single, sharded = NumpyStore(), ShardedStore([NumpyStore() for _ in range(3)])
+    for store in (single, sharded):
+        store.save(ids, docs, metas, vecs)
+    assert sharded.count() == len(ids) and min(sharded.counts()) > 0
+
+    queries = vecs[:5] + 0.1
+    want, got = single.query_batch(queries, n_results=7), sharded.query_batch(queries, n_results=7)
+    assert got["ids"] == want["ids"]
+    assert np.allclose(got["distances"], want["distances"])
+    assert sharded.query(queries[0], n_results=7)["ids"] == [want["ids"][0]]
+
+    sharded.delete(ids[:10])
+    sharded.update_metadata([ids[10]], [{"source": "changed"}])
+    assert sharded.count() == len(ids) - 10
+    assert sharded.get([ids[12], ids[0], ids[10]]) == {"ids": [ids[12], ids[10]],
+                                                       "documents": [docs[12], docs[10]],
+                                                       "metadatas": [metas[12], {"source": "changed"}]}
+    before = sharded.generation
+    sharded.upsert([ids[0]], [docs[0]], [metas[0]], vecs[:1])
+    assert sharded.generation > before
+
+
+def test_rebalance_grows_and_shrinks(tmp_path):
+    vs_cfg = {"type": "numpy", "persist_path": str(tmp_path / "vectors")}
+    ids, docs, metas, vecs = _rows()
+    (single,) = [open_store(s) for s in layout(vs_cfg, 1)]
+    single.save(ids, docs, metas, vecs)
+    single.flush()
+
+    sources, three, retired = open_layouts(vs_cfg, 1, 3)
+    assert sources == [three[0]] and not retired  # the unsharded store is shard 0
+    result = rebalance(sources, three)
+    assert result["moved"] == sum(shard_for(i, 3) != 0 for i in ids) < len(ids)
+    assert sum(s.count() for s in three) == len(ids)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["vectors", "vectors-shard1", "vectors-shard2"]
+    assert all(shard_for(i, 3) == n for n, s in enumerate(three) for i in s.get_metadata())
+
+    two, dropped = three[:2], three[2].count()
+    result = rebalance(three, two)
+    assert result["moved"] == dropped  # jump hashing keeps the surviving shards' chunks in place
+    assert three[2].count() == 0 and sum(s.count() for s in two) == len(ids)
+
+    reopened = ShardedStore([open_store(s) for s in layout(vs_cfg, 2)])
+    assert reopened.count() == len(ids)
+    assert reopened.query(vecs[3], n_results=1)["ids"] == [[ids[3]]]
@@ -0,0 +1,92 @@
+import logging
+
+import pytest
+
+from services import telemetry
+
+
+@pytest.fixture
+def enabled():
+    telemetry.metrics.reset()
+    telemetry.enable()
+    yield telemetry.metrics
+    telemetry.enable(False)
+    telemetry.metrics.reset()
+
+
+def test_span_is_noop_when_disabled():
+    telemetry.enable(False)
+    telemetry.metrics.reset()
+    with telemetry.span("embed") as s:
+        s.add(items=3)
+    assert telemetry.metrics.snapshot() == {"counters": [], "histograms": []}
+
+
+def test_span_records_counts_and_errors(enabled):
+    with telemetry.span("embed") as s:
+        s.add(items=2, bytes=10)
+    with pytest.raises(RuntimeError):
+        with telemetry.span("embed"):
+            raise RuntimeError("boom")
+
+    counters = {(c["name"], c["labels"]["stage"]): c["value"] for c in enabled.snapshot()["counters"]}
+    assert counters[("rag_stage_calls_total", "embed")] == 2
+    assert counters[("rag_stage_errors_total", "embed")] == 1
+    assert counters[("rag_stage_items_total", "embed")] == 2
+    assert counters[("rag_stage_bytes_total", "embed")] == 10
+    (hist,) = enabled.snapshot()["histograms"]
+    assert hist["count"] == 2 and hist["labels"] == {"stage": "embed"}
+
+
+def test_prometheus_text(enabled):
+    telemetry.record("retrieve", 0.003, items=5)
+    text = enabled.to_prometheus()
+    assert "# TYPE rag_stage_seconds histogram" in text
+    assert 'rag_stage_seconds_bucket{stage="retrieve",le="0.005"} 1' in text
+    assert 'rag_stage_seconds_bucket{stage="retrieve",le="+Inf"} 1' in text
+    assert 'rag_stage_items_total{stage="retrieve"} 5' in text
+
+
+def test_request_scope_breakdown_and_log_filter(enabled):
+    handler_filter = telemetry.RequestIdFilter()
+    seen = []
+
+    class _Capture(logging.Handler):
+        def emit(self, record):
+            handler_filter.filter(record)
+            seen.append(record.request_id)
+
+    log = logging.getLogger("test_telemetry")
+    log.addHandler(_Capture())
+    log.setLevel(logging.INFO)
+    with telemetry.request_scope("req-1") as breakdown:
+        telemetry.record("embed", 0.01)
+        telemetry.record("synthesize", 0.02)
+        log.info("inside")
+    log.info("outside")
+
+    assert breakdown["embed"] == pytest.approx(0.01)
+    assert breakdown["synthesize"] == pytest.approx(0.02)
+    assert "total" in breakdown
+    assert seen == ["req-1", "-"]
+
+
+@pytest.mark.parametrize("flag", [True, False])
+def test_setup_logging_installs_request_id_handler(flag):
+    from config.logging_config import setup_logging
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    try:
+        setup_logging(enable_telemetry=flag)
+        assert telemetry.is_enabled() is flag
+        (handler,) = root.handlers
+        assert any(isinstance(f, telemetry.RequestIdFilter) for f in handler.filters)
+        record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+        assert handler.filter(record) and hasattr(record, "request_id")
+    finally:
+        telemetry.enable(False)
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        for h in saved_handlers:
+            root.addHandler(h)
+        root.setLevel(saved_level)